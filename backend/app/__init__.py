@@ -1,6 +1,6 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import neo4j, rasa, langgraph
+from app.routers import neo4j, rasa, langgraph, graphql
 
 # Import main app models and routes
 from app.main import app
@@ -9,6 +9,7 @@ from app.main import app
 app.include_router(neo4j.router)
 app.include_router(rasa.router)
 app.include_router(langgraph.router)
+app.include_router(graphql.router)
 
 # Add CORS middleware if not already added in main.py
 if not any(isinstance(middleware, CORSMiddleware) for middleware in app.user_middleware):
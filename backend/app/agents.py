@@ -0,0 +1,156 @@
+import asyncio
+import inspect
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.metrics import metrics
+
+# Async multi-agent scheduler
+#
+# Agents form a dependency DAG. Every agent runs as its own task that first
+# awaits its dependencies, so independent agents run concurrently and the
+# end-to-end latency is the critical path rather than the sum. Each agent has
+# its own timeout; a timed-out agent's response is built from the progress
+# it last recorded with `state.report()`, and downstream agents still run
+# with that partial response.
+#
+# Coroutine agents are awaited on the event loop and cancelled on timeout.
+# Plain functions run in a worker thread via asyncio.to_thread, and threads
+# cannot be cancelled: a timed-out sync agent keeps running to completion in
+# the background, holding its worker thread (and any lock it took), and only
+# its result is discarded. Agents should therefore report progress as they
+# go, so that a timeout still has something to show.
+
+DEFAULT_AGENT_TIMEOUT = 5.0
+
+
+class AgentState:
+    # Handed to every agent: dependency responses in, partial progress out
+
+    __slots__ = ("query", "context", "upstream", "partial")
+
+    def __init__(self, query, context, upstream):
+        self.query = query
+        self.context = context or {}
+        self.upstream: Dict[str, dict] = upstream
+        # Agents record intermediate content/metadata here as they progress
+        self.partial: Dict[str, Any] = {"metadata": {}}
+
+    def report(self, content=None, **metadata):
+        # Record progress; a timed-out agent's response is built from the
+        # latest content and all metadata reported so far
+        if content is not None:
+            self.partial["content"] = content
+        self.partial["metadata"] = {**self.partial["metadata"], **metadata}
+
+
+class AgentSpec:
+    __slots__ = ("agent_id", "fn", "depends_on", "timeout")
+
+    def __init__(self, agent_id, fn: Callable[[AgentState], Any], depends_on: Iterable[str] = (),
+                 timeout: float = DEFAULT_AGENT_TIMEOUT):
+        self.agent_id = agent_id
+        self.fn = fn
+        self.depends_on = tuple(depends_on)
+        self.timeout = timeout
+
+
+def _topological_order(specs: Dict[str, AgentSpec]) -> List[str]:
+    order = []
+    visiting = set()
+    done = set()
+
+    def visit(agent_id, path):
+        if agent_id in done:
+            return
+        if agent_id in visiting:
+            raise ValueError(f"Agent dependency cycle: {' -> '.join(path + [agent_id])}")
+        visiting.add(agent_id)
+        for dependency in specs[agent_id].depends_on:
+            if dependency not in specs:
+                raise ValueError(f"Agent {agent_id} depends on unknown agent {dependency}")
+            visit(dependency, path + [agent_id])
+        visiting.discard(agent_id)
+        done.add(agent_id)
+        order.append(agent_id)
+
+    for agent_id in specs:
+        visit(agent_id, [])
+    return order
+
+
+class AgentScheduler:
+    def __init__(self, specs: Iterable[AgentSpec]):
+        self.specs = {spec.agent_id: spec for spec in specs}
+        # Validated once; a cycle would otherwise deadlock the dependency awaits
+        self.order = _topological_order(self.specs)
+
+    async def _call(self, spec: AgentSpec, state: AgentState):
+        if inspect.iscoroutinefunction(spec.fn):
+            return await spec.fn(state)
+        return await asyncio.to_thread(spec.fn, state)
+
+    async def _run_agent(self, spec: AgentSpec, tasks, query, context):
+        upstream = {dependency: await tasks[dependency] for dependency in spec.depends_on}
+        state = AgentState(query, context, upstream)
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(self._call(spec, state), spec.timeout)
+            status = "ok"
+        except asyncio.TimeoutError:
+            response = None
+            status = "timeout"
+        except Exception as exc:
+            response = None
+            status = "error"
+            state.report(error=str(exc))
+        elapsed = time.perf_counter() - started
+        metrics.observe_stage(f"agent.{spec.agent_id}", elapsed)
+
+        if response is None:
+            partial_metadata = dict(state.partial["metadata"])
+            fallback = (f"{spec.agent_id} timed out after {spec.timeout:.2f}s" if status == "timeout"
+                        else f"{spec.agent_id} failed")
+            response = {
+                "agent_id": spec.agent_id,
+                "content": state.partial.get("content", fallback),
+                "metadata": {
+                    "confidence": 0.0,
+                    **partial_metadata,
+                    "partial": True,
+                },
+            }
+        metadata = response.setdefault("metadata", {})
+        metadata["processing_time"] = round(elapsed, 6)
+        metadata["status"] = status
+        metadata.setdefault("timestamp", datetime.now().isoformat())
+        return response
+
+    async def stream(self, query, context: Optional[dict] = None) -> AsyncIterator[Tuple[str, dict]]:
+        # (agent_id, response) in completion order, each as soon as it is ready
+        tasks: Dict[str, asyncio.Task] = {}
+        for agent_id in self.order:
+            tasks[agent_id] = asyncio.ensure_future(
+                self._run_agent(self.specs[agent_id], tasks, query, context))
+        agent_ids = {task: agent_id for agent_id, task in tasks.items()}
+        pending = set(tasks.values())
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=lambda task: self.order.index(agent_ids[task])):
+                    yield agent_ids[task], task.result()
+        finally:
+            # Client disconnects cancel the request; take the agents down with it
+            for task in tasks.values():
+                if not task.done():
+                    task.cancel()
+
+    async def run(self, query, context: Optional[dict] = None) -> Dict[str, Any]:
+        # Returns agent responses in declaration order and the wall-clock time
+        started = time.perf_counter()
+        responses = {agent_id: response async for agent_id, response in self.stream(query, context)}
+        return {
+            "responses": [responses[agent_id] for agent_id in self.specs],
+            "execution_time": round(time.perf_counter() - started, 6),
+        }
@@ -0,0 +1,35 @@
+from typing import Any, Callable, Dict, Hashable, List, Sequence, Tuple, Type
+
+from fastapi import HTTPException
+
+# Shared helpers for the batch endpoints
+#
+# A batch runs every distinct item once (items are deduplicated by a key that
+# determines the result) and answers in input order. Failures are reported
+# per item as {"result": null, "error": "..."}, so one bad query does not fail
+# the whole batch.
+
+MAX_BATCH_SIZE = 10000
+
+
+def check_batch_size(items: Sequence):
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"Batches are limited to {MAX_BATCH_SIZE} items")
+
+
+def run_batch(items: Sequence, key: Callable[[Any], Hashable], run: Callable[[Any], Any],
+              errors: Tuple[Type[Exception], ...] = (ValueError,)) -> List[Dict[str, Any]]:
+    check_batch_size(items)
+    outcomes: Dict[Hashable, Dict[str, Any]] = {}
+    results = []
+    for item in items:
+        item_key = key(item)
+        outcome = outcomes.get(item_key)
+        if outcome is None:
+            try:
+                outcome = {"result": run(item), "error": None}
+            except errors as exc:
+                outcome = {"result": None, "error": str(exc)}
+            outcomes[item_key] = outcome
+        results.append(outcome)
+    return results
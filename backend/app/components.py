@@ -0,0 +1,156 @@
+from typing import Dict, Optional
+
+import numpy as np
+
+from app.graph_store import NODE_DTYPE, OUT, GraphStore
+
+# Connected components (fraud rings) over the graph store
+#
+# The initial build is vectorized min-label hooking with pointer jumping over
+# all RELATED_TO/CONNECTS_FROM edges. Afterwards the same parent array is a
+# union-find forest: new edges are merged with union + path compression, so
+# components update incrementally without a full recompute. Roots are always
+# the smallest node index in their component, which keeps ring IDs stable.
+
+RING_RELATIONSHIP_TYPES = ("RELATED_TO", "CONNECTS_FROM")
+
+# Batches at least this large are merged with the vectorized hooking pass
+VECTORIZED_UNION_THRESHOLD = 4096
+
+
+def _compress(parent):
+    # Pointer jumping until every entry points at its root
+    while True:
+        grandparent = parent[parent]
+        if np.array_equal(grandparent, parent):
+            return parent
+        parent = grandparent
+
+
+def _hook(parent, src, dst):
+    # Min-label hooking of the roots of each edge's endpoints, then compression.
+    # parent[x] is only x's root in a compressed forest; union() leaves chains
+    # behind, so the forest is compressed before the first hook
+    parent = _compress(parent)
+    while len(src):
+        root_src = parent[src]
+        root_dst = parent[dst]
+        pending = root_src != root_dst
+        if not pending.any():
+            break
+        root_src, root_dst = root_src[pending], root_dst[pending]
+        src, dst = src[pending], dst[pending]
+        smaller = np.minimum(root_src, root_dst)
+        np.minimum.at(parent, root_src, smaller)
+        np.minimum.at(parent, root_dst, smaller)
+        parent = _compress(parent)
+    return parent
+
+
+class ConnectedComponents:
+    def __init__(self, store: GraphStore, rel_types=RING_RELATIONSHIP_TYPES):
+        self.store = store
+        self.rel_types = tuple(rel_types)
+        self.parent = np.arange(store.node_count, dtype=NODE_DTYPE)
+        self.edge_watermark = 0
+        # Bumped on every merge so cached summaries know when to refresh
+        self.version = 0
+        self._rings_cache = None
+
+    def build(self):
+        # Full vectorized pass over every relationship currently in the store
+        src, dst = self.store.edges_since(0, self.rel_types)
+        self.parent = _hook(np.arange(self.store.node_count, dtype=NODE_DTYPE), src, dst)
+        self.edge_watermark = self.store.relationship_count
+        self.version += 1
+        return self
+
+    def _grow(self):
+        # New nodes start as singleton components
+        count = self.store.node_count
+        if len(self.parent) >= count:
+            return False
+        self.parent = np.concatenate((self.parent, np.arange(len(self.parent), count, dtype=NODE_DTYPE)))
+        return True
+
+    def find(self, node):
+        parent = self.parent
+        root = node
+        while parent[root] != root:
+            root = parent[root]
+        # Path compression
+        while parent[node] != root:
+            parent[node], node = root, parent[node]
+        return int(root)
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return False
+        if root_a < root_b:
+            self.parent[root_b] = root_a
+        else:
+            self.parent[root_a] = root_b
+        return True
+
+    def add_edges(self, src, dst):
+        # Merge a batch of new edges into the existing components
+        grown = self._grow()
+        src = np.asarray(src, dtype=NODE_DTYPE)
+        dst = np.asarray(dst, dtype=NODE_DTYPE)
+        if len(src) >= VECTORIZED_UNION_THRESHOLD:
+            self.parent = _hook(self.parent, src, dst)
+            changed = True
+        else:
+            changed = False
+            for a, b in zip(src.tolist(), dst.tolist()):
+                changed |= self.union(a, b)
+        if changed or grown:
+            self.version += 1
+
+    def sync(self):
+        # Fold in relationships appended to the store since the last build/sync
+        total = self.store.relationship_count
+        if self.edge_watermark < total or len(self.parent) < self.store.node_count:
+            src, dst = self.store.edges_since(self.edge_watermark, self.rel_types)
+            self.edge_watermark = total
+            self.add_edges(src, dst)
+        return self
+
+    def roots(self):
+        if self._grow():
+            self.version += 1
+        self.parent = _compress(self.parent)
+        return self.parent
+
+    def ring_id(self, node):
+        return f"ring-{self.store.node_id(self.find(node))}"
+
+    def rings(self, label="Account", min_size=2) -> Dict[int, np.ndarray]:
+        # Root -> member nodes carrying `label`, for components with >= min_size of them
+        self.sync()
+        roots = self.roots()
+        key = (self.version, label, min_size)
+        if self._rings_cache is not None and self._rings_cache[0] == key:
+            return self._rings_cache[1]
+        nodes = self.store.nodes_with_label(label)
+        roots = roots[nodes]
+        order = np.argsort(roots, kind="stable")
+        nodes, roots = nodes[order], roots[order]
+        boundaries = np.flatnonzero(np.diff(roots)) + 1
+        rings = {}
+        for members in np.split(nodes, boundaries):
+            if len(members) >= min_size:
+                rings[int(self.parent[members[0]])] = members
+        self._rings_cache = (key, rings)
+        return rings
+
+    def max_relationship_property(self, members, rel_type, key, default=0.0) -> Optional[float]:
+        # Largest property value over `rel_type` edges leaving the given members
+        best = None
+        for node in members.tolist():
+            for edge in self.store.expand(node, rel_type, OUT)[1].tolist():
+                value = self.store.relationship_property(edge, key)
+                if value is not None and (best is None or value > best):
+                    best = value
+        return default if best is None else best
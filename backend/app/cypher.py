@@ -0,0 +1,654 @@
+import itertools
+import operator
+import re
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.graph_store import BOTH, IN, MISSING, OUT
+from app.paths import DEFAULT_MAX_EXPANSIONS
+
+# Cypher subset compiled into executable plans over the graph store
+#
+# Supported shape:
+#   MATCH (a:Account {prop: value})-[r:TYPE|OTHER*1..3]->(b:Label)
+#   WHERE a.prop = $param AND b.other IN [...]
+#   RETURN a, b [LIMIT n]
+#
+# Plans are independent of parameter values and of the store, so they are
+# cached by normalized query text and reused across requests.
+#
+# Variable-length relationships are walked depth first. Every relationship
+# the walks traverse counts against one `max_expansions` budget per
+# execution, like PathSearch; when it runs out the walks stop and the
+# result reports `truncated`.
+
+
+class CypherError(ValueError):
+    pass
+
+
+# Depth used for unbounded variable-length relationships such as [:RELATED_TO*]
+MAX_VAR_LENGTH = 8
+
+# Number of compiled plans kept in the LRU cache
+PLAN_CACHE_SIZE = 512
+
+_KEYWORDS = {"MATCH", "WHERE", "RETURN", "LIMIT", "AND", "OR", "NOT", "IN", "AS", "DISTINCT",
+             "STARTS", "ENDS", "WITH", "CONTAINS", "TRUE", "FALSE", "NULL"}
+
+_TOKEN_RE = re.compile(r"""
+    (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+  | (?P<number>\d+\.\d+|\d+)
+  | (?P<param>\$[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*|`[^`]+`)
+  | (?P<symbol>->|<-|\.\.|<>|<=|>=|!=|[()\[\]{}:,.\-=<>*|])
+""", re.VERBOSE)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Collapses whitespace outside string literals
+_NORMALIZE_RE = re.compile(r"""('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")|\s+""")
+
+_COMPARISONS = {
+    "=": operator.eq,
+    "<>": operator.ne,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "IN": lambda value, options: value in options,
+    "STARTS WITH": lambda value, prefix: isinstance(value, str) and value.startswith(prefix),
+    "ENDS WITH": lambda value, suffix: isinstance(value, str) and value.endswith(suffix),
+    "CONTAINS": lambda value, part: isinstance(value, str) and part in value,
+}
+
+_REVERSED = {OUT: IN, IN: OUT, BOTH: BOTH}
+
+
+class Parameter:
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f"${self.name}"
+
+
+def _resolve(value, parameters):
+    if isinstance(value, Parameter):
+        if value.name not in parameters:
+            raise CypherError(f"Expected parameter: ${value.name}")
+        return parameters[value.name]
+    if isinstance(value, list):
+        return [_resolve(item, parameters) for item in value]
+    return value
+
+
+class NodePattern:
+    __slots__ = ("var", "labels", "properties")
+
+    def __init__(self, var, labels, properties):
+        self.var = var
+        self.labels = labels
+        self.properties = properties
+
+
+class RelPattern:
+    __slots__ = ("var", "types", "direction", "min_hops", "max_hops", "properties")
+
+    def __init__(self, var, types, direction, min_hops, max_hops, properties):
+        self.var = var
+        self.types = types
+        self.direction = direction
+        self.min_hops = min_hops
+        self.max_hops = max_hops
+        self.properties = properties
+
+    @property
+    def variable_length(self):
+        return not (self.min_hops == 1 and self.max_hops == 1)
+
+
+class Predicate:
+    __slots__ = ("var", "key", "op", "value")
+
+    def __init__(self, var, key, op, value):
+        self.var = var
+        self.key = key
+        self.op = op
+        self.value = value
+
+
+class ParsedQuery:
+    __slots__ = ("nodes", "rels", "predicates", "returns", "limit")
+
+    def __init__(self, nodes, rels, predicates, returns, limit):
+        self.nodes = nodes
+        self.rels = rels
+        self.predicates = predicates
+        self.returns = returns
+        self.limit = limit
+
+
+def tokenize(text):
+    tokens = []
+    position = 0
+    length = len(text)
+    while True:
+        match = _WHITESPACE_RE.match(text, position)
+        if match:
+            position = match.end()
+        if position >= length:
+            break
+        match = _TOKEN_RE.match(text, position)
+        if not match:
+            raise CypherError(f"Invalid input '{text[position]}' at position {position}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "name":
+            if value.startswith("`"):
+                value = value[1:-1]
+            elif value.upper() in _KEYWORDS:
+                kind, value = "keyword", value.upper()
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    def __init__(self, text):
+        self.tokens = tokenize(text)
+        self.position = 0
+
+    # Token helpers
+    def peek(self, offset=0):
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def advance(self):
+        token = self.peek()
+        if token[0] is None:
+            raise CypherError("Unexpected end of query")
+        self.position += 1
+        return token
+
+    def at(self, kind, value=None):
+        token_kind, token_value = self.peek()
+        return token_kind == kind and (value is None or token_value == value)
+
+    def accept(self, kind, value=None):
+        if self.at(kind, value):
+            return self.advance()
+        return None
+
+    def expect(self, kind, value=None):
+        token = self.accept(kind, value)
+        if token is None:
+            found = self.peek()[1]
+            expected = value or kind
+            raise CypherError(f"Expected {expected} but found {found if found is not None else 'end of query'}")
+        return token
+
+    # Grammar
+    def parse(self):
+        self.expect("keyword", "MATCH")
+        nodes, rels = self.parse_pattern()
+        if self.at("symbol", ","):
+            raise CypherError("Multiple MATCH patterns are not supported")
+
+        predicates = []
+        if self.accept("keyword", "WHERE"):
+            predicates.append(self.parse_predicate())
+            while self.accept("keyword", "AND"):
+                predicates.append(self.parse_predicate())
+            if self.at("keyword", "OR"):
+                raise CypherError("OR in WHERE is not supported")
+
+        self.expect("keyword", "RETURN")
+        self.accept("keyword", "DISTINCT")
+        returns = [self.parse_return_item()]
+        while self.accept("symbol", ","):
+            returns.append(self.parse_return_item())
+
+        limit = None
+        if self.accept("keyword", "LIMIT"):
+            if self.at("param"):
+                limit = Parameter(self.advance()[1][1:])
+            else:
+                limit = int(self.expect("number")[1])
+
+        if self.peek()[0] is not None:
+            raise CypherError(f"Unexpected input: {self.peek()[1]}")
+
+        query = ParsedQuery(nodes, rels, predicates, returns, limit)
+        _validate(query)
+        return query
+
+    def parse_pattern(self):
+        nodes = [self.parse_node()]
+        rels = []
+        while self.at("symbol", "-") or self.at("symbol", "<-"):
+            rels.append(self.parse_relationship())
+            nodes.append(self.parse_node())
+        return nodes, rels
+
+    def parse_node(self):
+        self.expect("symbol", "(")
+        var = self.advance()[1] if self.at("name") else None
+        labels = []
+        while self.accept("symbol", ":"):
+            labels.append(self.expect("name")[1])
+        properties = self.parse_properties() if self.at("symbol", "{") else {}
+        self.expect("symbol", ")")
+        return NodePattern(var, tuple(labels), properties)
+
+    def parse_relationship(self):
+        incoming = self.accept("symbol", "<-") is not None
+        if not incoming:
+            self.expect("symbol", "-")
+        self.expect("symbol", "[")
+        var = self.advance()[1] if self.at("name") else None
+        types = []
+        if self.accept("symbol", ":"):
+            types.append(self.expect("name")[1])
+            while self.accept("symbol", "|"):
+                self.accept("symbol", ":")
+                types.append(self.expect("name")[1])
+        min_hops = max_hops = 1
+        if self.accept("symbol", "*"):
+            min_hops, max_hops = 1, MAX_VAR_LENGTH
+            if self.at("number"):
+                min_hops = max_hops = int(self.advance()[1])
+            if self.accept("symbol", ".."):
+                max_hops = int(self.advance()[1]) if self.at("number") else MAX_VAR_LENGTH
+            if min_hops > max_hops:
+                raise CypherError("Invalid variable-length range")
+        properties = self.parse_properties() if self.at("symbol", "{") else {}
+        self.expect("symbol", "]")
+        if self.accept("symbol", "->"):
+            if incoming:
+                raise CypherError("Relationship cannot point in both directions")
+            direction = OUT
+        else:
+            self.expect("symbol", "-")
+            direction = IN if incoming else BOTH
+        return RelPattern(var, tuple(types), direction, min_hops, max_hops, properties)
+
+    def parse_properties(self):
+        self.expect("symbol", "{")
+        properties = {}
+        if not self.at("symbol", "}"):
+            while True:
+                key = self.expect("name")[1]
+                self.expect("symbol", ":")
+                properties[key] = self.parse_value()
+                if not self.accept("symbol", ","):
+                    break
+        self.expect("symbol", "}")
+        return properties
+
+    def parse_value(self):
+        kind, value = self.advance()
+        if kind == "string":
+            return _unquote(value)
+        if kind == "number":
+            return float(value) if "." in value else int(value)
+        if kind == "param":
+            return Parameter(value[1:])
+        if kind == "keyword" and value in ("TRUE", "FALSE"):
+            return value == "TRUE"
+        if kind == "keyword" and value == "NULL":
+            return None
+        if kind == "symbol" and value == "-" and self.at("number"):
+            number = self.advance()[1]
+            return -(float(number) if "." in number else int(number))
+        if kind == "symbol" and value == "[":
+            items = []
+            if not self.at("symbol", "]"):
+                items.append(self.parse_value())
+                while self.accept("symbol", ","):
+                    items.append(self.parse_value())
+            self.expect("symbol", "]")
+            return items
+        raise CypherError(f"Expected a value but found {value}")
+
+    def parse_predicate(self):
+        var = self.expect("name")[1]
+        self.expect("symbol", ".")
+        key = self.expect("name")[1]
+        if self.at("symbol") and self.peek()[1] in _COMPARISONS:
+            op = self.advance()[1]
+        elif self.accept("keyword", "IN"):
+            op = "IN"
+        elif self.accept("keyword", "CONTAINS"):
+            op = "CONTAINS"
+        elif self.at("keyword", "STARTS") or self.at("keyword", "ENDS"):
+            op = self.advance()[1] + " WITH"
+            self.expect("keyword", "WITH")
+        else:
+            raise CypherError(f"Unsupported operator: {self.peek()[1]}")
+        return Predicate(var, key, op, self.parse_value())
+
+    def parse_return_item(self):
+        if self.accept("symbol", "*"):
+            return "*"
+        var = self.expect("name")[1]
+        # Property projections return the owning node or relationship
+        if self.accept("symbol", "."):
+            self.expect("name")
+        if self.accept("keyword", "AS"):
+            self.expect("name")
+        return var
+
+
+def _unquote(literal):
+    body = literal[1:-1]
+    if "\\" not in body:
+        return body
+    return re.sub(r"\\(.)", lambda match: {"n": "\n", "t": "\t"}.get(match.group(1), match.group(1)), body)
+
+
+def _validate(query):
+    defined = {node.var for node in query.nodes if node.var}
+    defined.update(rel.var for rel in query.rels if rel.var)
+    for predicate in query.predicates:
+        if predicate.var not in defined:
+            raise CypherError(f"Variable `{predicate.var}` not defined")
+    for var in query.returns:
+        if var != "*" and var not in defined:
+            raise CypherError(f"Variable `{var}` not defined")
+    for rel in query.rels:
+        if rel.var and rel.var in {node.var for node in query.nodes}:
+            raise CypherError(f"Variable `{rel.var}` already declared as a node")
+
+
+class QueryResult:
+    # Node and relationship indices into the store, materialized on demand
+
+    __slots__ = ("nodes", "relationships", "truncated")
+
+    def __init__(self, nodes, relationships, truncated=False):
+        self.nodes = nodes
+        self.relationships = relationships
+        self.truncated = truncated
+
+    def to_dict(self, store):
+        return {
+            "nodes": store.node_records(self.nodes),
+            "relationships": store.relationship_records(self.relationships),
+            "truncated": self.truncated,
+        }
+
+
+class _Budget:
+    # Relationships variable-length walks may still traverse in one execution
+
+    __slots__ = ("remaining", "truncated")
+
+    def __init__(self, max_expansions):
+        self.remaining = max_expansions
+        self.truncated = False
+
+
+class Plan:
+    # Executable form of a parsed query: an anchor seek followed by expand steps
+
+    def __init__(self, query: ParsedQuery):
+        self.query = query
+        self.slot_count = 2 * len(query.nodes) - 1
+
+        # Slot layout: node i lives at 2*i, relationship i at 2*i + 1
+        self.var_slots: Dict[str, List[int]] = {}
+        for i, node in enumerate(query.nodes):
+            if node.var:
+                self.var_slots.setdefault(node.var, []).append(2 * i)
+        for i, rel in enumerate(query.rels):
+            if rel.var:
+                self.var_slots.setdefault(rel.var, []).append(2 * i + 1)
+
+        # Push every WHERE predicate down to the slot that binds its variable
+        self.slot_predicates: Dict[int, List[Predicate]] = {}
+        for predicate in query.predicates:
+            slot = self.var_slots[predicate.var][0]
+            self.slot_predicates.setdefault(slot, []).append(predicate)
+
+        self.anchor = self._choose_anchor()
+
+        # Expand outward from the anchor: first to the right, then to the left
+        self.steps: List[Tuple[int, int, bool]] = []
+        for i in range(self.anchor, len(query.nodes) - 1):
+            self.steps.append((i, i + 1, False))
+        for i in range(self.anchor, 0, -1):
+            self.steps.append((i, i - 1, True))
+
+        if "*" in query.returns:
+            self.return_slots = sorted(slot for slots in self.var_slots.values() for slot in slots)
+        else:
+            self.return_slots = sorted({slot for var in query.returns for slot in self.var_slots[var]})
+
+    def _equalities(self, position):
+        node = self.query.nodes[position]
+        equalities = list(node.properties.items())
+        equalities.extend(
+            (predicate.key, predicate.value)
+            for predicate in self.slot_predicates.get(2 * position, ())
+            if predicate.op == "="
+        )
+        return equalities
+
+    def _choose_anchor(self):
+        # Prefer nodes with an equality filter, then labelled nodes
+        best, best_score = 0, -1
+        for position, node in enumerate(self.query.nodes):
+            score = 2 if self._equalities(position) else 1 if node.labels else 0
+            if score > best_score:
+                best, best_score = position, score
+        return best
+
+    # Execution
+    def execute(self, store, parameters=None, max_expansions=DEFAULT_MAX_EXPANSIONS) -> QueryResult:
+        parameters = parameters or {}
+        filters = self._bind_filters(parameters)
+        limit = _resolve(self.query.limit, parameters)
+        budget = _Budget(max_expansions)
+
+        rows = self._seek(store, filters)
+        for source, target, reverse in self.steps:
+            rows = self._expand(store, rows, source, target, reverse, filters, budget)
+        if limit is not None:
+            rows = itertools.islice(rows, int(limit))
+        result = self._collect(store, rows)
+        result.truncated = budget.truncated
+        return result
+
+    def _bind_filters(self, parameters):
+        # Per-slot (labels, [(key, op, value)]) with parameters substituted
+        filters = {}
+        for position, node in enumerate(self.query.nodes):
+            checks = [(key, "=", _resolve(value, parameters)) for key, value in node.properties.items()]
+            filters[2 * position] = (node.labels, checks)
+        for position, rel in enumerate(self.query.rels):
+            checks = [(key, "=", _resolve(value, parameters)) for key, value in rel.properties.items()]
+            filters[2 * position + 1] = ((), checks)
+        for slot, predicates in self.slot_predicates.items():
+            filters[slot][1].extend(
+                (predicate.key, predicate.op, _resolve(predicate.value, parameters))
+                for predicate in predicates
+            )
+        return filters
+
+    def _seek(self, store, filters):
+        slot = 2 * self.anchor
+        labels, checks = filters[slot]
+        candidates = None
+        for key, op, value in checks:
+            if op != "=":
+                continue
+            for label in labels:
+                if store.has_index(label, key):
+                    candidates = store.find_nodes(label, key, value)
+                    break
+            if candidates is not None:
+                break
+        if candidates is None:
+            candidates = store.nodes_with_label(labels[0]) if labels else np.arange(store.node_count)
+
+        for node in candidates.tolist():
+            if _node_matches(store, node, labels, checks):
+                row = [None] * self.slot_count
+                row[slot] = node
+                yield row
+
+    def _expand(self, store, rows, source, target, reverse, filters, budget):
+        rel_position = min(source, target)
+        rel = self.query.rels[rel_position]
+        rel_slot = 2 * rel_position + 1
+        direction = _REVERSED[rel.direction] if reverse else rel.direction
+        types = rel.types or tuple(store.relationship_types)
+        _, rel_checks = filters[rel_slot]
+        target_slot = 2 * target
+        target_labels, target_checks = filters[target_slot]
+        target_var = self.query.nodes[target].var
+        same_var_slots = [slot for slot in self.var_slots.get(target_var, ()) if slot != target_slot]
+
+        for row in rows:
+            used = _used_edges(row)
+            start = row[2 * source]
+            if rel.variable_length:
+                matches = _variable_length(store, start, types, direction, rel, rel_checks, used, budget)
+            else:
+                matches = _single_hop(store, start, types, direction, rel_checks, used)
+            for node, edges in matches:
+                if not _node_matches(store, node, target_labels, target_checks):
+                    continue
+                if any(row[slot] is not None and row[slot] != node for slot in same_var_slots):
+                    continue
+                new_row = row[:]
+                new_row[target_slot] = node
+                new_row[rel_slot] = edges
+                yield new_row
+
+    def _collect(self, store, rows):
+        nodes: Dict[int, None] = {}
+        edges = set()
+        for row in rows:
+            for slot in self.return_slots:
+                value = row[slot]
+                if slot % 2 == 0:
+                    nodes[value] = None
+                else:
+                    for edge in (value if isinstance(value, tuple) else (value,)):
+                        edges.add(edge)
+                        start, end = store.relationship_endpoints(edge)
+                        nodes[start] = None
+                        nodes[end] = None
+
+        # Connect result nodes: include every relationship between returned nodes
+        types = store.relationship_types
+        for node in nodes:
+            for rel_type in types:
+                targets, rel_ids = store.expand(node, rel_type, OUT)
+                for target, edge in zip(targets.tolist(), rel_ids.tolist()):
+                    if target in nodes:
+                        edges.add(edge)
+        return QueryResult(list(nodes), sorted(edges))
+
+
+def _used_edges(row):
+    used = set()
+    for slot in range(1, len(row), 2):
+        value = row[slot]
+        if value is None:
+            continue
+        if isinstance(value, tuple):
+            used.update(value)
+        else:
+            used.add(value)
+    return used
+
+
+def _property_matches(value, op, expected):
+    if value is MISSING or value is None or expected is None:
+        return False
+    try:
+        return bool(_COMPARISONS[op](value, expected))
+    except TypeError:
+        return False
+
+
+def _node_matches(store, node, labels, checks):
+    for label in labels:
+        if not store.has_label(node, label):
+            return False
+    for key, op, expected in checks:
+        if not _property_matches(store.node_property(node, key, MISSING), op, expected):
+            return False
+    return True
+
+
+def _relationship_matches(store, edge, checks):
+    for key, op, expected in checks:
+        if not _property_matches(store.relationship_property(edge, key, MISSING), op, expected):
+            return False
+    return True
+
+
+def _single_hop(store, start, types, direction, checks, used):
+    for rel_type in types:
+        targets, edges = store.expand(start, rel_type, direction)
+        for target, edge in zip(targets.tolist(), edges.tolist()):
+            if edge in used or not _relationship_matches(store, edge, checks):
+                continue
+            yield target, edge
+
+
+def _variable_length(store, start, types, direction, rel, checks, used, budget):
+    # Depth-first walk that never reuses a relationship within one path and
+    # stops once the execution's expansion budget is spent
+    if rel.min_hops == 0:
+        yield start, ()
+    stack = [(start, ())]
+    while stack:
+        node, path = stack.pop()
+        for target, edge in _single_hop(store, node, types, direction, checks, used):
+            if budget.remaining <= 0:
+                budget.truncated = True
+                return
+            budget.remaining -= 1
+            if edge in path:
+                continue
+            extended = path + (edge,)
+            if len(extended) >= rel.min_hops:
+                yield target, extended
+            if len(extended) < rel.max_hops:
+                stack.append((target, extended))
+
+
+def normalize_query(text):
+    return _NORMALIZE_RE.sub(lambda match: match.group(1) or " ", text).strip()
+
+
+def parse_query(text) -> ParsedQuery:
+    return _Parser(text).parse()
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _compile_normalized(normalized) -> Plan:
+    return Plan(parse_query(normalized))
+
+
+def compile_query(text) -> Plan:
+    # Compiled plans are cached by normalized text; parameters bind at execute time
+    return _compile_normalized(normalize_query(text))
+
+
+def plan_cache_info():
+    return _compile_normalized.cache_info()
+
+
+def clear_plan_cache():
+    _compile_normalized.cache_clear()
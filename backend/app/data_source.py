@@ -0,0 +1,76 @@
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from app.fast_json import loads
+
+# File-backed data sources for the sample data
+#
+# Each file is parsed once and kept in memory. On access the file is stat()ed
+# and only re-parsed when its mtime or size changes. Reloads are serialized by
+# a lock and publish a fully built value in one assignment, so concurrent
+# readers always see either the old or the new data, never a partial load.
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+class JsonFileSource:
+    def __init__(self, path, key: Optional[str] = None):
+        self.path = path
+        self.key = key
+        self.version = 0
+        self._lock = threading.Lock()
+        self._signature: Optional[Tuple[int, int]] = None
+        self._value: Any = None
+
+    def _stat(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self, signature):
+        with open(self.path, "rb") as f:
+            data = loads(f.read())
+        # Publish the value before the signature so readers never pair a new
+        # signature with stale data
+        self._value = data[self.key] if self.key else data
+        self._signature = signature
+        self.version += 1
+
+    def get(self):
+        signature = self._stat()
+        if signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    self._load(signature)
+        return self._value
+
+    def reload(self):
+        with self._lock:
+            self._load(self._stat())
+        return self._value
+
+
+class SampleDataSource:
+    # accounts.json, clusters.json and graph.json behind one cached accessor
+
+    def __init__(self, data_path=DATA_PATH):
+        self.sources: Dict[str, JsonFileSource] = {
+            name: JsonFileSource(os.path.join(data_path, f"{name}.json"), key=name)
+            for name in ("accounts", "clusters", "graph")
+        }
+
+    def load(self):
+        # Parse the files not parsed yet (or changed since); safe to call from
+        # several startup hooks
+        return self.get()
+
+    def get(self):
+        return {name: source.get() for name, source in self.sources.items()}
+
+    @property
+    def version(self):
+        # Changes whenever any underlying file is re-parsed
+        return tuple(source.version for source in self.sources.values())
+
+
+sample_data = SampleDataSource()
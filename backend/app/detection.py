@@ -0,0 +1,255 @@
+from array import array
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Shared-IP fraud cluster detection
+#
+# Login events are held as columnar arrays of integer codes (account, ip) and
+# epoch seconds. Detection is a single sort by (ip, time) followed by
+# vectorized passes: consecutive logins on the same IP that are at most
+# `window` seconds apart form one burst, and bursts touching at least
+# `min_accounts` distinct accounts become FraudCluster records. There is no
+# pairwise comparison of accounts anywhere.
+#
+# LoginLog is the append-only form of the same columns for a live stream:
+# ingestion appends each batch and re-runs detection over the logins of the
+# IPs the batch touched (bursts never span IPs) from one window before the
+# batch's earliest login on.
+
+# Logins on one IP that are this many seconds apart or less chain into a burst
+DEFAULT_WINDOW = 600
+
+# Minimum distinct accounts for a burst to be reported as a cluster
+DEFAULT_MIN_ACCOUNTS = 2
+
+# Clusters above this size get star-shaped RELATED_TO edges instead of all pairs
+MAX_PAIRWISE_ACCOUNTS = 50
+
+
+def parse_timestamp(value):
+    # ISO-8601 with a trailing Z, as used throughout the sample data
+    return int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp())
+
+
+def parse_timestamps(values) -> np.ndarray:
+    # Epoch seconds for a batch; numpy parses the common UTC "...Z" form in
+    # one pass, anything else (offsets, fractions) goes through parse_timestamp
+    values = list(values)
+    if all(value.endswith("Z") for value in values):
+        try:
+            return np.array([value[:-1] for value in values], dtype="datetime64[s]").astype(np.int64)
+        except ValueError:
+            pass
+    return np.array([parse_timestamp(value) for value in values], dtype=np.int64)
+
+
+def format_timestamp(seconds):
+    return datetime.fromtimestamp(int(seconds), tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class LoginEvents:
+    # Columnar login stream: codes index into account_ids / ip_addresses
+
+    def __init__(self, accounts, ips, times, account_ids, ip_addresses):
+        self.accounts = np.asarray(accounts, dtype=np.int32)
+        self.ips = np.asarray(ips, dtype=np.int32)
+        self.times = np.asarray(times, dtype=np.int64)
+        self.account_ids = account_ids
+        self.ip_addresses = ip_addresses
+
+    def __len__(self):
+        return len(self.times)
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict], account_key="id", ip_key="ip", time_key="loginTime"):
+        account_codes: Dict[str, int] = {}
+        ip_codes: Dict[str, int] = {}
+        accounts, ips, times = [], [], []
+        for record in records:
+            accounts.append(account_codes.setdefault(record[account_key], len(account_codes)))
+            ips.append(ip_codes.setdefault(record[ip_key], len(ip_codes)))
+            times.append(parse_timestamp(record[time_key]))
+        return cls(accounts, ips, times, list(account_codes), list(ip_codes))
+
+
+class LoginLog:
+    # Growable columnar login stream; codes are assigned in arrival order
+
+    def __init__(self):
+        self.account_codes: Dict[str, int] = {}
+        self.ip_codes: Dict[str, int] = {}
+        self.account_ids: List[str] = []
+        self.ip_addresses: List[str] = []
+        self.accounts = array("i")
+        self.ips = array("i")
+        self.times = array("q")
+
+    def __len__(self):
+        return len(self.times)
+
+    def extend(self, account_ids, ips, login_times):
+        for account_id in account_ids:
+            account = self.account_codes.get(account_id)
+            if account is None:
+                account = self.account_codes[account_id] = len(self.account_ids)
+                self.account_ids.append(account_id)
+            self.accounts.append(account)
+        for ip in ips:
+            code = self.ip_codes.get(ip)
+            if code is None:
+                code = self.ip_codes[ip] = len(self.ip_addresses)
+                self.ip_addresses.append(ip)
+            self.ips.append(code)
+        times = parse_timestamps(login_times)
+        self.times.frombytes(times.tobytes())
+        return times
+
+    def events(self, ips: Optional[Iterable[str]] = None, since=None) -> LoginEvents:
+        # Every login, or only those on the given IP addresses and at or after
+        # `since` (epoch seconds)
+        accounts = np.frombuffer(self.accounts, dtype=np.int32)
+        codes = np.frombuffer(self.ips, dtype=np.int32)
+        times = np.frombuffer(self.times, dtype=np.int64)
+        if since is not None:
+            keep = np.flatnonzero(times >= since)
+            accounts, codes, times = accounts[keep], codes[keep], times[keep]
+        if ips is not None:
+            wanted = [self.ip_codes[ip] for ip in ips if ip in self.ip_codes]
+            keep = np.isin(codes, wanted)
+            accounts, codes, times = accounts[keep], codes[keep], times[keep]
+        # The id lists are shared, not copied: they only ever grow
+        return LoginEvents(accounts.copy(), codes.copy(), times.copy(), self.account_ids, self.ip_addresses)
+
+
+class ClusterResult:
+    # Columnar detection output; members are stored CSR-style per cluster
+
+    def __init__(self, events, ips, starts, ends, event_counts, member_offsets, members, confidence):
+        self.events = events
+        self.ips = ips
+        self.starts = starts
+        self.ends = ends
+        self.event_counts = event_counts
+        self.member_offsets = member_offsets
+        self.members = members
+        self.confidence = confidence
+
+    def __len__(self):
+        return len(self.ips)
+
+    def member_codes(self, cluster):
+        return self.members[self.member_offsets[cluster]:self.member_offsets[cluster + 1]]
+
+    def account_ids(self, cluster):
+        ids = self.events.account_ids
+        return [ids[code] for code in self.member_codes(cluster).tolist()]
+
+    def cluster_id(self, cluster):
+        return f"cluster-{self.events.ip_addresses[self.ips[cluster]]}-{int(self.starts[cluster])}"
+
+    def to_records(self, accounts_by_id: Optional[Dict[str, dict]] = None):
+        # FraudCluster-shaped dicts; accounts are looked up by id when given
+        records = []
+        for cluster in range(len(self)):
+            member_ids = self.account_ids(cluster)
+            if accounts_by_id is not None:
+                accounts = [accounts_by_id[account_id] for account_id in member_ids if account_id in accounts_by_id]
+            else:
+                accounts = [{"id": account_id} for account_id in member_ids]
+            records.append({
+                "id": self.cluster_id(cluster),
+                "ip": self.events.ip_addresses[self.ips[cluster]],
+                "accounts": accounts,
+                "timestamp": format_timestamp(self.ends[cluster]),
+                "confidence": float(self.confidence[cluster]),
+            })
+        return records
+
+    def related_pairs(self):
+        # (account_id, account_id, confidence) for RELATED_TO edges inside clusters
+        for cluster in range(len(self)):
+            member_ids = self.account_ids(cluster)
+            confidence = float(self.confidence[cluster])
+            if len(member_ids) <= MAX_PAIRWISE_ACCOUNTS:
+                for i, source in enumerate(member_ids):
+                    for target in member_ids[i + 1:]:
+                        yield source, target, confidence
+            else:
+                hub = member_ids[0]
+                for target in member_ids[1:]:
+                    yield hub, target, confidence
+
+
+def _sort_by_ip_time(ips, times):
+    # One int64 composite key when time offsets fit in 32 bits, else lexsort
+    if len(times) == 0:
+        return np.empty(0, dtype=np.int64)
+    base = times.min()
+    span = int(times.max() - base)
+    if span < (1 << 32):
+        keys = (ips.astype(np.int64) << 32) | (times - base)
+        return np.argsort(keys)
+    return np.lexsort((times, ips))
+
+
+def confidence_score(distinct_accounts, event_counts, spans, window):
+    # More distinct accounts and tighter bursts both push confidence towards 1
+    tightness = 1.0 - np.clip(spans / (window * np.maximum(event_counts, 1)), 0.0, 1.0)
+    return np.round(1.0 - np.exp(-1.5 * (distinct_accounts - 1) * tightness), 4)
+
+
+def detect_clusters(events: LoginEvents, window=DEFAULT_WINDOW, min_accounts=DEFAULT_MIN_ACCOUNTS) -> ClusterResult:
+    order = _sort_by_ip_time(events.ips, events.times)
+    ips = events.ips[order]
+    times = events.times[order]
+    accounts = events.accounts[order]
+    del order
+
+    # A burst starts at every IP change or time gap larger than the window
+    breaks = np.empty(len(times), dtype=bool)
+    if len(times):
+        breaks[0] = True
+        np.not_equal(ips[1:], ips[:-1], out=breaks[1:])
+        breaks[1:] |= (times[1:] - times[:-1]) > window
+    burst_starts = np.flatnonzero(breaks)
+    burst_of_event = np.cumsum(breaks) - 1
+    del breaks
+    event_counts = np.diff(np.append(burst_starts, len(times)))
+
+    # Bursts with fewer events than min_accounts can never qualify
+    candidate = event_counts >= min_accounts
+    keep = candidate[burst_of_event]
+    burst_of_event = burst_of_event[keep]
+    accounts = accounts[keep]
+
+    # Distinct (burst, account) pairs via one sort of a composite key
+    account_space = np.int64(max(len(events.account_ids), int(accounts.max()) + 1 if len(accounts) else 1))
+    pairs = np.unique(burst_of_event.astype(np.int64) * account_space + accounts)
+    pair_bursts = pairs // account_space
+    pair_accounts = (pairs % account_space).astype(np.int32)
+    distinct = np.bincount(pair_bursts, minlength=len(burst_starts))
+
+    qualifying = np.flatnonzero(distinct >= min_accounts)
+    burst_ends = np.append(burst_starts[1:], len(times)) - 1
+    starts = times[burst_starts[qualifying]]
+    ends = times[burst_ends[qualifying]]
+    counts = event_counts[qualifying]
+    distinct_counts = distinct[qualifying]
+
+    members = pair_accounts[(distinct >= min_accounts)[pair_bursts]]
+    member_offsets = np.zeros(len(qualifying) + 1, dtype=np.int64)
+    np.cumsum(distinct_counts, out=member_offsets[1:])
+
+    return ClusterResult(
+        events,
+        ips[burst_starts[qualifying]],
+        starts,
+        ends,
+        counts,
+        member_offsets,
+        members,
+        confidence_score(distinct_counts, counts, (ends - starts).astype(np.float64), window),
+    )
+
@@ -0,0 +1,119 @@
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Iterable, List
+
+import numpy as np
+
+# Text embeddings for retrieval
+#
+# Embedder is the pluggable interface: `dim` plus `encode(texts)` returning a
+# (len(texts), dim) float32 matrix. `encode_query` memoizes single-query
+# encodings in an LRU, since analysts repeat the same questions.
+#
+# The offline default, HashedNgramEmbedder, hashes character n-grams of the
+# lowercased, space-padded UTF-8 text into `dim` signed buckets (the hashing
+# trick). Batches are encoded with array operations: texts are joined into
+# one byte array, every n-gram hash is computed at once with a rolling hash
+# over shifted views, and one bincount scatters the signed counts into the
+# output matrix.
+# Hashes use fixed 64-bit arithmetic, so vectors are identical across
+# processes and machines, with no model download or network access.
+
+EMBEDDING_DIM = 256
+# Character n-gram sizes; all must be at least 2
+DEFAULT_NGRAMS = (2, 3, 4)
+QUERY_CACHE_SIZE = 4096
+
+# Bytes of text hashed per array pass; larger chunks fall out of CPU cache
+ENCODE_CHUNK_BYTES = 4096
+
+_PRIME = np.uint64(0x100000001B3)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+class Embedder(ABC):
+    dim: int
+
+    def __init__(self, cache_size=QUERY_CACHE_SIZE):
+        self._cached_query = lru_cache(maxsize=cache_size)(self._encode_query)
+
+    @abstractmethod
+    def encode(self, texts: Iterable[str]) -> np.ndarray:
+        ...
+
+    def _encode_query(self, text):
+        vector = self.encode([text])[0]
+        # Cached arrays are shared between callers
+        vector.setflags(write=False)
+        return vector
+
+    def encode_query(self, text: str) -> np.ndarray:
+        return self._cached_query(text)
+
+    def cache_info(self):
+        return self._cached_query.cache_info()
+
+
+class HashedNgramEmbedder(Embedder):
+    def __init__(self, dim=EMBEDDING_DIM, ngrams=DEFAULT_NGRAMS, cache_size=QUERY_CACHE_SIZE):
+        super().__init__(cache_size)
+        self.dim = dim
+        self.ngrams = tuple(ngrams)
+
+    def encode(self, texts: Iterable[str]) -> np.ndarray:
+        # Space padding makes word edges n-grams; chunks of about
+        # ENCODE_CHUNK_BYTES keep the hashing temporaries cache-resident
+        encoded = [f" {text.lower()} ".encode() for text in texts]
+        matrix = np.zeros((len(encoded), self.dim), dtype=np.float32)
+        start = 0
+        while start < len(encoded):
+            end = start
+            size = 0
+            while end < len(encoded) and (size == 0 or size + len(encoded[end]) <= ENCODE_CHUNK_BYTES):
+                size += len(encoded[end]) + 1
+                end += 1
+            matrix[start:end] = self._encode_chunk(encoded[start:end])
+            start = end
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+        return matrix
+
+    def _encode_chunk(self, encoded: List[bytes]) -> np.ndarray:
+        # One byte array for the chunk, with a 0 byte after every text
+        lengths = np.fromiter((len(chunk) + 1 for chunk in encoded), dtype=np.int64, count=len(encoded))
+        data = np.frombuffer(b"\0".join(encoded) + b"\0", dtype=np.uint8).astype(np.uint64)
+        rows = np.repeat(np.arange(len(encoded), dtype=np.int64), lengths)
+        separator = data == 0
+
+        keys = []
+        signs = []
+        # Rolling polynomial hash: windows of length n are extended to n + 1 by
+        # one multiply-add over shifted views, so all n-gram sizes share passes
+        hashes = data
+        spans_separator = separator
+        for n in range(2, max(self.ngrams) + 1):
+            if len(hashes) <= 1:
+                break
+            hashes = hashes[:-1] * _PRIME + data[n - 1:]
+            spans_separator = spans_separator[:-1] | separator[n - 1:]
+            if n not in self.ngrams:
+                continue
+            valid = np.flatnonzero(~spans_separator)
+            mixed = (hashes[valid] + np.uint64(n)) * _MIX
+            mixed ^= mixed >> np.uint64(29)
+            if self.dim & (self.dim - 1) == 0:
+                buckets = mixed & np.uint64(self.dim - 1)
+            else:
+                buckets = mixed % np.uint64(self.dim)
+            keys.append(rows[valid] * self.dim + buckets.astype(np.int64))
+            signs.append((mixed >> np.uint64(63)).astype(np.float64) * 2.0 - 1.0)
+
+        if not keys:
+            return np.zeros((len(encoded), self.dim), dtype=np.float32)
+        counts = np.bincount(np.concatenate(keys), weights=np.concatenate(signs),
+                             minlength=len(encoded) * self.dim)
+        return counts.reshape(len(encoded), self.dim)
+
+
+default_embedder = HashedNgramEmbedder()
@@ -0,0 +1,71 @@
+import json
+from datetime import date, datetime
+
+from fastapi.responses import Response
+
+# JSON backend selection: orjson when installed, stdlib json otherwise
+#
+# dumps() encodes straight to UTF-8 bytes in the same shape FastAPI's
+# response_model serialization produces for our records (datetimes in ISO
+# format, numpy scalars and arrays as plain numbers and lists).
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+if orjson is not None:
+    BACKEND = "orjson"
+
+    _OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def loads(data):
+        return orjson.loads(data)
+
+    def dumps(value) -> bytes:
+        return orjson.dumps(value, default=_default, option=_OPTIONS)
+else:
+    BACKEND = "json"
+
+    _encode = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, default=_default).encode
+
+    def loads(data):
+        return json.loads(data)
+
+    def dumps(value) -> bytes:
+        return _encode(value).encode()
+
+
+# Fast-path responses
+#
+# Returning a Response from a route makes FastAPI skip response_model
+# validation and serialization, while the route's declared response_model
+# still documents the body in the OpenAPI schema. Use these only for data the
+# server built itself, already in the declared shape.
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        # Pre-encoded bodies are passed through untouched
+        return content if isinstance(content, bytes) else dumps(content)
+
+
+class PreEncoded:
+    # A static payload encoded once; every request gets a new response over the same bytes
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.body = dumps(payload)
+
+    def response(self):
+        return FastJSONResponse(self.body)
@@ -0,0 +1,100 @@
+from typing import Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from app.graph_store import BOTH, GraphStore
+
+# Hybrid GraphRAG fusion: vector hits + graph neighborhoods
+#
+# Every vector hit resolves to one or more seed nodes in the graph store. All
+# seeds are expanded together, hop by hop: each hop gathers the neighbors of
+# the whole frontier with one batched expand_many call and deduplicates
+# (seed, node) pairs with array operations, so a node reached by several
+# paths from the same seed counts once, at its shortest hop distance.
+#
+# Ranking is reciprocal rank fusion. Each seed contributes a ranked list of
+# the nodes it reaches, ordered by hop distance and offset by the rank of the
+# vector hit it came from; a node scores the sum of 1 / (RRF_K + rank) over
+# every list it appears in. Nodes close to several strong hits rank first.
+#
+# `node_budget` caps the (seed, node) pairs gathered per query, so the work
+# stays bounded even when a hop reaches a hub such as a shared IP. Frontier
+# nodes of better-ranked seeds are expanded first when the budget runs out.
+
+DEFAULT_HOPS = 2
+DEFAULT_NODE_BUDGET = 5000
+DEFAULT_TOP_N = 20
+RRF_K = 60
+
+
+def expand_seeds(store: GraphStore, seeds, seed_ranks, hops=DEFAULT_HOPS, node_budget=DEFAULT_NODE_BUDGET,
+                 rel_types: Optional[Sequence[str]] = None, direction=BOTH):
+    # Multi-source BFS. Returns (seed positions, nodes, hop distances) for
+    # every distinct (seed, node) pair reached, seeds themselves at hop 0.
+    seeds = np.asarray(seeds, dtype=np.int64)
+    seed_ranks = np.asarray(seed_ranks, dtype=np.int64)
+    node_count = max(store.node_count, 1)
+    pair_seeds = [np.arange(len(seeds))]
+    pair_nodes = [seeds]
+    pair_hops = [np.zeros(len(seeds), dtype=np.int64)]
+    visited = np.unique(pair_seeds[0] * node_count + seeds)
+    remaining = node_budget - len(seeds)
+
+    # Seeds arrive in rank order, so a stable sort by seed keeps better seeds first
+    frontier_seeds, frontier_nodes = pair_seeds[0], seeds
+    for hop in range(1, hops + 1):
+        if remaining <= 0 or not len(frontier_nodes):
+            break
+        order = np.argsort(seed_ranks[frontier_seeds], kind="stable")
+        frontier_seeds, frontier_nodes = frontier_seeds[order], frontier_nodes[order]
+        origins, neighbors, _ = store.expand_many(frontier_nodes, rel_types, direction, limit=remaining)
+        remaining -= len(neighbors)
+
+        keys = frontier_seeds[origins] * node_count + neighbors
+        keys, first = np.unique(keys, return_index=True)
+        fresh = ~np.isin(keys, visited, assume_unique=True)
+        keys = keys[fresh]
+        if not len(keys):
+            break
+        visited = np.union1d(visited, keys)
+        frontier_seeds, frontier_nodes = keys // node_count, keys % node_count
+        pair_seeds.append(frontier_seeds)
+        pair_nodes.append(frontier_nodes)
+        pair_hops.append(np.full(len(keys), hop, dtype=np.int64))
+
+    return np.concatenate(pair_seeds), np.concatenate(pair_nodes), np.concatenate(pair_hops)
+
+
+def fuse(store: GraphStore, seed_groups: Iterable[Iterable[int]], hops=DEFAULT_HOPS,
+         node_budget=DEFAULT_NODE_BUDGET, rel_types: Optional[Sequence[str]] = None,
+         top_n=DEFAULT_TOP_N, rrf_k=RRF_K) -> List[dict]:
+    # `seed_groups` holds the graph nodes of each vector hit, best hit first
+    seeds, seed_ranks = [], []
+    for rank, group in enumerate(seed_groups):
+        for node in group:
+            seeds.append(node)
+            seed_ranks.append(rank)
+    if not seeds:
+        return []
+    seed_ranks = np.asarray(seed_ranks, dtype=np.int64)
+    pair_seeds, pair_nodes, pair_hops = expand_seeds(store, seeds, seed_ranks, hops, node_budget, rel_types)
+
+    # Reciprocal rank fusion over the per-seed lists (ranks are 1-based)
+    weights = 1.0 / (rrf_k + 1 + seed_ranks[pair_seeds] + pair_hops)
+    nodes, inverse = np.unique(pair_nodes, return_inverse=True)
+    scores = np.bincount(inverse, weights=weights, minlength=len(nodes))
+    reached_by = np.bincount(inverse, minlength=len(nodes))
+    min_hops = np.full(len(nodes), hops + 1, dtype=np.int64)
+    np.minimum.at(min_hops, inverse, pair_hops)
+
+    top = np.argsort(-scores, kind="stable")[:top_n]
+    return [
+        {
+            **store.node_record(int(nodes[i])),
+            "index": int(nodes[i]),
+            "score": round(float(scores[i]), 6),
+            "hops": int(min_hops[i]),
+            "seeds": int(reached_by[i]),
+        }
+        for i in top.tolist()
+    ]
@@ -0,0 +1,559 @@
+import threading
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# In-memory graph store used as the local stand-in for Neo4j
+#
+# Node and relationship IDs are interned to dense integers. Labels, properties
+# and edge endpoints are kept in flat arrays/columns instead of one dict per
+# node, and every relationship type gets CSR-style outgoing and incoming
+# adjacency so a neighbor scan costs O(degree). Appends after a build go to
+# a small delta that is folded into the CSR arrays in amortized batches.
+#
+# `GraphStore.lock` guards writes, delta appends and CSR rebuilds; writers
+# that must look consistent across many calls (a whole ingest batch) hold it
+# for the batch. Reads on the event loop cannot interleave with a batch and
+# stay lock-free; readers in worker threads (graph fusion) hold the lock for
+# their traversal, so they never see a half-applied append. Writers finish a
+# batch with compact(), so no read ever starts a rebuild that could run
+# alongside a reader on the other side.
+
+# Node and edge indices fit in int32; CSR offsets use int64
+NODE_DTYPE = np.int32
+OFFSET_DTYPE = np.int64
+
+OUT = "out"
+IN = "in"
+BOTH = "both"
+
+_EMPTY = np.empty(0, dtype=NODE_DTYPE)
+
+# Edges appended after a CSR build are served from a per-node delta until they
+# exceed this fraction of the built edges (and at least COMPACT_MIN_EDGES)
+COMPACT_RATIO = 0.25
+COMPACT_MIN_EDGES = 4096
+
+
+class _Missing:
+    __slots__ = ()
+
+    def __repr__(self):
+        return "<missing>"
+
+
+# Placeholder for properties a node or relationship does not have
+MISSING = _Missing()
+
+
+class _Columns:
+    # Columnar property storage: one list per property key, padded with MISSING
+
+    __slots__ = ("columns",)
+
+    def __init__(self):
+        self.columns: Dict[str, list] = {}
+
+    def set(self, index, properties):
+        for key, value in properties.items():
+            column = self.columns.get(key)
+            if column is None:
+                column = self.columns[key] = []
+            if len(column) < index:
+                column.extend([MISSING] * (index - len(column)))
+            if len(column) == index:
+                column.append(value)
+            else:
+                column[index] = value
+
+    def get(self, index, key, default=None):
+        column = self.columns.get(key)
+        if column is None or index >= len(column):
+            return default
+        value = column[index]
+        return default if value is MISSING else value
+
+    def row(self, index):
+        return {
+            key: column[index]
+            for key, column in self.columns.items()
+            if index < len(column) and column[index] is not MISSING
+        }
+
+
+class _Adjacency:
+    # Edges of one relationship type: append buffers, CSR arrays over the edges
+    # present at the last build, and a small per-node delta for edges appended
+    # since. The CSR is rebuilt only once the delta outgrows COMPACT_RATIO.
+
+    __slots__ = ("src", "dst", "edges", "out_offsets", "out_nodes", "out_edges",
+                 "in_offsets", "in_nodes", "in_edges", "built_edges", "delta_out", "delta_in")
+
+    def __init__(self):
+        self.src = array("i")
+        self.dst = array("i")
+        self.edges = array("i")
+        self.built_edges = -1
+        self.delta_out: Dict[int, Tuple[array, array]] = {}
+        self.delta_in: Dict[int, Tuple[array, array]] = {}
+
+    def append(self, start, end, index):
+        self.src.append(start)
+        self.dst.append(end)
+        self.edges.append(index)
+        if self.built_edges >= 0:
+            _delta_append(self.delta_out, start, end, index)
+            _delta_append(self.delta_in, end, start, index)
+
+    def needs_build(self):
+        if self.built_edges < 0:
+            return True
+        pending = len(self.edges) - self.built_edges
+        return pending > max(COMPACT_MIN_EDGES, self.built_edges * COMPACT_RATIO)
+
+    def build(self, node_count):
+        src = _as_numpy(self.src)
+        dst = _as_numpy(self.dst)
+        edges = _as_numpy(self.edges)
+        self.out_offsets, self.out_nodes, self.out_edges = _csr(src, dst, edges, node_count)
+        self.in_offsets, self.in_nodes, self.in_edges = _csr(dst, src, edges, node_count)
+        self.built_edges = len(self.edges)
+        self.delta_out = {}
+        self.delta_in = {}
+
+    def slice(self, node, direction):
+        if direction == OUT:
+            offsets, nodes, edges, delta = self.out_offsets, self.out_nodes, self.out_edges, self.delta_out
+        else:
+            offsets, nodes, edges, delta = self.in_offsets, self.in_nodes, self.in_edges, self.delta_in
+        if node + 1 < len(offsets):
+            lo, hi = offsets[node], offsets[node + 1]
+            nodes, edges = nodes[lo:hi], edges[lo:hi]
+        else:
+            nodes, edges = _EMPTY, _EMPTY
+        pending = delta.get(node)
+        if pending is not None:
+            nodes = np.concatenate((nodes, _as_numpy(pending[0])))
+            edges = np.concatenate((edges, _as_numpy(pending[1])))
+        return nodes, edges
+
+    def gather(self, nodes, direction, limit=None):
+        # Batched slice over many nodes: (positions into `nodes`, neighbors, edges),
+        # truncated to at most `limit` results in node order
+        if direction == OUT:
+            offsets, neighbors, edges, delta = self.out_offsets, self.out_nodes, self.out_edges, self.delta_out
+        else:
+            offsets, neighbors, edges, delta = self.in_offsets, self.in_nodes, self.in_edges, self.delta_in
+        nodes = np.asarray(nodes, dtype=np.int64)
+        known = nodes + 1 < len(offsets)
+        clipped = np.where(known, nodes, 0)
+        counts = np.where(known, offsets[clipped + 1] - offsets[clipped], 0)
+        if limit is not None:
+            # Cut the cumulative neighbor count off at the limit
+            ends = np.cumsum(counts)
+            counts = np.clip(limit - (ends - counts), 0, counts)
+        total = int(counts.sum())
+        origins = np.repeat(np.arange(len(nodes)), counts)
+        firsts = np.cumsum(counts) - counts
+        positions = np.repeat(offsets[clipped] - firsts, counts) + np.arange(total)
+        result_nodes, result_edges = neighbors[positions], edges[positions]
+
+        if delta:
+            extra = [(position, delta[node]) for position, node in enumerate(nodes.tolist()) if node in delta]
+            if extra:
+                origins = np.concatenate([origins] + [np.full(len(pending[0]), position) for position, pending in extra])
+                result_nodes = np.concatenate([result_nodes] + [_as_numpy(pending[0]) for _, pending in extra])
+                result_edges = np.concatenate([result_edges] + [_as_numpy(pending[1]) for _, pending in extra])
+                if limit is not None:
+                    origins, result_nodes, result_edges = origins[:limit], result_nodes[:limit], result_edges[:limit]
+        return origins, result_nodes, result_edges
+
+    def degree(self, node, direction):
+        offsets, delta = (self.out_offsets, self.delta_out) if direction == OUT else (self.in_offsets, self.delta_in)
+        count = int(offsets[node + 1] - offsets[node]) if node + 1 < len(offsets) else 0
+        pending = delta.get(node)
+        return count + (len(pending[0]) if pending is not None else 0)
+
+    def degrees(self, nodes, direction):
+        # Batched degree over an int64 array of nodes
+        offsets, delta = (self.out_offsets, self.delta_out) if direction == OUT else (self.in_offsets, self.delta_in)
+        known = nodes + 1 < len(offsets)
+        clipped = np.where(known, nodes, 0)
+        counts = np.where(known, offsets[clipped + 1] - offsets[clipped], 0)
+        if delta:
+            for position, node in enumerate(nodes.tolist()):
+                pending = delta.get(node)
+                if pending is not None:
+                    counts[position] += len(pending[0])
+        return counts
+
+
+def _delta_append(delta, node, neighbor, index):
+    pending = delta.get(node)
+    if pending is None:
+        pending = delta[node] = (array("i"), array("i"))
+    pending[0].append(neighbor)
+    pending[1].append(index)
+
+
+def _as_numpy(values):
+    # Copy out of the array buffer so later appends are never blocked by a live view
+    if not len(values):
+        return _EMPTY
+    if isinstance(values, array):
+        return np.frombuffer(values, dtype=NODE_DTYPE).copy()
+    # Snapshot-backed columns (app.snapshot)
+    return np.array(values, dtype=NODE_DTYPE)
+
+
+def _csr(keys, values, edges, node_count):
+    # Stable sort keeps insertion order within each adjacency list
+    order = np.argsort(keys, kind="stable")
+    offsets = np.zeros(node_count + 1, dtype=OFFSET_DTYPE)
+    np.cumsum(np.bincount(keys, minlength=node_count), out=offsets[1:])
+    return offsets, values[order], edges[order]
+
+
+class GraphStore:
+    def __init__(self):
+        # Node storage
+        self._node_ids: List[str] = []
+        self._node_index: Dict[str, int] = {}
+        self._node_labelset = array("i")
+        self._labelsets: List[Tuple[str, ...]] = []
+        self._labelset_index: Dict[Tuple[str, ...], int] = {}
+        self._label_nodes: Dict[str, array] = {}
+        self._node_props = _Columns()
+        # (label, key) -> {value: array of node indices}
+        self._property_indexes: Dict[Tuple[str, str], Dict[Any, array]] = {}
+
+        # Relationship storage
+        self._edge_ids: List[str] = []
+        self._edge_index: Dict[str, int] = {}
+        self._edge_type = array("i")
+        self._edge_src = array("i")
+        self._edge_dst = array("i")
+        self._edge_props = _Columns()
+        self._types: List[str] = []
+        self._type_index: Dict[str, int] = {}
+        self._adjacency: List[_Adjacency] = []
+        self.lock = threading.RLock()
+
+    @classmethod
+    def from_records(cls, nodes, relationships, indexes=()):
+        # Build a store from Neo4j-shaped node and relationship dicts
+        store = cls()
+        for label, key in indexes:
+            store.create_index(label, key)
+        for node in nodes:
+            store.add_node(node["id"], node.get("labels", ()), node.get("properties") or {})
+        for rel in relationships:
+            store.add_relationship(rel["id"], rel["type"], rel["startNode"], rel["endNode"],
+                                   rel.get("properties") or {})
+        return store
+
+    @classmethod
+    def from_arrays(cls, node_ids, node_index, node_labelset, labelsets, label_nodes, node_properties,
+                    edge_ids, edge_index, edge_type, edge_src, edge_dst, edge_properties, types, adjacency,
+                    indexes=()):
+        # Wrap prebuilt columns (e.g. memory-mapped snapshot arrays) without
+        # re-adding every node and relationship. Columns must support len(),
+        # indexing and append; `adjacency` holds one dict per relationship
+        # type with its src/dst/edges columns and the out_/in_ offsets, nodes
+        # and edges CSR arrays over all of them.
+        store = cls()
+        store._node_ids = node_ids
+        store._node_index = node_index
+        store._node_labelset = node_labelset
+        store._labelsets = [tuple(labelset) for labelset in labelsets]
+        store._labelset_index = {labelset: i for i, labelset in enumerate(store._labelsets)}
+        store._label_nodes = dict(label_nodes)
+        store._node_props.columns.update(node_properties)
+        store._edge_ids = edge_ids
+        store._edge_index = edge_index
+        store._edge_type = edge_type
+        store._edge_src = edge_src
+        store._edge_dst = edge_dst
+        store._edge_props.columns.update(edge_properties)
+        store._types = list(types)
+        store._type_index = {rel_type: i for i, rel_type in enumerate(store._types)}
+        for arrays in adjacency:
+            built = _Adjacency()
+            for name, values in arrays.items():
+                setattr(built, name, values)
+            built.built_edges = len(built.edges)
+            store._adjacency.append(built)
+        for label, key in indexes:
+            store.create_index(label, key)
+        return store
+
+    @classmethod
+    def from_graph_data(cls, nodes, links, labels=None, indexes=()):
+        # Build a store from GraphData-shaped nodes/links; `labels` maps node type to label
+        labels = labels or {}
+        return cls.from_records(
+            [{
+                "id": node["id"],
+                "labels": [labels.get(node["type"], node["type"])],
+                "properties": {"label": node["label"], **(node.get("properties") or {})},
+            } for node in nodes],
+            [{
+                "id": f"link-{i}",
+                "type": link["type"],
+                "startNode": link["source"],
+                "endNode": link["target"],
+                "properties": link.get("properties"),
+            } for i, link in enumerate(links)],
+            indexes=indexes,
+        )
+
+    # Sizes
+    @property
+    def node_count(self):
+        return len(self._node_ids)
+
+    @property
+    def relationship_count(self):
+        return len(self._edge_ids)
+
+    @property
+    def relationship_types(self):
+        return list(self._types)
+
+    @property
+    def labels(self):
+        return list(self._label_nodes)
+
+    # Writes
+    def add_node(self, node_id, labels=(), properties=None):
+        with self.lock:
+            if node_id in self._node_index:
+                raise ValueError(f"Duplicate node id: {node_id}")
+            index = len(self._node_ids)
+            self._node_ids.append(node_id)
+            self._node_index[node_id] = index
+
+            labelset = tuple(labels)
+            labelset_id = self._labelset_index.get(labelset)
+            if labelset_id is None:
+                labelset_id = self._labelset_index[labelset] = len(self._labelsets)
+                self._labelsets.append(labelset)
+            self._node_labelset.append(labelset_id)
+            for label in labelset:
+                self._label_nodes.setdefault(label, array("i")).append(index)
+
+            if properties:
+                self._node_props.set(index, properties)
+                for label in labelset:
+                    for key, value in properties.items():
+                        value_index = self._property_indexes.get((label, key))
+                        if value_index is not None:
+                            value_index.setdefault(value, array("i")).append(index)
+            return index
+
+    def add_relationship(self, rel_id, rel_type, start_node, end_node, properties=None):
+        with self.lock:
+            if rel_id in self._edge_index:
+                raise ValueError(f"Duplicate relationship id: {rel_id}")
+            start = self._node_index.get(start_node)
+            end = self._node_index.get(end_node)
+            if start is None or end is None:
+                raise KeyError(f"Unknown node in relationship {rel_id}: {start_node} -> {end_node}")
+
+            type_id = self._type_index.get(rel_type)
+            if type_id is None:
+                type_id = self._type_index[rel_type] = len(self._types)
+                self._types.append(rel_type)
+                self._adjacency.append(_Adjacency())
+
+            index = len(self._edge_ids)
+            self._edge_ids.append(rel_id)
+            self._edge_index[rel_id] = index
+            self._edge_type.append(type_id)
+            self._edge_src.append(start)
+            self._edge_dst.append(end)
+            if properties:
+                self._edge_props.set(index, properties)
+
+            self._adjacency[type_id].append(start, end, index)
+            return index
+
+    def set_node_property(self, index, key, value):
+        # Update one property in place, keeping any property index on it current
+        with self.lock:
+            old = self._node_props.get(index, key, MISSING)
+            self._node_props.set(index, {key: value})
+            for label in self.node_labels(index):
+                value_index = self._property_indexes.get((label, key))
+                if value_index is None:
+                    continue
+                if old is not MISSING and old in value_index:
+                    value_index[old].remove(index)
+                value_index.setdefault(value, array("i")).append(index)
+
+    def create_index(self, label, key):
+        # Exact-match property index over nodes carrying `label`
+        with self.lock:
+            value_index: Dict[Any, array] = {}
+            for node in self.nodes_with_label(label):
+                value = self._node_props.get(int(node), key, MISSING)
+                if value is not MISSING:
+                    value_index.setdefault(value, array("i")).append(int(node))
+            self._property_indexes[(label, key)] = value_index
+
+    def has_index(self, label, key):
+        return (label, key) in self._property_indexes
+
+    # Lookups
+    def lookup(self, node_id) -> Optional[int]:
+        return self._node_index.get(node_id)
+
+    def lookup_relationship(self, rel_id) -> Optional[int]:
+        return self._edge_index.get(rel_id)
+
+    def node_id(self, index):
+        return self._node_ids[index]
+
+    def node_labels(self, index):
+        return self._labelsets[self._node_labelset[index]]
+
+    def has_label(self, index, label):
+        return label in self._labelsets[self._node_labelset[index]]
+
+    def node_property(self, index, key, default=None):
+        return self._node_props.get(index, key, default)
+
+    def relationship_type(self, index):
+        return self._types[self._edge_type[index]]
+
+    def relationship_endpoints(self, index):
+        return self._edge_src[index], self._edge_dst[index]
+
+    def relationship_property(self, index, key, default=None):
+        return self._edge_props.get(index, key, default)
+
+    def nodes_with_label(self, label):
+        nodes = self._label_nodes.get(label)
+        return _as_numpy(nodes) if nodes else _EMPTY
+
+    def find_nodes(self, label, key, value):
+        # Uses the property index when one exists, otherwise scans the label
+        value_index = self._property_indexes.get((label, key))
+        if value_index is not None:
+            nodes = value_index.get(value)
+            return _as_numpy(nodes) if nodes else _EMPTY
+        matches = [int(node) for node in self.nodes_with_label(label)
+                   if self._node_props.get(int(node), key, MISSING) == value]
+        return np.asarray(matches, dtype=NODE_DTYPE)
+
+    def _adjacency_for(self, rel_type):
+        type_id = self._type_index.get(rel_type)
+        if type_id is None:
+            return None
+        adjacency = self._adjacency[type_id]
+        if adjacency.needs_build():
+            with self.lock:
+                if adjacency.needs_build():
+                    adjacency.build(self.node_count)
+        return adjacency
+
+    def compact(self):
+        # Run any CSR rebuild that is due now, so reads never start one
+        # (writers call this at the end of a batch, on the event loop)
+        with self.lock:
+            for rel_type in self._types:
+                self._adjacency_for(rel_type)
+
+    def expand(self, node, rel_type, direction=OUT) -> Tuple[np.ndarray, np.ndarray]:
+        # Returns (neighbor node indices, relationship indices) for one node
+        adjacency = self._adjacency_for(rel_type)
+        if adjacency is None:
+            return _EMPTY, _EMPTY
+        if direction == OUT or direction == IN:
+            return adjacency.slice(node, direction)
+        if direction == BOTH:
+            out_nodes, out_edges = self.expand(node, rel_type, OUT)
+            in_nodes, in_edges = self.expand(node, rel_type, IN)
+            return np.concatenate((out_nodes, in_nodes)), np.concatenate((out_edges, in_edges))
+        raise ValueError(f"Unknown direction: {direction}")
+
+    def expand_many(self, nodes, rel_types=None, direction=BOTH, limit=None):
+        # Batched expand over many nodes and relationship types at once. Returns
+        # (origins, neighbors, relationships), origins indexing into `nodes`,
+        # with at most `limit` results in total.
+        nodes = np.asarray(nodes, dtype=np.int64)
+        directions = (OUT, IN) if direction == BOTH else (direction,)
+        parts = []
+        remaining = limit
+        for rel_type in (self._types if rel_types is None else rel_types):
+            adjacency = self._adjacency_for(rel_type)
+            if adjacency is None:
+                continue
+            for side in directions:
+                if remaining is not None and remaining <= 0:
+                    break
+                part = adjacency.gather(nodes, side, remaining)
+                parts.append(part)
+                if remaining is not None:
+                    remaining -= len(part[0])
+        if not parts:
+            return np.empty(0, dtype=np.int64), _EMPTY, _EMPTY
+        return tuple(np.concatenate(column) for column in zip(*parts))
+
+    def neighbors(self, node, rel_type, direction=OUT):
+        return self.expand(node, rel_type, direction)[0]
+
+    def degree(self, node, rel_type, direction=OUT):
+        adjacency = self._adjacency_for(rel_type)
+        if adjacency is None:
+            return 0
+        if direction == BOTH:
+            return adjacency.degree(node, OUT) + adjacency.degree(node, IN)
+        return adjacency.degree(node, direction)
+
+    def degrees(self, nodes, rel_types=None, direction=BOTH):
+        # Batched degree over many nodes, summed over relationship types
+        nodes = np.asarray(nodes, dtype=np.int64)
+        total = np.zeros(len(nodes), dtype=np.int64)
+        directions = (OUT, IN) if direction == BOTH else (direction,)
+        for rel_type in (self._types if rel_types is None else rel_types):
+            adjacency = self._adjacency_for(rel_type)
+            if adjacency is None:
+                continue
+            for side in directions:
+                total += adjacency.degrees(nodes, side)
+        return total
+
+    def edges_since(self, start=0, rel_types=None):
+        # (sources, targets) of relationships appended at or after index `start`
+        src = _as_numpy(self._edge_src[start:])
+        dst = _as_numpy(self._edge_dst[start:])
+        if rel_types is not None:
+            type_ids = [self._type_index[t] for t in rel_types if t in self._type_index]
+            mask = np.isin(_as_numpy(self._edge_type[start:]), type_ids)
+            src, dst = src[mask], dst[mask]
+        return src, dst
+
+    # Materialization into the Neo4j response shape
+    def node_record(self, index):
+        return {
+            "id": self._node_ids[index],
+            "labels": list(self.node_labels(index)),
+            "properties": self._node_props.row(index),
+        }
+
+    def relationship_record(self, index):
+        return {
+            "id": self._edge_ids[index],
+            "type": self._types[self._edge_type[index]],
+            "startNode": self._node_ids[self._edge_src[index]],
+            "endNode": self._node_ids[self._edge_dst[index]],
+            "properties": self._edge_props.row(index),
+        }
+
+    def node_records(self, indices: Iterable[int]):
+        return [self.node_record(int(index)) for index in indices]
+
+    def relationship_records(self, indices: Iterable[int]):
+        return [self.relationship_record(int(index)) for index in indices]
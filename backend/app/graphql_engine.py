@@ -0,0 +1,684 @@
+import json
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+# GraphQL execution over the sample data store
+#
+# Queries are parsed into a small document AST (cached per query text),
+# validated against SCHEMA and executed field by field, so only the selected
+# fields are resolved. AccountFilter/ClusterFilter arguments are pushed down
+# into per-field hash indexes that are rebuilt whenever the data source
+# reloads a file.
+
+# Schema served by /api/graphql/schema and used for validation
+SCHEMA = {
+    "types": [
+        {
+            "name": "Account",
+            "fields": [
+                {"name": "id", "type": "ID!"},
+                {"name": "username", "type": "String!"},
+                {"name": "email", "type": "String!"},
+                {"name": "ip", "type": "String!"},
+                {"name": "loginTime", "type": "DateTime!"},
+                {"name": "isFraudulent", "type": "Boolean!"},
+                {"name": "relatedAccounts", "type": "[ID]"}
+            ]
+        },
+        {
+            "name": "FraudCluster",
+            "fields": [
+                {"name": "id", "type": "ID!"},
+                {"name": "ip", "type": "String!"},
+                {"name": "accounts", "type": "[Account!]!"},
+                {"name": "timestamp", "type": "DateTime!"},
+                {"name": "confidence", "type": "Float!"}
+            ]
+        },
+        {
+            "name": "GraphData",
+            "fields": [
+                {"name": "nodes", "type": "[Node!]!"},
+                {"name": "links", "type": "[Link!]!"}
+            ]
+        }
+    ],
+    "queries": [
+        {
+            "name": "accounts",
+            "args": [
+                {"name": "filter", "type": "AccountFilter"}
+            ],
+            "type": "[Account!]!"
+        },
+        {
+            "name": "clusters",
+            "args": [
+                {"name": "filter", "type": "ClusterFilter"}
+            ],
+            "type": "[FraudCluster!]!"
+        },
+        {
+            "name": "graph",
+            "args": [],
+            "type": "GraphData!"
+        }
+    ]
+}
+
+# Number of parsed documents kept in the LRU cache
+DOCUMENT_CACHE_SIZE = 256
+
+# Fields with a hash index for filter pushdown
+ACCOUNT_INDEXED_FIELDS = ("id", "username", "email", "ip", "isFraudulent")
+CLUSTER_INDEXED_FIELDS = ("id", "ip")
+
+
+class GraphQLError(Exception):
+    def __init__(self, message, position=None, path=None):
+        super().__init__(message)
+        self.message = message
+        self.position = position
+        self.path = path
+
+
+def _base_type(type_name):
+    return type_name.replace("[", "").replace("]", "").replace("!", "")
+
+
+_OBJECT_TYPES = {
+    schema_type["name"]: {field["name"]: _base_type(field["type"]) for field in schema_type["fields"]}
+    for schema_type in SCHEMA["types"]
+}
+_ROOT_FIELDS = {
+    query["name"]: (_base_type(query["type"]), {arg["name"] for arg in query["args"]})
+    for query in SCHEMA["queries"]
+}
+
+
+# Lexer
+_TOKEN_RE = re.compile(r"""
+    (?P<ignored>[\s,\ufeff]+|\#[^\n\r]*)
+  | (?P<spread>\.\.\.)
+  | (?P<punct>[!$():=@\[\]{}|&])
+  | (?P<number>-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?)
+  | (?P<name>[_A-Za-z][_0-9A-Za-z]*)
+  | (?P<string>"(?:[^"\\\n]|\\.)*")
+""", re.VERBOSE)
+
+
+def _tokenize(text):
+    tokens = []
+    position = 0
+    while position < len(text):
+        match = _TOKEN_RE.match(text, position)
+        if not match:
+            raise GraphQLError(f"Syntax Error: Unexpected character '{text[position]}'", position)
+        kind = match.lastgroup
+        if kind != "ignored":
+            tokens.append((kind, match.group(kind), position))
+        position = match.end()
+    tokens.append(("eof", None, position))
+    return tokens
+
+
+# AST
+class Variable:
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+
+class Field:
+    __slots__ = ("alias", "name", "arguments", "directives", "selections", "position")
+
+    def __init__(self, alias, name, arguments, directives, selections, position):
+        self.alias = alias
+        self.name = name
+        self.arguments = arguments
+        self.directives = directives
+        self.selections = selections
+        self.position = position
+
+    @property
+    def response_key(self):
+        return self.alias or self.name
+
+
+class FragmentSpread:
+    __slots__ = ("name", "directives", "position")
+
+    def __init__(self, name, directives, position):
+        self.name = name
+        self.directives = directives
+        self.position = position
+
+
+class InlineFragment:
+    __slots__ = ("type_condition", "directives", "selections")
+
+    def __init__(self, type_condition, directives, selections):
+        self.type_condition = type_condition
+        self.directives = directives
+        self.selections = selections
+
+
+class Operation:
+    __slots__ = ("kind", "name", "variables", "selections")
+
+    def __init__(self, kind, name, variables, selections):
+        self.kind = kind
+        self.name = name
+        self.variables = variables
+        self.selections = selections
+
+
+class Document:
+    __slots__ = ("operations", "fragments", "errors")
+
+    def __init__(self, operations, fragments):
+        self.operations = operations
+        self.fragments = fragments
+        # Schema validation errors as (message, position) pairs
+        self.errors = []
+
+
+class _Parser:
+    def __init__(self, text):
+        self.tokens = _tokenize(text)
+        self.index = 0
+
+    def peek(self):
+        return self.tokens[self.index]
+
+    def advance(self):
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def at(self, kind, value=None):
+        token_kind, token_value, _ = self.tokens[self.index]
+        return token_kind == kind and (value is None or token_value == value)
+
+    def expect(self, kind, value=None):
+        if not self.at(kind, value):
+            _, found, position = self.peek()
+            found = "<EOF>" if found is None else f'"{found}"'
+            raise GraphQLError(f"Syntax Error: Expected {value or kind}, found {found}", position)
+        return self.advance()
+
+    def parse_document(self):
+        operations = []
+        fragments = {}
+        while not self.at("eof"):
+            if self.at("punct", "{"):
+                operations.append(Operation("query", None, [], self.parse_selection_set()))
+            elif self.at("name", "fragment"):
+                self.advance()
+                name = self.expect("name")[1]
+                self.expect("name", "on")
+                type_condition = self.expect("name")[1]
+                self.parse_directives()
+                fragments[name] = InlineFragment(type_condition, [], self.parse_selection_set())
+            elif self.at("name"):
+                kind = self.advance()[1]
+                if kind not in ("query", "mutation", "subscription"):
+                    raise GraphQLError(f'Syntax Error: Unexpected "{kind}"', self.tokens[self.index - 1][2])
+                name = self.advance()[1] if self.at("name") else None
+                variables = self.parse_variable_definitions() if self.at("punct", "(") else []
+                self.parse_directives()
+                operations.append(Operation(kind, name, variables, self.parse_selection_set()))
+            else:
+                _, found, position = self.peek()
+                raise GraphQLError(f'Syntax Error: Unexpected "{found}"', position)
+        if not operations:
+            raise GraphQLError("Syntax Error: Document contains no operations", 0)
+        return Document(operations, fragments)
+
+    def parse_variable_definitions(self):
+        definitions = []
+        self.expect("punct", "(")
+        while not self.at("punct", ")"):
+            self.expect("punct", "$")
+            name = self.expect("name")[1]
+            self.expect("punct", ":")
+            self.parse_type()
+            default = None
+            if self.at("punct", "="):
+                self.advance()
+                default = self.parse_value()
+            definitions.append((name, default))
+        self.expect("punct", ")")
+        return definitions
+
+    def parse_type(self):
+        if self.at("punct", "["):
+            self.advance()
+            self.parse_type()
+            self.expect("punct", "]")
+        else:
+            self.expect("name")
+        if self.at("punct", "!"):
+            self.advance()
+
+    def parse_selection_set(self):
+        self.expect("punct", "{")
+        selections = []
+        while not self.at("punct", "}"):
+            selections.append(self.parse_selection())
+        self.expect("punct", "}")
+        return selections
+
+    def parse_selection(self):
+        if self.at("spread"):
+            position = self.advance()[2]
+            if self.at("name") and not self.at("name", "on"):
+                return FragmentSpread(self.advance()[1], self.parse_directives(), position)
+            type_condition = None
+            if self.at("name", "on"):
+                self.advance()
+                type_condition = self.expect("name")[1]
+            directives = self.parse_directives()
+            return InlineFragment(type_condition, directives, self.parse_selection_set())
+
+        _, name, position = self.expect("name")
+        alias = None
+        if self.at("punct", ":"):
+            self.advance()
+            alias, name = name, self.expect("name")[1]
+        arguments = self.parse_arguments() if self.at("punct", "(") else {}
+        directives = self.parse_directives()
+        selections = self.parse_selection_set() if self.at("punct", "{") else None
+        return Field(alias, name, arguments, directives, selections, position)
+
+    def parse_arguments(self):
+        arguments = {}
+        self.expect("punct", "(")
+        while not self.at("punct", ")"):
+            name = self.expect("name")[1]
+            self.expect("punct", ":")
+            arguments[name] = self.parse_value()
+        self.expect("punct", ")")
+        return arguments
+
+    def parse_directives(self):
+        directives = []
+        while self.at("punct", "@"):
+            self.advance()
+            name = self.expect("name")[1]
+            arguments = self.parse_arguments() if self.at("punct", "(") else {}
+            directives.append((name, arguments))
+        return directives
+
+    def parse_value(self):
+        kind, value, position = self.advance()
+        if kind == "punct" and value == "$":
+            return Variable(self.expect("name")[1])
+        if kind == "number":
+            return float(value) if any(c in value for c in ".eE") else int(value)
+        if kind == "string":
+            return json.loads(value)
+        if kind == "name":
+            if value in ("true", "false"):
+                return value == "true"
+            if value == "null":
+                return None
+            # Enum values are passed through as strings
+            return value
+        if kind == "punct" and value == "[":
+            items = []
+            while not self.at("punct", "]"):
+                items.append(self.parse_value())
+            self.advance()
+            return items
+        if kind == "punct" and value == "{":
+            fields = {}
+            while not self.at("punct", "}"):
+                name = self.expect("name")[1]
+                self.expect("punct", ":")
+                fields[name] = self.parse_value()
+            self.advance()
+            return fields
+        raise GraphQLError(f'Syntax Error: Unexpected "{value}"', position)
+
+
+# Validation against SCHEMA
+def _validate_document(document):
+    errors = []
+    for operation in document.operations:
+        _validate_selections(document, operation.selections, "Query", errors, set())
+    return errors
+
+
+def _validate_selections(document, selections, type_name, errors, visiting):
+    for selection in selections:
+        if isinstance(selection, FragmentSpread):
+            fragment = document.fragments.get(selection.name)
+            if fragment is None:
+                errors.append((f'Unknown fragment "{selection.name}".', selection.position))
+            elif selection.name in visiting:
+                errors.append((f'Cannot spread fragment "{selection.name}" within itself.', selection.position))
+            else:
+                _validate_selections(document, fragment.selections, type_name, errors,
+                                     visiting | {selection.name})
+            continue
+        if isinstance(selection, InlineFragment):
+            _validate_selections(document, selection.selections, type_name, errors, visiting)
+            continue
+
+        field = selection
+        if field.name == "__typename":
+            continue
+        if type_name == "Query":
+            if field.name not in _ROOT_FIELDS:
+                errors.append((f'Cannot query field "{field.name}" on type "Query".', field.position))
+                continue
+            field_type, allowed_args = _ROOT_FIELDS[field.name]
+            for argument in field.arguments:
+                if argument not in allowed_args:
+                    errors.append((f'Unknown argument "{argument}" on field "Query.{field.name}".', field.position))
+        elif type_name in _OBJECT_TYPES:
+            known = _OBJECT_TYPES[type_name]
+            if field.name not in known:
+                errors.append((f'Cannot query field "{field.name}" on type "{type_name}".', field.position))
+                continue
+            field_type = known[field.name]
+            # relatedAccounts holds IDs; a selection set resolves them to accounts
+            if field_type == "ID" and type_name == "Account" and field.selections is not None:
+                field_type = "Account"
+        else:
+            # Node and Link are free-form records
+            field_type = None
+
+        if field_type in _OBJECT_TYPES and field.selections is None:
+            errors.append((f'Field "{field.name}" of type "{field_type}" must have a selection of subfields.',
+                           field.position))
+        elif field.selections is not None:
+            _validate_selections(document, field.selections, field_type, errors, visiting)
+
+
+@lru_cache(maxsize=DOCUMENT_CACHE_SIZE)
+def parse_document(text) -> Document:
+    # Cached by query text; documents are immutable once parsed and validated
+    document = _Parser(text).parse_document()
+    document.errors = _validate_document(document)
+    return document
+
+
+def document_cache_info():
+    return parse_document.cache_info()
+
+
+# Indexes over the data store
+class DataIndex:
+    # Hash indexes over accounts and clusters for one data version
+
+    def __init__(self, data):
+        self.accounts = data["accounts"]
+        self.clusters = data["clusters"]
+        self.graph = data["graph"]
+        self.account_index = _build_index(self.accounts, ACCOUNT_INDEXED_FIELDS)
+        self.cluster_index = _build_index(self.clusters, CLUSTER_INDEXED_FIELDS)
+        self.shared_ip_accounts = {
+            position
+            for positions in self.account_index["ip"].values() if len(positions) > 1
+            for position in positions
+        }
+
+    def account_by_id(self, account_id):
+        positions = self.account_index["id"].get(account_id)
+        return self.accounts[positions[0]] if positions else None
+
+
+def _build_index(records, fields):
+    index = {field: {} for field in fields}
+    for position, record in enumerate(records):
+        for field in fields:
+            value = record.get(field)
+            if value is not None:
+                index[field].setdefault(value, []).append(position)
+    return index
+
+
+_data_index: Optional[DataIndex] = None
+_data_index_version = None
+
+
+def get_data_index(source):
+    # Rebuild the indexes only when the data source has reloaded a file
+    global _data_index, _data_index_version
+    data = source.get()
+    version = source.version
+    if _data_index is None or version != _data_index_version:
+        _data_index = DataIndex(data)
+        _data_index_version = version
+    return _data_index
+
+
+# Filtering
+_RESIDUAL_OPS = {
+    "eq": lambda value, operand: value == operand,
+    "ne": lambda value, operand: value != operand,
+    "in": lambda value, operand: value in operand,
+    "gt": lambda value, operand: value is not None and value > operand,
+    "gte": lambda value, operand: value is not None and value >= operand,
+    "lt": lambda value, operand: value is not None and value < operand,
+    "lte": lambda value, operand: value is not None and value <= operand,
+    "contains": lambda value, operand: isinstance(value, str) and operand in value,
+}
+
+
+def _apply_filter(records, index, filter_arg, shared_positions=None):
+    # Equality and `in` conditions on indexed fields narrow the candidate set
+    # through the hash index; everything else is checked on the survivors.
+    if not filter_arg:
+        return records
+    if not isinstance(filter_arg, dict):
+        raise GraphQLError("Argument \"filter\" must be an input object")
+
+    candidates = None
+    residual = []
+    for field, condition in filter_arg.items():
+        if field == "sameIpMultipleAccounts" and shared_positions is not None:
+            condition = {"shared": condition}
+            field = "ip"
+        if not isinstance(condition, dict):
+            condition = {"eq": condition}
+        for op, operand in condition.items():
+            if op == "in":
+                if not isinstance(operand, list) or any(isinstance(item, (list, dict)) for item in operand):
+                    raise GraphQLError(f"Filter operator \"in\" on field \"{field}\" expects a list of values")
+            elif isinstance(operand, (list, dict)):
+                raise GraphQLError(f"Filter operator \"{op}\" on field \"{field}\" expects a single value")
+            if op == "shared" and field == "ip" and shared_positions is not None:
+                positions = shared_positions if operand else set(range(len(records))) - shared_positions
+            elif field in index and op == "eq":
+                positions = set(index[field].get(operand, ()))
+            elif field in index and op == "in":
+                positions = {p for value in operand for p in index[field].get(value, ())}
+            elif op in _RESIDUAL_OPS:
+                residual.append((field, _RESIDUAL_OPS[op], operand))
+                continue
+            else:
+                raise GraphQLError(f"Unknown filter operator \"{op}\" on field \"{field}\"")
+            candidates = positions if candidates is None else candidates & positions
+
+    selected = records if candidates is None else [records[p] for p in sorted(candidates)]
+    if residual:
+        selected = [
+            record for record in selected
+            if all(_safe(check, record.get(field), operand) for field, check, operand in residual)
+        ]
+    return selected
+
+
+def _safe(check, value, operand):
+    try:
+        return check(value, operand)
+    except TypeError:
+        return False
+
+
+# Execution
+class _Execution:
+    def __init__(self, document, variables, data_index):
+        self.fragments = document.fragments
+        self.variables = variables
+        self.data = data_index
+        self.errors: List[Dict[str, Any]] = []
+        self.text = ""
+
+    def value(self, value):
+        if isinstance(value, Variable):
+            return self.variables.get(value.name)
+        if isinstance(value, list):
+            return [self.value(item) for item in value]
+        if isinstance(value, dict):
+            return {key: self.value(item) for key, item in value.items()}
+        return value
+
+    def included(self, directives):
+        for name, arguments in directives:
+            condition = bool(self.value(arguments.get("if")))
+            if name == "skip" and condition:
+                return False
+            if name == "include" and not condition:
+                return False
+        return True
+
+    def collect(self, selections, type_name, fields=None, visited=None):
+        # Flattens fragments into an ordered response-key -> [Field] map; each
+        # named fragment is spread at most once, as in the spec's CollectFields
+        if fields is None:
+            fields = {}
+        if visited is None:
+            visited = set()
+        for selection in selections:
+            if isinstance(selection, Field):
+                if self.included(selection.directives):
+                    fields.setdefault(selection.response_key, []).append(selection)
+                continue
+            if not self.included(selection.directives):
+                continue
+            if isinstance(selection, FragmentSpread):
+                if selection.name in visited:
+                    continue
+                visited.add(selection.name)
+                fragment = self.fragments.get(selection.name)
+                if fragment is None:
+                    raise GraphQLError(f'Unknown fragment "{selection.name}"', selection.position)
+            else:
+                fragment = selection
+            if fragment.type_condition in (None, type_name) or type_name not in _OBJECT_TYPES:
+                self.collect(fragment.selections, type_name, fields, visited)
+        return fields
+
+    def execute_root(self, selections):
+        result = {}
+        for key, fields in self.collect(selections, "Query").items():
+            field = fields[0]
+            if field.name == "__typename":
+                result[key] = "Query"
+                continue
+            try:
+                result[key] = self.resolve_root(field, key)
+            except GraphQLError as e:
+                if e.position is None:
+                    e.position = field.position
+                self.add_error(e, e.path or [key])
+                result[key] = None
+        return result
+
+    def resolve_root(self, field, key):
+        type_name = _ROOT_FIELDS[field.name][0]
+        arguments = {name: self.value(value) for name, value in field.arguments.items()}
+
+        if field.name == "accounts":
+            records = _apply_filter(self.data.accounts, self.data.account_index,
+                                    arguments.get("filter"), self.data.shared_ip_accounts)
+        elif field.name == "clusters":
+            records = _apply_filter(self.data.clusters, self.data.cluster_index, arguments.get("filter"))
+        else:
+            return self.complete(self.data.graph, type_name, field, [key])
+        return [self.complete(record, type_name, field, [key, i]) for i, record in enumerate(records)]
+
+    def complete(self, obj, type_name, parent, path):
+        # Resolves only the selected fields of one object
+        if obj is None:
+            return None
+        fields = self.collect(parent.selections, type_name)
+        known = _OBJECT_TYPES.get(type_name)
+        result = {}
+        for key, field_list in fields.items():
+            field = field_list[0]
+            if field.name == "__typename":
+                result[key] = type_name
+                continue
+            value = obj.get(field.name) if isinstance(obj, dict) else None
+            field_type = known.get(field.name) if known is not None else None
+            selections = [s for f in field_list if f.selections for s in f.selections]
+            if not selections:
+                result[key] = value
+                continue
+            merged = Field(field.alias, field.name, field.arguments, [], selections, field.position)
+            if field_type == "ID" and type_name == "Account":
+                # ID references with a selection set resolve to the referenced accounts
+                value = [self.data.account_by_id(item) for item in value] if value is not None else None
+                field_type = "Account"
+            if isinstance(value, list):
+                result[key] = [self.complete(item, field_type, merged, path + [key, i])
+                               for i, item in enumerate(value)]
+            else:
+                result[key] = self.complete(value, field_type, merged, path + [key])
+        return result
+
+    def add_error(self, error, path):
+        entry = {"message": error.message}
+        if error.position is not None:
+            entry["locations"] = [_location(self.text, error.position)]
+        entry["path"] = path
+        self.errors.append(entry)
+
+
+def _location(text, position):
+    line = text.count("\n", 0, position) + 1
+    column = position - (text.rfind("\n", 0, position) + 1) + 1
+    return {"line": line, "column": column}
+
+
+def execute(text, source, variables=None, operation_name=None):
+    # Returns a GraphQL response dict: {"data": ..., "errors": [...]}
+    try:
+        document = parse_document(text)
+    except GraphQLError as e:
+        return {"data": {}, "errors": [{"message": e.message, "locations": [_location(text, e.position or 0)]}]}
+
+    if document.errors:
+        return {"data": {}, "errors": [
+            {"message": message, "locations": [_location(text, position)]}
+            for message, position in document.errors
+        ]}
+
+    operations = document.operations
+    if operation_name is not None:
+        operations = [op for op in operations if op.name == operation_name]
+        if not operations:
+            return {"data": {}, "errors": [{"message": f'Unknown operation named "{operation_name}".'}]}
+    elif len(operations) > 1:
+        return {"data": {}, "errors": [{"message": "Must provide operation name if query contains multiple operations."}]}
+    operation = operations[0]
+    if operation.kind != "query":
+        return {"data": {}, "errors": [{"message": f"{operation.kind.capitalize()} operations are not supported."}]}
+
+    provided = variables or {}
+    resolved = {name: provided.get(name, default) for name, default in operation.variables}
+    execution = _Execution(document, resolved, get_data_index(source))
+    execution.text = text
+    try:
+        data = execution.execute_root(operation.selections)
+    except GraphQLError as e:
+        execution.add_error(e, e.path or [])
+        data = {}
+    return {"data": data, "errors": execution.errors or None}
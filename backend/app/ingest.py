@@ -0,0 +1,214 @@
+import time
+from typing import Dict, List, Sequence
+
+from app.components import ConnectedComponents
+from app.detection import DEFAULT_WINDOW, LoginLog, detect_clusters
+from app.graph_store import GraphStore, IN
+
+# Batched login-event ingestion
+#
+# Each batch appends new Account/IPAddress nodes and CONNECTS_FROM edges to
+# the graph store (the IPAddress label index and per-type adjacency deltas
+# are maintained as edges are appended), then folds the whole batch into the
+# ring components with one sync. Per-event work is a handful of dict lookups;
+# CSR compaction and component merging are amortized over the batch.
+#
+# Every login also goes into a LoginLog, and the windowed shared-IP detector
+# re-runs over the recent logins of the IPs the batch touched: accounts in a burst
+# that are not related yet get RELATED_TO edges carrying the burst's
+# confidence, so rings and their confidence follow the login stream. The
+# log's records are what /api/clusters/bursts serves.
+#
+# The same logins are then published to the Neo4j-shaped store behind
+# /api/neo4j (Neo4jGraphPublisher), so Cypher queries and path searches see
+# ingested data too. Each store's lock is held for the whole batch, so agents
+# reading a store from worker threads see it either before or after a batch.
+
+
+class Neo4jGraphPublisher:
+    # Mirrors logins into a store in the Neo4j record shape: Account nodes
+    # keyed by their `id` property, IPAddress nodes by `address`, and one
+    # CONNECTS_FROM relationship per (account, IP) pair
+
+    def __init__(self, store: GraphStore):
+        self.store = store
+        for label, key in (("Account", "id"), ("IPAddress", "address")):
+            if not store.has_index(label, key):
+                store.create_index(label, key)
+        src, dst = store.edges_since(0, ["CONNECTS_FROM"])
+        self.connected = set(zip(src.tolist(), dst.tolist()))
+
+    def _node(self, label, key, value, node_id, properties):
+        existing = self.store.find_nodes(label, key, value)
+        if len(existing):
+            return int(existing[0]), False
+        while self.store.lookup(node_id) is not None:
+            node_id = f"{node_id}'"
+        return self.store.add_node(node_id, [label], {key: value, **properties}), True
+
+    def publish(self, events: Sequence[dict]):
+        touched_ips = set()
+        with self.store.lock:
+            for event in events:
+                account, _ = self._node("Account", "id", event["accountId"], f"account-{event['accountId']}", {
+                    "username": event.get("username") or f"user{event['accountId']}",
+                    "email": event.get("email") or "",
+                    "createdAt": event["loginTime"],
+                })
+                ip, _ = self._node("IPAddress", "address", event["ip"], f"ip-{event['ip']}",
+                                   {"location": "Unknown", "isSuspicious": False})
+                if (account, ip) in self.connected:
+                    continue
+                self.connected.add((account, ip))
+                self.store.add_relationship(f"login-{self.store.relationship_count}", "CONNECTS_FROM",
+                                            self.store.node_id(account), self.store.node_id(ip),
+                                            {"timestamp": event["loginTime"]})
+                touched_ips.add(ip)
+            for ip in touched_ips:
+                self.store.set_node_property(ip, "isSuspicious", self.store.degree(ip, "CONNECTS_FROM", IN) > 1)
+            self.store.compact()
+
+
+class LoginEventIngestor:
+    def __init__(self, store: GraphStore, components: ConnectedComponents,
+                 accounts: List[dict], accounts_by_node: Dict[str, dict], graph_data: dict,
+                 publishers: Sequence[Neo4jGraphPublisher] = ()):
+        self.store = store
+        self.publishers = list(publishers)
+        self.components = components
+        self.accounts = accounts
+        self.accounts_by_node = accounts_by_node
+        self.graph_data = graph_data
+        self.graph_nodes = {node["id"]: node for node in graph_data["nodes"]}
+        # Bumped after every batch so derived caches can refresh
+        self.version = 0
+        self.ip_sequence = len(store.nodes_with_label("IPAddress"))
+
+        src, dst = store.edges_since(0, ["CONNECTS_FROM"])
+        self.connected = set(zip(src.tolist(), dst.tolist()))
+        src, dst = store.edges_since(0, ["RELATED_TO"])
+        self.related = {frozenset(pair) for pair in zip(src.tolist(), dst.tolist())}
+        self.logins = LoginLog()
+        seen = [account for account in accounts if account.get("ip") and account.get("loginTime")]
+        self.logins.extend([account["id"] for account in seen], [account["ip"] for account in seen],
+                           [account["loginTime"] for account in seen])
+
+    def _account_node(self, event, stats):
+        node_id = f"account-{event['accountId']}"
+        node = self.store.lookup(node_id)
+        account = self.accounts_by_node.get(node_id)
+        if node is None:
+            username = event.get("username") or f"user{event['accountId']}"
+            properties = {
+                "email": event.get("email") or "",
+                "loginTime": event["loginTime"],
+                "isFraudulent": bool(event.get("isFraudulent")),
+            }
+            node = self.store.add_node(node_id, ["Account"], {"label": username, **properties})
+            self.graph_nodes[node_id] = {"id": node_id, "label": username, "type": "account", "properties": properties}
+            self.graph_data["nodes"].append(self.graph_nodes[node_id])
+            stats["newAccounts"] += 1
+        if account is None:
+            account = {
+                "id": event["accountId"],
+                "username": self.store.node_property(node, "label"),
+                "email": event.get("email") or "",
+                "ip": event["ip"],
+                "loginTime": event["loginTime"],
+                "isFraudulent": bool(event.get("isFraudulent")),
+            }
+            self.accounts.append(account)
+            self.accounts_by_node[node_id] = account
+        elif event["loginTime"] >= account["loginTime"]:
+            # Accounts report their most recent login
+            account["ip"] = event["ip"]
+            account["loginTime"] = event["loginTime"]
+        return node
+
+    def _ip_node(self, address, stats):
+        existing = self.store.find_nodes("IPAddress", "label", address)
+        if len(existing):
+            return int(existing[0])
+        self.ip_sequence += 1
+        while self.store.lookup(f"ip-{self.ip_sequence}") is not None:
+            self.ip_sequence += 1
+        node_id = f"ip-{self.ip_sequence}"
+        properties = {"count": 0, "isSuspicious": False}
+        node = self.store.add_node(node_id, ["IPAddress"], {"label": address, **properties})
+        self.graph_nodes[node_id] = {"id": node_id, "label": address, "type": "ip", "properties": properties}
+        self.graph_data["nodes"].append(self.graph_nodes[node_id])
+        stats["newIps"] += 1
+        return node
+
+    def _relate(self, clusters, stats):
+        # RELATED_TO edges for burst members that are not related yet
+        for source, target, confidence in clusters.related_pairs():
+            start, end = f"account-{source}", f"account-{target}"
+            pair = frozenset((self.store.lookup(start), self.store.lookup(end)))
+            if pair in self.related or None in pair:
+                continue
+            self.related.add(pair)
+            properties = {"confidence": confidence}
+            self.store.add_relationship(f"link-{self.store.relationship_count}", "RELATED_TO", start, end, properties)
+            self.graph_data["links"].append({"source": start, "target": end, "type": "RELATED_TO",
+                                             "properties": properties})
+            stats["newRelationships"] += 1
+
+    def ingest(self, events: List[dict]):
+        stats = {"accepted": len(events), "newAccounts": 0, "newIps": 0, "newRelationships": 0}
+        started = time.perf_counter()
+
+        touched_ips = set()
+        with self.store.lock:
+            for event in events:
+                account = self._account_node(event, stats)
+                ip = self._ip_node(event["ip"], stats)
+                if (account, ip) in self.connected:
+                    continue
+                self.connected.add((account, ip))
+                rel_id = f"link-{self.store.relationship_count}"
+                properties = {"timestamp": event["loginTime"]}
+                self.store.add_relationship(rel_id, "CONNECTS_FROM", self.store.node_id(account),
+                                            self.store.node_id(ip), properties)
+                self.graph_data["links"].append({
+                    "source": self.store.node_id(account),
+                    "target": self.store.node_id(ip),
+                    "type": "CONNECTS_FROM",
+                    "properties": properties,
+                })
+                touched_ips.add(ip)
+                stats["newRelationships"] += 1
+
+            # IP account counts are refreshed once per touched IP, not per event
+            for ip in touched_ips:
+                count = self.store.degree(ip, "CONNECTS_FROM", IN)
+                self.store.set_node_property(ip, "count", count)
+                self.store.set_node_property(ip, "isSuspicious", count > 1)
+                graph_node = self.graph_nodes[self.store.node_id(ip)]
+                graph_node["properties"] = {**graph_node["properties"], "count": count, "isSuspicious": count > 1}
+            graph_done = time.perf_counter()
+
+            ips = [event["ip"] for event in events]
+            times = self.logins.extend([event["accountId"] for event in events], ips,
+                                       [event["loginTime"] for event in events])
+            if len(times):
+                recent = self.logins.events(set(ips), int(times.min()) - DEFAULT_WINDOW)
+                self._relate(detect_clusters(recent), stats)
+            detection_done = time.perf_counter()
+
+            self.components.sync()
+            self.store.compact()
+            components_done = time.perf_counter()
+        for publisher in self.publishers:
+            publisher.publish(events)
+        published = time.perf_counter()
+        self.version += 1
+
+        stats["timing"] = {
+            "graph_ms": (graph_done - started) * 1000,
+            "detection_ms": (detection_done - graph_done) * 1000,
+            "components_ms": (components_done - detection_done) * 1000,
+            "publish_ms": (published - components_done) * 1000,
+            "total_ms": (published - started) * 1000,
+        }
+        return stats
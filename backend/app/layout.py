@@ -0,0 +1,292 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+
+from app.graph_store import GraphStore
+
+# Server-side graph layout and level-of-detail views for the visualization
+#
+# Node coordinates live in one (nodes, 2) float32 array in the unit square and
+# are computed with a vectorized force-directed (Fruchterman-Reingold) layout.
+# Attraction runs over the edge arrays with bincount scatters; repulsion is
+# approximated on a GRID_CELLS x GRID_CELLS grid (_Grid), so an iteration is
+# O(nodes + edges + cells^2) instead of O(nodes^2).
+#
+# The layout follows the store incrementally: update() picks up nodes and
+# edges appended since the last call, places new nodes at the centroid of
+# their placed neighbors and relaxes only the new nodes and their neighbors.
+#
+# viewport() returns the nodes inside a bounding box. Hub nodes (IPs) whose
+# exclusive members (accounts connected to no other hub) exceed the zoom
+# level's threshold are collapsed into super-nodes: members are hidden and
+# their other edges are re-routed to the hub. The threshold doubles with every
+# zoom level, so zooming in expands hubs. Views are cached per layout version.
+
+LAYOUT_ITERATIONS = 60
+INCREMENTAL_ITERATIONS = 15
+GRID_CELLS = 16
+# Ideal edge length is SPACING / sqrt(nodes); GRAVITY pulls toward the center
+SPACING = 0.5
+GRAVITY = 0.01
+MARGIN = 0.02
+
+# Hubs with more exclusive members than HUB_THRESHOLD * 2 ** zoom are collapsed
+HUB_THRESHOLD = 4
+MAX_VIEWPORT_NODES = 2000
+VIEW_CACHE_SIZE = 256
+
+POSITION_DTYPE = np.float32
+
+
+class GraphLayout:
+    def __init__(self, store: GraphStore, types: Optional[Dict[str, str]] = None,
+                 hub_label="IPAddress", hub_rel="CONNECTS_FROM", seed=0):
+        self.store = store
+        # Node label -> visualization type ("Account" -> "account")
+        self.types = types or {}
+        self.hub_label = hub_label
+        self.hub_rel = hub_rel
+        self.positions = np.empty((0, 2), dtype=POSITION_DTYPE)
+        self.version = None
+        self._rng = np.random.default_rng(seed)
+        self._src = np.empty(0, dtype=np.int64)
+        self._dst = np.empty(0, dtype=np.int64)
+        self._degree = np.empty(0, dtype=np.int64)
+        self._hub_of = np.empty(0, dtype=np.int64)
+        self._members = np.empty(0, dtype=np.int64)
+        self._views: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Layout
+    def update(self):
+        store = self.store
+        version = (store.node_count, store.relationship_count)
+        if version == self.version:
+            return self
+        with self._lock:
+            if version == self.version:
+                return self
+            src, dst = store.edges_since(len(self._src))
+            src, dst = src.astype(np.int64), dst.astype(np.int64)
+            placed = len(self.positions)
+            self._src = np.concatenate([self._src, src])
+            self._dst = np.concatenate([self._dst, dst])
+            self._degree = np.bincount(np.concatenate([self._src, self._dst]), minlength=version[0])
+
+            if placed == 0:
+                self.positions = self._rng.random((version[0], 2)).astype(POSITION_DTYPE)
+                self._relax(LAYOUT_ITERATIONS)
+            else:
+                self._place_new(placed, version[0], src, dst)
+                movable = np.zeros(version[0], dtype=bool)
+                movable[placed:] = True
+                movable[src] = True
+                movable[dst] = True
+                self._relax(INCREMENTAL_ITERATIONS, movable, start_temperature=0.02)
+
+            self._index_hubs()
+            self.version = version
+            self._views.clear()
+        return self
+
+    def _place_new(self, placed, node_count, src, dst):
+        # New nodes start at the centroid of their already placed neighbors
+        positions = np.empty((node_count, 2), dtype=POSITION_DTYPE)
+        positions[:placed] = self.positions
+        new, anchor = np.concatenate([src, dst]), np.concatenate([dst, src])
+        keep = (new >= placed) & (anchor < placed)
+        new, anchor = new[keep] - placed, anchor[keep]
+        count = np.bincount(new, minlength=node_count - placed)
+        jitter = (self._rng.random((node_count - placed, 2)) - 0.5) * 0.02
+        fresh = self._rng.random((node_count - placed, 2))
+        for axis in range(2):
+            sums = np.bincount(new, weights=positions[anchor, axis], minlength=node_count - placed)
+            fresh[:, axis] = np.where(count > 0, sums / np.maximum(count, 1) + jitter[:, axis], fresh[:, axis])
+        positions[placed:] = np.clip(fresh, 0.0, 1.0)
+        self.positions = positions
+
+    def _relax(self, iterations, movable=None, start_temperature=0.1):
+        positions = self.positions.astype(np.float64)
+        n = len(positions)
+        if n < 2:
+            return
+        k = SPACING / np.sqrt(n)
+        src, dst = self._src, self._dst
+        keep = src != dst
+        # Incremental runs move only `movable` nodes: the grid is summarized
+        # once from the fixed layout and only edges touching movable nodes pull
+        if movable is None:
+            moving = np.arange(n)
+        else:
+            moving = np.flatnonzero(movable)
+            keep &= movable[src] | movable[dst]
+            grid = _Grid(positions)
+        src, dst = src[keep], dst[keep]
+        for step in range(iterations):
+            temperature = start_temperature * (1.0 - step / iterations)
+            if movable is None:
+                grid = _Grid(positions)
+            displacement = np.zeros((n, 2))
+            displacement[moving] = grid.repulsion(positions[moving], k)
+
+            # Attraction d^2 / k along every edge, scattered onto both endpoints
+            delta = positions[src] - positions[dst]
+            distance = np.maximum(np.linalg.norm(delta, axis=1), 1e-9)
+            pull = delta * (distance / k)[:, None]
+            for axis in range(2):
+                displacement[:, axis] -= np.bincount(src, weights=pull[:, axis], minlength=n)
+                displacement[:, axis] += np.bincount(dst, weights=pull[:, axis], minlength=n)
+
+            # Gravity toward the center keeps components from drifting apart
+            moved = displacement[moving] + (0.5 - positions[moving]) * (GRAVITY / k)
+
+            # Move at most `temperature` per iteration
+            length = np.maximum(np.linalg.norm(moved, axis=1), 1e-9)
+            positions[moving] += moved * (np.minimum(length, temperature) / length)[:, None]
+        if movable is None:
+            # A full layout is scaled into the unit square with a margin
+            low, high = positions.min(axis=0), positions.max(axis=0)
+            positions = MARGIN + (1 - 2 * MARGIN) * (positions - low) / np.maximum(high - low, 1e-9)
+        else:
+            # Incremental moves stay inside the existing frame
+            np.clip(positions, 0.0, 1.0, out=positions)
+        self.positions = positions.astype(POSITION_DTYPE)
+
+    def _index_hubs(self):
+        # Exclusive members: nodes linked by hub_rel to exactly one hub
+        store = self.store
+        n = store.node_count
+        src, dst = store.edges_since(0, [self.hub_rel])
+        src, dst = src.astype(np.int64), dst.astype(np.int64)
+        is_hub = np.zeros(n, dtype=bool)
+        is_hub[store.nodes_with_label(self.hub_label)] = True
+        # Member on one end, hub on the other, whichever the edge direction
+        member = np.where(is_hub[dst], src, dst)
+        hub = np.where(is_hub[dst], dst, src)
+        keep = is_hub[hub] & ~is_hub[member]
+        member, hub = member[keep], hub[keep]
+        pairs = np.unique(member * n + hub)
+        member, hub = pairs // n, pairs % n
+        hubs_per_member = np.bincount(member, minlength=n)
+        exclusive = hubs_per_member[member] == 1
+        self._hub_of = np.full(n, -1, dtype=np.int64)
+        self._hub_of[member[exclusive]] = hub[exclusive]
+        self._members = np.bincount(hub[exclusive], minlength=n)
+
+    # Views
+    def viewport(self, x0=0.0, y0=0.0, x1=1.0, y1=1.0, zoom=0, limit=MAX_VIEWPORT_NODES):
+        self.update()
+        key = (self.version, round(x0, 4), round(y0, 4), round(x1, 4), round(y1, 4), zoom, limit)
+        with self._lock:
+            view = self._views.get(key)
+            if view is not None:
+                self._views.move_to_end(key)
+                return view
+        view = self._build_view(x0, y0, x1, y1, zoom, limit)
+        with self._lock:
+            self._views[key] = view
+            while len(self._views) > VIEW_CACHE_SIZE:
+                self._views.popitem(last=False)
+        return view
+
+    def _build_view(self, x0, y0, x1, y1, zoom, limit):
+        store = self.store
+        positions = self.positions
+        n = len(positions)
+        collapsed = self._members > HUB_THRESHOLD * 2 ** zoom
+        hidden = (self._hub_of >= 0) & collapsed[np.maximum(self._hub_of, 0)]
+        # Hidden members are represented by their hub
+        representative = np.where(hidden, self._hub_of, np.arange(n))
+
+        inside = ((positions[:, 0] >= x0) & (positions[:, 0] <= x1) &
+                  (positions[:, 1] >= y0) & (positions[:, 1] <= y1))
+        candidates = np.flatnonzero(inside & ~hidden)
+        if len(candidates) > limit:
+            # Keep the best connected nodes; super-nodes count their members
+            weight = self._degree[candidates] + self._members[candidates] * collapsed[candidates]
+            candidates = np.sort(candidates[np.argpartition(-weight, limit - 1)[:limit]])
+        kept = np.zeros(n, dtype=bool)
+        kept[candidates] = True
+
+        start, end = representative[self._src], representative[self._dst]
+        visible = kept[start] & kept[end] & (start != end)
+        edges = np.flatnonzero(visible)
+        # One link per (start, end, type) after re-routing
+        links = {}
+        for edge, source, target in zip(edges.tolist(), start[edges].tolist(), end[edges].tolist()):
+            rel_type = store.relationship_type(edge)
+            link = links.get((source, target, rel_type))
+            if link is None:
+                links[(source, target, rel_type)] = {
+                    "source": store.node_id(source),
+                    "target": store.node_id(target),
+                    "type": rel_type,
+                    "properties": {"count": 1, **store.relationship_record(edge)["properties"]},
+                }
+            else:
+                link["properties"]["count"] += 1
+
+        nodes = []
+        for node in candidates.tolist():
+            record = store.node_record(node)
+            label = record["labels"][0] if record["labels"] else ""
+            properties = record["properties"]
+            entry = {
+                "id": record["id"],
+                "label": properties.get("label", record["id"]),
+                "type": self.types.get(label, label.lower()),
+                "properties": {key: value for key, value in properties.items() if key != "label"},
+                "x": round(float(positions[node, 0]), 5),
+                "y": round(float(positions[node, 1]), 5),
+                "degree": int(self._degree[node]),
+                "aggregated": int(self._members[node]) if collapsed[node] else 0,
+            }
+            nodes.append(entry)
+
+        return {
+            "version": list(self.version),
+            "zoom": zoom,
+            "bounds": [x0, y0, x1, y1],
+            "truncated": bool(inside.sum() - hidden[inside].sum() > len(candidates)),
+            "nodes": nodes,
+            "links": list(links.values()),
+        }
+
+
+class _Grid:
+    # Grid approximation of the k^2 / d repulsion between all node pairs: cells
+    # repel each other by center of mass, and a node is pushed away from the
+    # center of its own cell by the rest of the cell
+
+    def __init__(self, positions):
+        self.low = positions.min(axis=0)
+        self.scale = GRID_CELLS / np.maximum(positions.max(axis=0) - self.low, 1e-9)
+        cell = self.cell(positions)
+        self.mass = np.bincount(cell, minlength=GRID_CELLS * GRID_CELLS).astype(np.float64)
+        self.centers = np.empty((len(self.mass), 2))
+        for axis in range(2):
+            self.centers[:, axis] = (np.bincount(cell, weights=positions[:, axis], minlength=len(self.mass))
+                                     / np.maximum(self.mass, 1))
+
+        # Cell against cell, by center of mass; (k^2 is applied in repulsion)
+        filled = np.flatnonzero(self.mass)
+        x, y = self.centers[filled, 0], self.centers[filled, 1]
+        dx, dy = x[:, None] - x[None, :], y[:, None] - y[None, :]
+        weight = self.mass[filled] / np.maximum(dx * dx + dy * dy, 1e-12)
+        np.fill_diagonal(weight, 0.0)
+        self.cell_force = np.zeros((len(self.mass), 2))
+        self.cell_force[filled, 0] = (weight * dx).sum(axis=1)
+        self.cell_force[filled, 1] = (weight * dy).sum(axis=1)
+
+    def cell(self, positions):
+        cells = np.clip(((positions - self.low) * self.scale).astype(np.int64), 0, GRID_CELLS - 1)
+        return cells[:, 0] * GRID_CELLS + cells[:, 1]
+
+    def repulsion(self, positions, k):
+        cell = self.cell(positions)
+        delta = positions - self.centers[cell]
+        distance_sq = np.maximum((delta ** 2).sum(axis=1), 1e-12)
+        local = np.maximum(self.mass[cell] - 1, 0)[:, None] * delta / distance_sq[:, None]
+        return (k * k) * (self.cell_force[cell] + local)
@@ -0,0 +1,187 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ContextDecorator
+from typing import Dict, Tuple
+
+from starlette.routing import Match
+
+# Request and stage metrics in the Prometheus text exposition format
+#
+# MetricsMiddleware is a plain ASGI middleware, so it also measures streamed
+# (NDJSON/SSE) responses until their last chunk. Per route template, method
+# and status it records a latency histogram, an in-flight gauge, and response
+# byte and request counters. Routes are labelled by their template, and
+# unmatched paths share one label, so label cardinality stays bounded.
+#
+# timed("stage") records stage-level latencies from inside handlers (cypher
+# execution, NLU parsing, each agent). It works as a context manager or as a
+# decorator on synchronous functions. One timing costs about 3 us (clock
+# reads, a lock and a histogram update), so stages should be coarse: time a
+# whole parse, not each microsecond-scale call inside it.
+#
+# Metrics are kept per process; with several uvicorn workers each worker
+# serves its own /metrics.
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Route templates cached per (method, path); unmatched paths are not cached
+ROUTE_CACHE_SIZE = 4096
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+
+
+def _labels(names, values):
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.request_latency: Dict[Tuple[str, str, int], Histogram] = {}
+        self.response_bytes: Dict[Tuple[str, str, int], int] = {}
+        self.in_flight: Dict[Tuple[str, str], int] = {}
+        self.stage_latency: Dict[str, Histogram] = {}
+
+    def request_started(self, method, route):
+        with self._lock:
+            self.in_flight[(method, route)] = self.in_flight.get((method, route), 0) + 1
+
+    def request_finished(self, method, route, status, seconds, size):
+        key = (method, route, status)
+        with self._lock:
+            self.in_flight[(method, route)] -= 1
+            histogram = self.request_latency.get(key)
+            if histogram is None:
+                histogram = self.request_latency[key] = Histogram()
+            histogram.observe(seconds)
+            self.response_bytes[key] = self.response_bytes.get(key, 0) + size
+
+    def observe_stage(self, stage, seconds):
+        with self._lock:
+            histogram = self.stage_latency.get(stage)
+            if histogram is None:
+                histogram = self.stage_latency[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            _histogram_lines(lines, "http_request_duration_seconds", "Request latency by route",
+                             ("method", "route", "status"), self.request_latency)
+            lines.append("# HELP http_requests_in_flight Requests currently being handled")
+            lines.append("# TYPE http_requests_in_flight gauge")
+            for labels, value in sorted(self.in_flight.items()):
+                lines.append(f"http_requests_in_flight{{{_labels(('method', 'route'), labels)}}} {value}")
+            lines.append("# HELP http_response_bytes_total Response body bytes sent")
+            lines.append("# TYPE http_response_bytes_total counter")
+            for labels, value in sorted(self.response_bytes.items()):
+                lines.append(f"http_response_bytes_total{{{_labels(('method', 'route', 'status'), labels)}}} {value}")
+            _histogram_lines(lines, "stage_duration_seconds", "Latency of instrumented stages",
+                             ("stage",), {(stage,): histogram for stage, histogram in self.stage_latency.items()})
+        lines.append("")
+        return "\n".join(lines)
+
+
+def _histogram_lines(lines, name, help_text, label_names, histograms):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, histogram in sorted(histograms.items()):
+        base = _labels(label_names, labels)
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{base},le="{bound}"}} {cumulative}')
+        cumulative += histogram.counts[-1]
+        lines.append(f'{name}_bucket{{{base},le="+Inf"}} {cumulative}')
+        lines.append(f"{name}_sum{{{base}}} {histogram.sum}")
+        lines.append(f"{name}_count{{{base}}} {cumulative}")
+
+
+metrics = MetricsRegistry()
+
+
+class timed(ContextDecorator):
+    # with timed("cypher.execute"): ...   or   @timed("stage") on a function
+
+    def __init__(self, stage, registry: MetricsRegistry = metrics):
+        self.stage = stage
+        self.registry = registry
+        self.started = 0.0
+
+    def _recreate_cm(self):
+        # Each decorated call times with its own instance
+        return type(self)(self.stage, self.registry)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe_stage(self.stage, time.perf_counter() - self.started)
+        return False
+
+
+class MetricsMiddleware:
+    def __init__(self, app, registry: MetricsRegistry = metrics):
+        self.app = app
+        self.registry = registry
+        self._routes: Dict[Tuple[str, str], str] = {}
+
+    def _route(self, scope):
+        key = (scope["method"], scope["path"])
+        route = self._routes.get(key)
+        if route is not None:
+            return route
+        # Full match first, then a path-only match (e.g. 405 responses)
+        partial = None
+        for candidate in scope["app"].router.routes:
+            match, _ = candidate.matches(scope)
+            if match == Match.FULL:
+                route = candidate.path
+                break
+            if match == Match.PARTIAL and partial is None:
+                partial = candidate.path
+        route = route or partial
+        if route is None:
+            return UNMATCHED_ROUTE
+        if len(self._routes) < ROUTE_CACHE_SIZE:
+            self._routes[key] = route
+        return route
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method, route = scope["method"], self._route(scope)
+        state = {"status": 500, "size": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                state["size"] += len(message.get("body", b""))
+            await send(message)
+
+        self.registry.request_started(method, route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.registry.request_finished(method, route, state["status"],
+                                           time.perf_counter() - started, state["size"])
@@ -0,0 +1,171 @@
+import ipaddress
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.data_source import DATA_PATH
+
+# Compiled phrase matching for intent classification
+#
+# All phrases of all intents are folded into a character trie and compiled
+# into one regex where every trie branch starts with a distinct literal
+# character and longer continuations are tried before a phrase ends. A match
+# is the longest phrase starting at that offset. Searching again from the
+# next offset (rather than the match end) also finds overlapping hits, and
+# the regex engine skips offsets whose character cannot start any phrase, so
+# the text is scanned once with Python-level work only per hit. The longest
+# phrase present anywhere is the longest of those hits, so the nested loop's
+# "longest phrase wins, earliest intent/phrase breaks ties" scoring is kept
+# by ranking hits on (-length, declaration order).
+
+_END = ""
+
+
+def _trie_pattern(node):
+    # Regex for a trie node; continuations come before the end marker (greedy)
+    branches = [re.escape(char) + _trie_pattern(child) for char, child in node.items() if char != _END]
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if _END in node:
+        return f"(?:{body})?"
+    return body
+
+
+class PhraseMatcher:
+    def __init__(self, phrases_by_label: Dict[str, Iterable[str]]):
+        # phrase -> (declaration rank, label); a repeated phrase keeps its first label
+        self.ranks: Dict[str, Tuple[int, str]] = {}
+        for label, phrases in phrases_by_label.items():
+            for phrase in phrases:
+                # An empty phrase always matches with score 0 and so never wins
+                if phrase:
+                    self.ranks.setdefault(phrase, (len(self.ranks), label))
+        trie: dict = {}
+        for phrase in self.ranks:
+            node = trie
+            for char in phrase:
+                node = node.setdefault(char, {})
+            node[_END] = {}
+        self.pattern = re.compile(_trie_pattern(trie) or "(?!)")
+
+    def _hits(self, text):
+        search = self.pattern.search
+        match = search(text)
+        while match is not None:
+            yield match
+            match = search(text, match.start() + 1)
+
+    def matches(self, text) -> List[Tuple[int, str]]:
+        # (start, phrase) for the longest phrase starting at each matching offset
+        return [(match.start(), match.group()) for match in self._hits(text)]
+
+    def best(self, text) -> Optional[Tuple[str, str]]:
+        # (label, phrase) of the highest-scoring phrase in text, or None
+        best_key = None
+        best_phrase = None
+        for match in self._hits(text):
+            phrase = match.group()
+            key = (-len(phrase), self.ranks[phrase][0])
+            if best_key is None or key < best_key:
+                best_key, best_phrase = key, phrase
+        if best_phrase is None:
+            return None
+        return self.ranks[best_phrase][1], best_phrase
+
+
+# Single-pass entity extraction
+#
+# IPv4/IPv6 addresses, emails, prefixed account IDs and every dictionary
+# entity (e.g. time periods) are alternatives of one compiled regex, so a
+# single finditer reports every occurrence with its offsets. Each structural
+# pattern is anchored with a lookbehind so it is only attempted at a token
+# boundary, which keeps the scan linear. Dictionaries, account-ID prefixes
+# and confidences come from a JSON data file (see data/entities.json).
+
+ENTITIES_PATH = os.path.join(DATA_PATH, "entities.json")
+
+_OCTET = r"(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)"
+_IPV4 = rf"(?<![\w.]){_OCTET}(?:\.{_OCTET}){{3}}(?!\.?\d)"
+# Candidates only; the address is validated with the ipaddress module
+_IPV6 = r"(?<![\w:.])(?:[0-9A-Fa-f]{0,4}:){2,7}(?:\d{1,3}(?:\.\d{1,3}){3}|[0-9A-Fa-f]{1,4})?(?!\.?[\w:])"
+_EMAIL = r"(?<![\w.%+-])[\w.%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}\b"
+
+DEFAULT_CONFIDENCE = 0.9
+
+
+def _alternation(words):
+    # Longest first so a dictionary term never stops at a shorter prefix term
+    return "|".join(re.escape(word) for word in sorted(set(words), key=lambda word: (-len(word), word)))
+
+
+class EntityExtractor:
+    def __init__(self, entities: Dict[str, dict]):
+        # entity name -> {"confidence": float, "values": [...]} for dictionaries,
+        # {"prefixes": [...]} for account_id; ip_address/email are built in
+        self.entities = entities
+        self.confidence = {name: spec.get("confidence", DEFAULT_CONFIDENCE) for name, spec in entities.items()}
+        # regex branch name -> (entity, name of the group holding the value)
+        self._branches: Dict[str, Tuple[str, str]] = {}
+        self._dictionary_branches = set()
+        branches = []
+
+        def add(name, entity, pattern, value_group=None):
+            self._branches[name] = (entity, value_group or name)
+            branches.append(f"(?P<{name}>{pattern})")
+
+        if "email" in entities:
+            add("email", "email", _EMAIL)
+        if "ip_address" in entities:
+            add("ipv6", "ip_address", _IPV6)
+            add("ipv4", "ip_address", _IPV4)
+        prefixes = entities.get("account_id", {}).get("prefixes")
+        if prefixes:
+            add("account_id", "account_id",
+                rf"(?i:\b(?:{_alternation(prefixes)}))[\s#:=-]*(?P<account_value>\d{{1,20}})\b", "account_value")
+        for position, (entity, spec) in enumerate(entities.items()):
+            if spec.get("values"):
+                name = f"dictionary_{position}"
+                self._dictionary_branches.add(name)
+                add(name, entity, rf"(?i:\b(?:{_alternation(spec['values'])})\b)")
+
+        # Every branch starts at a token boundary; checking that once up front
+        # rejects offsets inside words without trying each branch
+        self.pattern = re.compile(rf"(?<!\w)(?:{'|'.join(branches)})" if branches else "(?!)")
+
+    @classmethod
+    def from_file(cls, path=ENTITIES_PATH):
+        with open(path) as handle:
+            return cls(json.load(handle)["entities"])
+
+    def extract(self, text) -> List[dict]:
+        # Every entity occurrence in text, in offset order
+        entities = []
+        branches = self._branches
+        for match in self.pattern.finditer(text):
+            name = match.lastgroup
+            entity, group = branches[name]
+            value = match.group(group)
+            if name == "ipv6":
+                try:
+                    ipaddress.IPv6Address(value)
+                except ValueError:
+                    continue
+            elif name in self._dictionary_branches:
+                value = value.lower()
+            entities.append({
+                "entity": entity,
+                "value": value,
+                "start": match.start(group),
+                "end": match.end(group),
+                "confidence": self.confidence[entity],
+            })
+        return entities
+
+
+@lru_cache(maxsize=None)
+def load_entity_extractor(path=ENTITIES_PATH) -> EntityExtractor:
+    # One compiled extractor per dictionary file, shared by every caller
+    return EntityExtractor.from_file(path)
@@ -0,0 +1,65 @@
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from fastapi import HTTPException
+
+from app.fast_json import FastJSONResponse
+
+# Keyset pagination over pre-sorted key indexes
+#
+# A page is the first `limit` records whose key sorts after the `after`
+# cursor. The start is found by binary search over the sorted keys, so page N
+# costs the same as page 1 and records outside the page are never
+# materialized or validated. Response bodies keep their unpaginated shape; the
+# cursor for the next page (the page's last key) is returned in the
+# X-Next-Cursor header, absent on the last page, and the total in
+# X-Total-Count.
+#
+# `fields` projects records down to a comma-separated list of keys, and
+# count mode returns only the size of the key index.
+
+MAX_PAGE_SIZE = 10000
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+
+def page_bounds(keys, after=None, limit: Optional[int] = None):
+    # (start, end) of the page within sorted `keys` (a list or a numpy array)
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    if after is None:
+        start = 0
+    elif isinstance(keys, np.ndarray):
+        start = int(np.searchsorted(keys, after, side="right"))
+    else:
+        start = bisect_right(keys, after)
+    end = len(keys) if limit is None else min(len(keys), start + limit)
+    return start, end
+
+
+def page_headers(keys, end, cursor=None) -> Dict[str, str]:
+    headers = {TOTAL_COUNT_HEADER: str(len(keys))}
+    if end < len(keys):
+        headers[NEXT_CURSOR_HEADER] = str(keys[end - 1] if cursor is None else cursor)
+    return headers
+
+
+def parse_fields(fields: Optional[str], allowed: Optional[Iterable[str]] = None) -> Optional[List[str]]:
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    if allowed is not None:
+        unknown = sorted(set(names) - set(allowed))
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return names
+
+
+def project(record: dict, fields: List[str]) -> dict:
+    return {name: record[name] for name in fields if name in record}
+
+
+def count_response(**counts):
+    return FastJSONResponse(counts)
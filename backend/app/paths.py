@@ -0,0 +1,189 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.graph_store import BOTH, GraphStore
+
+# Path search between two nodes of the graph store
+#
+# Relationships are followed in both directions, optionally restricted to
+# some relationship types. Both searches work from the two ends and meet in
+# the middle:
+#
+# - shortest_paths is a level-synchronous bidirectional BFS. It expands the
+#   smaller frontier each round, gathering a frontier's neighbors with one
+#   batched expand_many call, and stops at the first layer where the two
+#   searches meet. It returns every shortest path through the meeting nodes.
+# - all_paths enumerates the simple half-paths of up to ceil(k/2) hops from
+#   each end. It joins them on their end nodes into all simple paths of at
+#   most k hops, shortest first.
+#
+# Every neighbor gathered (and every half-path kept) counts against
+# `max_expansions`, so a search does a bounded amount of work and reports
+# `truncated` when the budget runs out. Nodes with more than `max_degree`
+# relationships, such as hub IPs shared by millions of accounts, are never
+# expanded; the endpoints are the exception. A path through a hub is still
+# found whenever the hub sits in the middle of the path, where the two sides
+# meet, e.g. account -> IP <- account.
+
+DEFAULT_MAX_HOPS = 4
+DEFAULT_MAX_PATHS = 100
+DEFAULT_MAX_EXPANSIONS = 100_000
+DEFAULT_MAX_DEGREE = 1000
+
+# (nodes, relationships) along one path, source first
+Path = Tuple[Tuple[int, ...], Tuple[int, ...]]
+
+
+class PathSearch:
+    def __init__(self, store: GraphStore, source, target, rel_types: Optional[Sequence[str]] = None,
+                 max_expansions=DEFAULT_MAX_EXPANSIONS, max_degree=DEFAULT_MAX_DEGREE):
+        self.store = store
+        self.source = source
+        self.target = target
+        self.rel_types = rel_types
+        self.max_degree = max_degree
+        self.max_expansions = max_expansions
+        self.remaining = max_expansions
+        self.truncated = False
+        self.hubs_skipped = set()
+        self._endpoints = np.array([source, target], dtype=np.int64)
+        self._neighbors: Dict[int, List[Tuple[int, int]]] = {}
+
+    @property
+    def expansions(self):
+        return self.max_expansions - self.remaining
+
+    def _charge(self, count):
+        self.remaining -= count
+        if self.remaining <= 0:
+            self.truncated = True
+
+    def _gather(self, nodes) -> List[Tuple[int, int, int]]:
+        # (origin, neighbor, relationship) over a frontier, hubs left unexpanded
+        nodes = np.asarray(nodes, dtype=np.int64)
+        if len(nodes):
+            hubs = (self.store.degrees(nodes, self.rel_types) > self.max_degree) & ~np.isin(nodes, self._endpoints)
+            if hubs.any():
+                self.hubs_skipped.update(nodes[hubs].tolist())
+                nodes = nodes[~hubs]
+        if not len(nodes):
+            return []
+        if self.remaining <= 0:
+            self.truncated = True
+            return []
+        origins, neighbors, edges = self.store.expand_many(nodes, self.rel_types, BOTH, limit=self.remaining)
+        self._charge(len(neighbors))
+        return list(zip(nodes[origins].tolist(), neighbors.tolist(), edges.tolist()))
+
+    def _adjacent(self, node) -> List[Tuple[int, int]]:
+        # Cached (neighbor, relationship) pairs of one node
+        cached = self._neighbors.get(node)
+        if cached is None:
+            cached = self._neighbors[node] = [(neighbor, edge) for _, neighbor, edge in self._gather([node])]
+        return cached
+
+    # Shortest paths
+    def shortest_paths(self, max_hops=DEFAULT_MAX_HOPS, max_paths=DEFAULT_MAX_PATHS) -> List[Path]:
+        if self.source == self.target:
+            return [((self.source,), ())]
+        # Per side: node -> depth and node -> [(parent, relationship)]
+        depths = ({self.source: 0}, {self.target: 0})
+        parents: Tuple[Dict[int, list], Dict[int, list]] = ({self.source: []}, {self.target: []})
+        frontiers = [[self.source], [self.target]]
+        levels = [0, 0]
+        while frontiers[0] and frontiers[1] and levels[0] + levels[1] < max_hops and not self.truncated:
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            depth, parent, other = depths[side], parents[side], depths[1 - side]
+            level = levels[side] + 1
+            next_frontier, meetings = [], []
+            for origin, neighbor, edge in self._gather(frontiers[side]):
+                known = depth.get(neighbor)
+                if known is None:
+                    depth[neighbor] = level
+                    parent[neighbor] = [(origin, edge)]
+                    next_frontier.append(neighbor)
+                    if neighbor in other:
+                        meetings.append(neighbor)
+                elif known == level:
+                    parent[neighbor].append((origin, edge))
+            frontiers[side] = next_frontier
+            levels[side] = level
+            if meetings:
+                best = min(depths[0][node] + depths[1][node] for node in meetings)
+                meetings = [node for node in meetings if depths[0][node] + depths[1][node] == best]
+                return self._join_shortest(meetings, parents, max_paths)
+        return []
+
+    def _join_shortest(self, meetings, parents, max_paths) -> List[Path]:
+        paths = []
+        for meeting in meetings:
+            for forward_nodes, forward_edges in _chains(parents[0], meeting):
+                for backward_nodes, backward_edges in _chains(parents[1], meeting):
+                    paths.append((forward_nodes[::-1] + backward_nodes[1:], forward_edges[::-1] + backward_edges))
+                    if len(paths) >= max_paths:
+                        return paths
+        return paths
+
+    # All paths up to k hops
+    def _half_paths(self, start, stop, hops) -> Dict[Tuple[int, int], List[Path]]:
+        # Simple paths of 0..hops relationships from `start` that do not pass
+        # through `stop`, grouped by (end node, length)
+        halves: Dict[Tuple[int, int], List[Path]] = {(start, 0): [((start,), ())]}
+        stack = [((start,), ())]
+        while stack:
+            nodes, edges = stack.pop()
+            if len(edges) >= hops or nodes[-1] == stop:
+                continue
+            for neighbor, edge in self._adjacent(nodes[-1]):
+                if neighbor in nodes:
+                    continue
+                if self.remaining <= 0:
+                    self.truncated = True
+                    return halves
+                self._charge(1)
+                half = (nodes + (neighbor,), edges + (edge,))
+                halves.setdefault((neighbor, len(half[1])), []).append(half)
+                stack.append(half)
+        return halves
+
+    def all_paths(self, max_hops=DEFAULT_MAX_HOPS, max_paths=DEFAULT_MAX_PATHS) -> List[Path]:
+        if self.source == self.target:
+            return [((self.source,), ())]
+        half = (max_hops + 1) // 2
+        forward = self._half_paths(self.source, self.target, half)
+        backward = self._half_paths(self.target, self.source, half)
+        by_length: Dict[int, List[Tuple[int, List[Path]]]] = {}
+        for (end, length), halves in forward.items():
+            by_length.setdefault(length, []).append((end, halves))
+        # A path of odd length L is joined at hop floor(L/2) and at hop
+        # ceil(L/2), so an unexpanded hub in either middle position still
+        # connects the two halves; duplicates are dropped
+        paths: Dict[Path, None] = {}
+        for length in range(1, max_hops + 1):
+            for forward_length in sorted({(length + 1) // 2, length // 2}, reverse=True):
+                for end, forward_halves in by_length.get(forward_length, ()):
+                    backward_halves = backward.get((end, length - forward_length))
+                    if not backward_halves:
+                        continue
+                    for forward_nodes, forward_edges in forward_halves:
+                        for backward_nodes, backward_edges in backward_halves:
+                            if len(set(forward_nodes).intersection(backward_nodes)) > 1:
+                                continue
+                            paths[(forward_nodes + backward_nodes[-2::-1], forward_edges + backward_edges[::-1])] = None
+                            if len(paths) >= max_paths:
+                                return list(paths)
+        return list(paths)
+
+
+def _chains(parents, node):
+    # Parent chains from `node` back to the search root, one at a time:
+    # (nodes from `node` to the root, relationships in the same order)
+    stack = [((node,), ())]
+    while stack:
+        nodes, edges = stack.pop()
+        links = parents[nodes[-1]]
+        if not links:
+            yield nodes, edges
+        for parent, edge in reversed(links):
+            stack.append((nodes + (parent,), edges + (edge,)))
@@ -0,0 +1,223 @@
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Opt-in sampling profiler for single slow requests
+#
+# With PROFILE_DIR set, a request carrying an `X-Profile: 1` header or a
+# `profile=1` query flag is profiled with probability PROFILE_SAMPLE_RATE. A
+# sampler thread reads the event loop thread's stack every PROFILE_INTERVAL
+# seconds until the response (streamed ones included) has been sent, then the
+# stacks are written to PROFILE_DIR as collapsed stacks (flamegraph.pl,
+# speedscope, inferno) or as a speedscope JSON file (PROFILE_FORMAT). The
+# file name is returned in the X-Profile response header, and /debug/profiles
+# lists the files that have been written.
+#
+# Only one request is profiled at a time. Samples are taken from the loop
+# thread, so time spent awaiting shows up as event loop frames, and from every
+# other thread that is running app code (agents run through asyncio.to_thread,
+# for one). Those stacks start at their first frame under app/ and sit under a
+# "thread <name>" root frame; idle pool threads have no app frames and are
+# left out. Worker threads busy with a concurrent request are sampled too.
+# Without PROFILE_DIR the middleware is not installed and requests pay nothing.
+
+PROFILE_DIR = os.environ.get("PROFILE_DIR")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "1.0"))
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL", "0.001"))
+PROFILE_FORMAT = os.environ.get("PROFILE_FORMAT", "collapsed")
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", "200"))
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_SUFFIXES = {"collapsed": ".collapsed.txt", "speedscope": ".speedscope.json"}
+
+_profile_flag = re.compile(r"(?:^|&)profile=(?:1|true)(?:&|$)")
+_unsafe = re.compile(r"[^A-Za-z0-9]+")
+
+Frame = Tuple[str, str, int]
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+
+class Sampler(threading.Thread):
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        super().__init__(name="request-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        # Root-first stack -> seconds attributed to it
+        self.stacks: Counter = Counter()
+        self.started = self.stopped = 0.0
+        self._done = threading.Event()
+
+    def run(self):
+        own = threading.get_ident()
+        names: Dict[int, str] = {}
+        last = self.started = time.perf_counter()
+        while not self._done.wait(self.interval):
+            frames = sys._current_frames()
+            now = time.perf_counter()
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                stack = _stack(frame)
+                if ident != self.thread_id:
+                    stack = _app_frames(stack)
+                    if not stack:
+                        continue
+                    if ident not in names:
+                        names.update((thread.ident, thread.name) for thread in threading.enumerate())
+                    stack = ((f"thread {names.get(ident, ident)}", "<thread>", 0),) + stack
+                self.stacks[stack] += now - last
+            last = now
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        self.stopped = time.perf_counter()
+
+
+def _stack(frame) -> Tuple[Frame, ...]:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+def _app_frames(stack) -> Tuple[Frame, ...]:
+    # The stack from its first app frame on; empty if it has none
+    for i, (_, path, _) in enumerate(stack):
+        if path.startswith(APP_DIR):
+            return stack[i:]
+    return ()
+
+
+def collapsed(stacks) -> str:
+    # One "root;...;leaf <microseconds>" line per distinct stack
+    lines = []
+    for stack, seconds in stacks.most_common():
+        names = ";".join(f"{name} ({os.path.basename(path)}:{line})" for name, path, line in stack)
+        lines.append(f"{names} {max(1, round(seconds * 1e6))}")
+    return "\n".join(lines) + "\n"
+
+
+def speedscope(stacks, name, duration) -> str:
+    frames: List[dict] = []
+    frame_ids: Dict[Frame, int] = {}
+    samples, weights = [], []
+    for stack, seconds in stacks.items():
+        sample = []
+        for frame in stack:
+            if frame not in frame_ids:
+                frame_ids[frame] = len(frames)
+                frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+            sample.append(frame_ids[frame])
+        samples.append(sample)
+        weights.append(seconds)
+    return json.dumps({
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": duration,
+            "samples": samples,
+            "weights": weights,
+        }],
+        "name": name,
+        "exporter": "fraud-analysis-api",
+    })
+
+
+def list_profiles(directory=PROFILE_DIR) -> List[dict]:
+    # Newest first
+    if not directory or not os.path.isdir(directory):
+        return []
+    profiles = []
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.endswith(tuple(PROFILE_SUFFIXES.values())):
+            stat = entry.stat()
+            profiles.append({
+                "name": entry.name,
+                "size": stat.st_size,
+                "created": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+            })
+    profiles.sort(key=lambda profile: profile["name"], reverse=True)
+    return profiles
+
+
+def profile_path(name, directory=PROFILE_DIR) -> Optional[str]:
+    # Only names that list_profiles would return resolve to a file
+    if not directory or os.path.basename(name) != name or not name.endswith(tuple(PROFILE_SUFFIXES.values())):
+        return None
+    path = os.path.join(directory, name)
+    return path if os.path.isfile(path) else None
+
+
+class ProfilingMiddleware:
+    def __init__(self, app, directory=PROFILE_DIR, sample_rate=PROFILE_SAMPLE_RATE,
+                 interval=PROFILE_INTERVAL, output_format=PROFILE_FORMAT, max_files=PROFILE_MAX_FILES):
+        if output_format not in PROFILE_SUFFIXES:
+            raise ValueError(f"PROFILE_FORMAT must be one of {', '.join(PROFILE_SUFFIXES)}")
+        self.app = app
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.output_format = output_format
+        self.max_files = max_files
+        self._busy = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _requested(self, scope):
+        if _profile_flag.search(scope.get("query_string", b"").decode("latin-1")):
+            return True
+        return any(name == PROFILE_HEADER and value.strip() in (b"1", b"true") for name, value in scope["headers"])
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or not self._requested(scope)
+                or random.random() >= self.sample_rate or not self._busy.acquire(blocking=False)):
+            await self.app(scope, receive, send)
+            return
+        try:
+            stamp = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+            slug = _unsafe.sub("-", scope["path"]).strip("-") or "root"
+            name = f"{stamp}-{scope['method'].lower()}-{slug}{PROFILE_SUFFIXES[self.output_format]}"
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    message = {**message, "headers": [*message.get("headers", []),
+                                                      (b"x-profile", name.encode("latin-1"))]}
+                await send(message)
+
+            sampler = Sampler(threading.get_ident(), self.interval)
+            sampler.start()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                sampler.stop()
+                self._write(name, f"{scope['method']} {scope['path']}", sampler)
+        finally:
+            self._busy.release()
+
+    def _write(self, name, title, sampler):
+        if self.output_format == "speedscope":
+            body = speedscope(sampler.stacks, title, sampler.stopped - sampler.started)
+        else:
+            body = collapsed(sampler.stacks)
+        path = os.path.join(self.directory, name)
+        with open(path + ".tmp", "w") as handle:
+            handle.write(body)
+        os.replace(path + ".tmp", path)
+        # Keep the newest max_files profiles
+        for stale in list_profiles(self.directory)[self.max_files:]:
+            os.remove(os.path.join(self.directory, stale["name"]))
@@ -0,0 +1,326 @@
+import hashlib
+import ipaddress
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from app.fast_json import loads
+from app.nlu import load_entity_extractor
+
+# Result cache for chat and agent queries
+#
+# Queries are keyed by the lowercased text the handlers match on, with
+# extracted entities rewritten to a canonical value (e.g. compressed IPv6).
+# Whitespace and punctuation stay in the key, since the handlers' substring
+# matchers see them. Entries expire after a TTL and the store
+# is bounded by least-recently-used eviction.
+#
+# Every entry is stamped with the cache generation. invalidate() bumps the
+# generation, which turns all existing entries into misses at once; callers
+# invalidate when graph data changes, and registered watch functions (e.g.
+# data file versions) trigger it automatically when their value changes.
+#
+# Setting QUERY_CACHE_PATH (or QUERY_CACHE_BACKEND=sqlite) selects a SQLite
+# file in WAL mode that every uvicorn worker of the deployment shares:
+# entries, the generation and the hit/miss counters. Without either, the
+# cache is per process (QUERY_CACHE_BACKEND=memory). The default SQLite path
+# is derived from the backend directory, so unrelated checkouts never share
+# a file.
+#
+# Hits are served by a plain SELECT and never take the database write lock.
+# Hit/miss counters and LRU timestamps are buffered per process and written
+# in one transaction every COUNTER_FLUSH_LOOKUPS lookups or
+# COUNTER_FLUSH_INTERVAL seconds, so shared counters and eviction order are
+# approximate between flushes.
+#
+# The file outlives the server. start() resets it once per server run, not
+# once per worker: workers started by the same supervisor share its pid
+# (override with QUERY_CACHE_RUN_ID), and only the first worker of a new run
+# invalidates.
+
+DEFAULT_TTL = 300.0
+DEFAULT_MAX_ENTRIES = 1024
+
+COUNTER_FLUSH_LOOKUPS = 256
+COUNTER_FLUSH_INTERVAL = 1.0
+
+_DEPLOYMENT = hashlib.blake2b(os.path.dirname(os.path.dirname(os.path.abspath(__file__))).encode(),
+                              digest_size=6).hexdigest()
+CACHE_PATH = os.environ.get(
+    "QUERY_CACHE_PATH", os.path.join(tempfile.gettempdir(), f"fraudgraph-query-cache-{_DEPLOYMENT}.sqlite3"))
+CACHE_BACKEND = os.environ.get("QUERY_CACHE_BACKEND", "sqlite" if "QUERY_CACHE_PATH" in os.environ else "memory")
+CACHE_RUN_ID = os.environ.get("QUERY_CACHE_RUN_ID") or str(os.getppid())
+
+
+_dumps = json.JSONEncoder(separators=(",", ":"), default=str).encode
+_key_dumps = json.JSONEncoder(separators=(",", ":"), sort_keys=True, default=str).encode
+
+
+def _canonical_entity(entity):
+    value = entity["value"]
+    if entity["entity"] == "ip_address":
+        try:
+            return ipaddress.ip_address(value).compressed
+        except ValueError:
+            pass
+    return value.lower()
+
+
+def normalize_query(text, entities: Optional[List[dict]] = None):
+    # The lowercased text the handlers match on, with entity spans rewritten
+    # to their canonical value. Whitespace and punctuation are kept: the
+    # matchers see them, so queries differing there may get different answers.
+    # `entities` may be passed in when the caller has already extracted them
+    if entities is None:
+        entities = load_entity_extractor().extract(text)
+    parts = []
+    position = 0
+    for entity in entities:
+        parts.append(text[position:entity["start"]].lower())
+        parts.append(_canonical_entity(entity))
+        position = entity["end"]
+    parts.append(text[position:].lower())
+    return "".join(parts)
+
+
+class MemoryBackend:
+    # Per-process LRU; only safe with a single worker
+
+    name = "memory"
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._counters = {"hits": 0, "misses": 0}
+
+    def get(self, key, now):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == self._generation and entry[1] > now:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return entry[2]
+            if entry is not None:
+                del self._entries[key]
+            self._counters["misses"] += 1
+            return None
+
+    def set(self, key, value, expires):
+        with self._lock:
+            self._entries[key] = (self._generation, expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            return self._generation
+
+    def start(self, run_id):
+        # A fresh process starts with an empty cache
+        return self._generation
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, "entries": len(self._entries), "generation": self._generation}
+
+
+class SQLiteBackend:
+    # Shared by every process that opens the same file
+
+    name = "sqlite"
+
+    def __init__(self, path=CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        # sqlite3 connections are bound to the thread that created them
+        self._local = threading.local()
+        # Counter increments and LRU timestamps not yet written
+        self._pending_lock = threading.Lock()
+        self._pending = {"hits": 0, "misses": 0}
+        self._pending_used: Dict[str, float] = {}
+        self._pending_lookups = 0
+        self._flushed = time.monotonic()
+        with self._connection() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS entries ("
+                       "key TEXT PRIMARY KEY, generation INTEGER NOT NULL, "
+                       "expires REAL NOT NULL, used REAL NOT NULL, value TEXT NOT NULL)")
+            db.execute("CREATE INDEX IF NOT EXISTS entries_used ON entries (used)")
+            db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            db.executemany("INSERT OR IGNORE INTO meta (name, value) VALUES (?, 0)",
+                           [("generation",), ("hits",), ("misses",), ("run",)])
+
+    def _connection(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db = self._local.db = _Transaction(db)
+        return db
+
+    def get(self, key, now):
+        # Read-only: WAL readers never wait for the write lock
+        row = self._connection().db.execute(
+            "SELECT value FROM entries WHERE key = ? AND expires > ? "
+            "AND generation = (SELECT value FROM meta WHERE name = 'generation')",
+            (key, now)).fetchone()
+        with self._pending_lock:
+            if row is None:
+                self._pending["misses"] += 1
+            else:
+                self._pending["hits"] += 1
+                self._pending_used[key] = now
+            self._pending_lookups += 1
+            due = (self._pending_lookups >= COUNTER_FLUSH_LOOKUPS
+                   or time.monotonic() - self._flushed >= COUNTER_FLUSH_INTERVAL)
+        if due:
+            self.flush()
+        return None if row is None else loads(row[0])
+
+    def _take_pending(self):
+        with self._pending_lock:
+            pending, used = self._pending, self._pending_used
+            self._pending, self._pending_used = {"hits": 0, "misses": 0}, {}
+            self._pending_lookups = 0
+            self._flushed = time.monotonic()
+        return pending, used
+
+    def _write_pending(self, db, pending, used):
+        for name, count in pending.items():
+            if count:
+                db.execute("UPDATE meta SET value = value + ? WHERE name = ?", (count, name))
+        if used:
+            db.executemany("UPDATE entries SET used = ? WHERE key = ?",
+                           [(timestamp, key) for key, timestamp in used.items()])
+
+    def flush(self):
+        # Write buffered counters and LRU timestamps in one transaction
+        pending, used = self._take_pending()
+        if any(pending.values()) or used:
+            with self._connection() as db:
+                self._write_pending(db, pending, used)
+
+    def set(self, key, value, expires):
+        now = time.time()
+        pending, used = self._take_pending()
+        with self._connection() as db:
+            # Buffered counters ride along with the write transaction
+            self._write_pending(db, pending, used)
+            db.execute(
+                "INSERT OR REPLACE INTO entries (key, generation, expires, used, value) "
+                "VALUES (?, (SELECT value FROM meta WHERE name = 'generation'), ?, ?, ?)",
+                (key, expires, now, _dumps(value)))
+            overflow = db.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                # Expired and stale-generation entries go first, then least recently used
+                db.execute(
+                    "DELETE FROM entries WHERE expires <= ? "
+                    "OR generation <> (SELECT value FROM meta WHERE name = 'generation')", (now,))
+                overflow = db.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                db.execute("DELETE FROM entries WHERE key IN "
+                           "(SELECT key FROM entries ORDER BY used LIMIT ?)", (overflow,))
+
+    def invalidate(self):
+        with self._connection() as db:
+            db.execute("UPDATE meta SET value = value + 1 WHERE name = 'generation'")
+            db.execute("DELETE FROM entries")
+            return db.execute("SELECT value FROM meta WHERE name = 'generation'").fetchone()[0]
+
+    def start(self, run_id):
+        # Invalidate once per server run: the first worker to start records
+        # the run, later workers of the same run keep its entries
+        with self._connection() as db:
+            current = db.execute("SELECT value FROM meta WHERE name = 'run'").fetchone()[0]
+            if str(current) != run_id:
+                db.execute("UPDATE meta SET value = ? WHERE name = 'run'", (run_id,))
+                db.execute("UPDATE meta SET value = value + 1 WHERE name = 'generation'")
+                db.execute("DELETE FROM entries")
+            return db.execute("SELECT value FROM meta WHERE name = 'generation'").fetchone()[0]
+
+    def stats(self):
+        self.flush()
+        with self._connection() as db:
+            counters = dict(db.execute("SELECT name, value FROM meta").fetchall())
+            entries = db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {"hits": counters["hits"], "misses": counters["misses"], "entries": entries,
+                "generation": counters["generation"]}
+
+
+class _Transaction:
+    # `with` block = one IMMEDIATE transaction, so read-then-write is atomic across workers
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+class QueryCache:
+    def __init__(self, backend, ttl=DEFAULT_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self._watches: List[list] = []
+
+    @classmethod
+    def from_env(cls):
+        if CACHE_BACKEND == "memory":
+            return cls(MemoryBackend())
+        return cls(SQLiteBackend())
+
+    def watch(self, version: Callable[[], Any]):
+        # Invalidate whenever version() returns something new
+        self._watches.append([version, version()])
+
+    def _check_watches(self):
+        for watch in self._watches:
+            current = watch[0]()
+            if current != watch[1]:
+                watch[1] = current
+                self.invalidate()
+
+    def key(self, namespace, text, entities: Optional[List[dict]] = None, extra=None):
+        key = f"{namespace}:{normalize_query(text, entities)}"
+        if extra:
+            key += ":" + _key_dumps(extra)
+        return key
+
+    def get(self, key):
+        self._check_watches()
+        return self.backend.get(key, time.time())
+
+    def set(self, key, value):
+        self.backend.set(key, value, time.time() + self.ttl)
+
+    def invalidate(self):
+        return self.backend.invalidate()
+
+    def start(self, run_id=CACHE_RUN_ID):
+        # Startup hook: entries from a previous server run describe a graph
+        # this process no longer has. Watch baselines are re-taken here, so
+        # data loaded before start() does not count as a change
+        for watch in self._watches:
+            watch[1] = watch[0]()
+        return self.backend.start(run_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.backend.name, "ttl": self.ttl, **self.backend.stats()}
+
+
+query_cache = QueryCache.from_env()
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import List
+
+try:
+    import fcntl
+except ImportError:  # Windows: rebuilds are not serialized across processes
+    fcntl = None
+
+from app.data_source import SampleDataSource, sample_data
+from app.embeddings import Embedder, default_embedder
+from app.vector_index import VectorIndex
+
+# Retrieval over account and cluster descriptions
+#
+# Each sample account and cluster is rendered as a short description,
+# embedded in one batch, and upserted into a VectorIndex under a stable id
+# ("account:<id>", "cluster:<id>"). The index is re-synced whenever the
+# sample data source version changes: unchanged ids are overwritten and ids
+# that left the data are deleted.
+#
+# Set VECTOR_INDEX_PATH to keep the vectors in memory-mapped files instead of
+# process memory. Every worker maps the same directory, so it is never
+# written in place: each build goes to a temporary directory named after a
+# digest of the embedder and the documents, is renamed into place, and the
+# CURRENT file is swapped to point at it, all under an exclusive file lock.
+# A worker whose data matches the digest in CURRENT's header just opens that
+# build read-only.
+
+VECTOR_INDEX_PATH = os.environ.get("VECTOR_INDEX_PATH")
+
+
+def describe_account(account):
+    status = "flagged as fraudulent" if account.get("isFraudulent") else "not flagged"
+    related = ", ".join(account.get("relatedAccounts") or []) or "none"
+    return (f"Account {account['username']} ({account['email']}) logged in from IP address "
+            f"{account['ip']} at {account['loginTime']}; {status}; related accounts: {related}.")
+
+
+def describe_cluster(cluster):
+    usernames = ", ".join(account["username"] for account in cluster.get("accounts", []))
+    return (f"Fraud cluster {cluster['id']}: {len(cluster.get('accounts', []))} accounts "
+            f"({usernames}) sharing IP address {cluster['ip']}, detected at {cluster['timestamp']} "
+            f"with confidence {cluster['confidence']}.")
+
+
+@contextmanager
+def _file_lock(path):
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class RetrievalIndex:
+    def __init__(self, source: SampleDataSource = sample_data, path=VECTOR_INDEX_PATH,
+                 embedder: Embedder = default_embedder):
+        self.source = source
+        self.embedder = embedder
+        self.path = path
+        # On disk, the index is opened or built on the first sync
+        self.index = VectorIndex(embedder.dim) if path is None else None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def documents(self, data):
+        documents = []
+        for account in data["accounts"]:
+            documents.append((f"account:{account['id']}", "account", account, describe_account(account)))
+        for cluster in data["clusters"]:
+            documents.append((f"cluster:{cluster['id']}", "cluster", cluster, describe_cluster(cluster)))
+        return documents
+
+    def sync(self):
+        # Bring the index up to date when the sample data changed since the last sync
+        data = self.source.get()
+        if self._version == self.source.version:
+            return self
+        with self._lock:
+            version = self.source.version
+            if self._version == version:
+                return self
+            documents = self.documents(data)
+            if self.path is None:
+                self._upsert(self.index, documents)
+                current = {doc_id for doc_id, _, _, _ in documents}
+                self.index.delete([doc_id for doc_id in list(self.index.ids) if doc_id not in current])
+            else:
+                self.index = self._open_or_build(documents)
+            self._version = version
+        return self
+
+    def _upsert(self, index, documents):
+        if documents:
+            index.upsert(
+                [doc_id for doc_id, _, _, _ in documents],
+                self.embedder.encode(text for _, _, _, text in documents),
+                [{"type": kind, "record": record, "text": text} for _, kind, record, text in documents],
+            )
+
+    def _digest(self, documents):
+        # Identifies a build: embedder, dimension and every document with its payload
+        digest = hashlib.blake2b(digest_size=16)
+        embedder = (type(self.embedder).__name__, self.embedder.dim, getattr(self.embedder, "ngrams", None))
+        digest.update(json.dumps(embedder).encode())
+        for document in documents:
+            digest.update(json.dumps(document, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def _open_current(self, digest):
+        # The live build, if its header matches this embedder and these documents
+        try:
+            with open(os.path.join(self.path, "CURRENT")) as f:
+                index = VectorIndex.open(os.path.join(self.path, f.read().strip()), mode="r")
+            if index.dim != self.embedder.dim or index.meta.get("digest") != digest:
+                return None
+            # Load ids and payloads now: a later rebuild may remove these files
+            index.positions
+            return index
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _open_or_build(self, documents):
+        digest = self._digest(documents)
+        index = self._open_current(digest)
+        if index is not None:
+            return index
+        os.makedirs(self.path, exist_ok=True)
+        with _file_lock(os.path.join(self.path, "lock")):
+            # Another worker may have built it while this one waited
+            index = self._open_current(digest)
+            if index is not None:
+                return index
+            try:
+                with open(os.path.join(self.path, "CURRENT")) as f:
+                    previous = f.read().strip()
+            except OSError:
+                previous = None
+            name = f"index-{digest}"
+            building = os.path.join(self.path, f"build-{os.getpid()}")
+            shutil.rmtree(building, ignore_errors=True)
+            index = VectorIndex(self.embedder.dim, building)
+            index.meta["digest"] = digest
+            self._upsert(index, documents)
+            index.flush()
+            target = os.path.join(self.path, name)
+            shutil.rmtree(target, ignore_errors=True)
+            os.replace(building, target)
+            with open(os.path.join(self.path, "CURRENT.tmp"), "w") as f:
+                f.write(name)
+            os.replace(os.path.join(self.path, "CURRENT.tmp"), os.path.join(self.path, "CURRENT"))
+            # Workers still mapping the old build keep their mappings
+            if previous and previous != name:
+                shutil.rmtree(os.path.join(self.path, previous), ignore_errors=True)
+            return self._open_current(digest)
+
+    def payload(self, doc_id):
+        if self.index is None:
+            self.sync()
+        row = self.index.positions.get(doc_id)
+        return None if row is None else self.index.payloads[row]
+
+    def search(self, query: str, k=3, mode="auto", nprobe=8) -> List[dict]:
+        self.sync()
+        return self.index.search(self.embedder.encode_query(query), k=k, mode=mode, nprobe=nprobe)[0]
+
+
+retrieval_index = RetrievalIndex()
@@ -1,7 +1,21 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 from typing import Dict, List, Any, Optional
 import json
+import os
+
+import numpy as np
+
+from app.batch import run_batch
+from app.cypher import CypherError, compile_query
+from app.fast_json import FastJSONResponse, PreEncoded
+from app.graph_store import GraphStore
+from app.metrics import timed
+from app.paths import (DEFAULT_MAX_DEGREE, DEFAULT_MAX_EXPANSIONS, DEFAULT_MAX_HOPS, DEFAULT_MAX_PATHS,
+                       PathSearch)
+from app.pagination import (NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, count_response, page_bounds,
+                            parse_fields, project)
+from app.streaming import ndjson_response, wants_stream
 
 # Mock Neo4j integration
 # In a real implementation, this would connect to a Neo4j database
@@ -15,6 +29,7 @@ router = APIRouter(
 class CypherQuery(BaseModel):
     query: str
     parameters: Optional[Dict[str, Any]] = None
+    maxExpansions: int = DEFAULT_MAX_EXPANSIONS
 
 class GraphNode(BaseModel):
     id: str
@@ -31,6 +46,42 @@ class GraphRelationship(BaseModel):
 class GraphResult(BaseModel):
     nodes: List[GraphNode]
     relationships: List[GraphRelationship]
+    # Set when variable-length matching ran out of its expansion budget
+    truncated: bool = False
+
+class CypherBatch(BaseModel):
+    queries: List[CypherQuery]
+
+class CypherBatchItem(BaseModel):
+    result: Optional[GraphResult] = None
+    error: Optional[str] = None
+
+class CypherBatchResult(BaseModel):
+    results: List[CypherBatchItem]
+
+class PathQuery(BaseModel):
+    source: str
+    target: str
+    relationshipTypes: Optional[List[str]] = None
+    maxHops: int = DEFAULT_MAX_HOPS
+    maxPaths: int = DEFAULT_MAX_PATHS
+    maxExpansions: int = DEFAULT_MAX_EXPANSIONS
+    maxDegree: int = DEFAULT_MAX_DEGREE
+    allPaths: bool = True
+
+class GraphPath(BaseModel):
+    length: int
+    nodes: List[str]
+    relationships: List[str]
+
+class PathResult(BaseModel):
+    shortest: List[GraphPath]
+    paths: List[GraphPath]
+    nodes: List[GraphNode]
+    relationships: List[GraphRelationship]
+    expansions: int
+    truncated: bool
+    hubsSkipped: List[str]
 
 # Mock data for Neo4j graph database
 mock_nodes = [
@@ -163,75 +214,222 @@ mock_relationships = [
     }
 ]
 
+# Graph store over the mock data, with an address index for IP lookups.
+# With GRAPH_SNAPSHOT_PATH set, Cypher and path queries run over the snapshot
+# instead: main.py serves that same store as its fraud graph, so there is one
+# store per process and ingested logins land in it directly. Snapshot nodes
+# carry the GraphData properties (IP addresses are in `label`).
+GRAPH_SNAPSHOT_PATH = os.environ.get("GRAPH_SNAPSHOT_PATH")
+if GRAPH_SNAPSHOT_PATH:
+    from app.snapshot import load_snapshot
+    graph_store = load_snapshot(GRAPH_SNAPSHOT_PATH, indexes=[("IPAddress", "label")])
+else:
+    graph_store = GraphStore.from_records(
+        mock_nodes,
+        mock_relationships,
+        indexes=[("IPAddress", "address")],
+    )
+graph_store.compact()
+
+status_payload = PreEncoded({"status": "connected", "version": "5.13.0"})
+
 # API routes
 @router.get("/", response_model=Dict[str, str])
 async def neo4j_status():
-    return {"status": "connected", "version": "5.13.0"}
+    return status_payload.response()
+
+def parse_cursor(after):
+    # "<last node index>:<last relationship index>"
+    if after is None:
+        return None, None
+    try:
+        node, relationship = after.split(":")
+        return int(node), int(relationship)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {after}")
+
+TRUNCATED_HEADER = "X-Truncated"
+
+def project_properties(record, fields):
+    return {**record, "properties": project(record["properties"], fields)}
 
 @router.post("/query", response_model=GraphResult)
-async def execute_cypher(query: CypherQuery):
-    # In a real implementation, this would execute the Cypher query against Neo4j
-    # For this mock, we'll return different results based on the query content
-    
-    if "MATCH (a:Account)-[:CONNECTS_FROM]->(ip:IPAddress)" in query.query:
-        # Query is looking for accounts connected to IP addresses
-        return {
-            "nodes": mock_nodes,
-            "relationships": mock_relationships
-        }
-    elif "MATCH (a:Account)-[:CONNECTS_FROM]->(ip:IPAddress {address:" in query.query:
-        # Query is looking for accounts with a specific IP
-        ip_address = "192.168.1.100"  # Extract from query in a real implementation
-        
-        # Filter nodes and relationships for the specific IP
-        ip_node = next((node for node in mock_nodes if node["labels"] == ["IPAddress"] and node["properties"]["address"] == ip_address), None)
-        if not ip_node:
-            return {"nodes": [], "relationships": []}
-        
-        ip_node_id = ip_node["id"]
-        related_relationships = [rel for rel in mock_relationships if rel["endNode"] == ip_node_id and rel["type"] == "CONNECTS_FROM"]
-        account_node_ids = [rel["startNode"] for rel in related_relationships]
-        account_nodes = [node for node in mock_nodes if node["id"] in account_node_ids]
-        
-        # Also include relationships between these accounts
-        account_relationships = [rel for rel in mock_relationships if rel["type"] == "RELATED_TO" and rel["startNode"] in account_node_ids and rel["endNode"] in account_node_ids]
-        
+async def execute_cypher(query: CypherQuery, request: Request, stream: bool = False,
+                         limit: Optional[int] = None, after: Optional[str] = None,
+                         fields: Optional[str] = None, count: bool = False):
+    # Compile the query (cached by normalized text) and run it over the graph store
+    try:
+        with timed("cypher.compile"):
+            plan = compile_query(query.query)
+        with timed("cypher.execute"):
+            result = plan.execute(graph_store, query.parameters, query.maxExpansions)
+    except CypherError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if count:
+        return count_response(nodes=len(result.nodes), relationships=len(result.relationships),
+                              truncated=result.truncated)
+
+    # Nodes and relationships are paged side by side, keyed by store index;
+    # `fields` projects their properties
+    node_keys = np.sort(np.asarray(result.nodes, dtype=np.int64))
+    relationship_keys = np.asarray(result.relationships, dtype=np.int64)
+    node_after, relationship_after = parse_cursor(after)
+    node_start, node_end = page_bounds(node_keys, node_after, limit)
+    relationship_start, relationship_end = page_bounds(relationship_keys, relationship_after, limit)
+    nodes = node_keys[node_start:node_end].tolist()
+    relationships = relationship_keys[relationship_start:relationship_end].tolist()
+    headers = {TOTAL_COUNT_HEADER: f"{len(node_keys)}:{len(relationship_keys)}"}
+    if node_end < len(node_keys) or relationship_end < len(relationship_keys):
+        last_node = nodes[-1] if nodes else (node_after if node_after is not None else -1)
+        last_relationship = relationships[-1] if relationships else (
+            relationship_after if relationship_after is not None else -1)
+        headers[NEXT_CURSOR_HEADER] = f"{last_node}:{last_relationship}"
+    fields = parse_fields(fields)
+    node_record, relationship_record = graph_store.node_record, graph_store.relationship_record
+    if fields is not None:
+        node_record = lambda index: project_properties(graph_store.node_record(index), fields)
+        relationship_record = lambda index: project_properties(graph_store.relationship_record(index), fields)
+
+    if wants_stream(request, stream):
+        # Nodes, then relationships, materialized one record at a time; a
+        # truncated match is flagged in a header
+        streamed = ndjson_response([
+            ("node", map(node_record, nodes)),
+            ("relationship", map(relationship_record, relationships)),
+        ])
+        streamed.headers.update(headers)
+        if result.truncated:
+            streamed.headers[TRUNCATED_HEADER] = "true"
+        return streamed
+
+    # Store records already have the GraphResult shape
+    return FastJSONResponse({
+        "nodes": [node_record(index) for index in nodes],
+        "relationships": [relationship_record(index) for index in relationships],
+        "truncated": result.truncated,
+    }, headers=headers)
+
+@router.post("/query/batch", response_model=CypherBatchResult)
+async def execute_cypher_batch(batch: CypherBatch):
+    # Identical (query, parameters) pairs run once, each distinct query text
+    # is compiled once, and each node or relationship record is built once
+    # per batch
+    plans, node_records, relationship_records = {}, {}, {}
+
+    def node_record(index):
+        record = node_records.get(index)
+        if record is None:
+            record = node_records[index] = graph_store.node_record(index)
+        return record
+
+    def relationship_record(index):
+        record = relationship_records.get(index)
+        if record is None:
+            record = relationship_records[index] = graph_store.relationship_record(index)
+        return record
+
+    def run(query):
+        plan = plans.get(query.query)
+        if plan is None:
+            plan = plans[query.query] = compile_query(query.query)
+        result = plan.execute(graph_store, query.parameters, query.maxExpansions)
         return {
-            "nodes": [ip_node] + account_nodes,
-            "relationships": related_relationships + account_relationships
+            "nodes": [node_record(index) for index in sorted(result.nodes)],
+            "relationships": [relationship_record(index) for index in result.relationships],
+            "truncated": result.truncated,
         }
-    else:
-        # Default response for other queries
-        return {
-            "nodes": [],
-            "relationships": []
+
+    def key(query):
+        return query.query, json.dumps(query.parameters, sort_keys=True, default=str), query.maxExpansions
+
+    with timed("cypher.batch"):
+        results = run_batch(batch.queries, key, run, errors=(CypherError,))
+    return FastJSONResponse({"results": results})
+
+# Static schema, encoded once
+schema_payload = PreEncoded({
+    "nodes": [
+        {
+            "label": "Account",
+            "properties": ["id", "username", "email", "createdAt"]
+        },
+        {
+            "label": "IPAddress",
+            "properties": ["address", "location", "isSuspicious"]
+        }
+    ],
+    "relationships": [
+        {
+            "type": "CONNECTS_FROM",
+            "start": "Account",
+            "end": "IPAddress",
+            "properties": ["timestamp"]
+        },
+        {
+            "type": "RELATED_TO",
+            "start": "Account",
+            "end": "Account",
+            "properties": ["confidence", "reason"]
         }
+    ]
+})
 
 @router.get("/schema", response_model=Dict[str, Any])
 async def get_schema():
-    return {
-        "nodes": [
-            {
-                "label": "Account",
-                "properties": ["id", "username", "email", "createdAt"]
-            },
-            {
-                "label": "IPAddress",
-                "properties": ["address", "location", "isSuspicious"]
-            }
-        ],
-        "relationships": [
-            {
-                "type": "CONNECTS_FROM",
-                "start": "Account",
-                "end": "IPAddress",
-                "properties": ["timestamp"]
-            },
-            {
-                "type": "RELATED_TO",
-                "start": "Account",
-                "end": "Account",
-                "properties": ["confidence", "reason"]
-            }
-        ]
-    }
+    return schema_payload.response()
+
+# Upper bounds for path search requests
+MAX_PATH_HOPS = 10
+MAX_PATH_RESULTS = 1000
+MAX_PATH_EXPANSIONS = 10_000_000
+
+@router.post("/paths", response_model=PathResult)
+async def find_paths(query: PathQuery):
+    # Shortest paths (bidirectional BFS) and all simple paths up to maxHops
+    # between two nodes, within a budget of maxExpansions gathered neighbors;
+    # nodes above maxDegree relationships are not expanded (see app/paths.py)
+    if not 1 <= query.maxHops <= MAX_PATH_HOPS:
+        raise HTTPException(status_code=400, detail=f"maxHops must be between 1 and {MAX_PATH_HOPS}")
+    if not 1 <= query.maxPaths <= MAX_PATH_RESULTS:
+        raise HTTPException(status_code=400, detail=f"maxPaths must be between 1 and {MAX_PATH_RESULTS}")
+    if not 1 <= query.maxExpansions <= MAX_PATH_EXPANSIONS or query.maxDegree < 1:
+        raise HTTPException(status_code=400,
+                            detail=f"maxExpansions must be between 1 and {MAX_PATH_EXPANSIONS}, maxDegree positive")
+    source, target = graph_store.lookup(query.source), graph_store.lookup(query.target)
+    if source is None or target is None:
+        missing = query.source if source is None else query.target
+        raise HTTPException(status_code=404, detail=f"Node not found: {missing}")
+
+    search = PathSearch(graph_store, source, target, query.relationshipTypes, query.maxExpansions, query.maxDegree)
+    with timed("paths.shortest"):
+        shortest = search.shortest_paths(query.maxHops, query.maxPaths)
+    paths = []
+    if query.allPaths:
+        with timed("paths.all"):
+            paths = search.all_paths(query.maxHops, query.maxPaths)
+
+    # Every node and relationship on a returned path, in first-seen order
+    nodes, relationships = {}, {}
+    for path_nodes, path_relationships in shortest + paths:
+        nodes.update(dict.fromkeys(path_nodes))
+        relationships.update(dict.fromkeys(path_relationships))
+    relationships = {index: graph_store.relationship_record(index) for index in relationships}
+
+    def path_record(path):
+        path_nodes, path_relationships = path
+        return {
+            "length": len(path_relationships),
+            "nodes": [graph_store.node_id(index) for index in path_nodes],
+            "relationships": [relationships[index]["id"] for index in path_relationships],
+        }
+
+    return FastJSONResponse({
+        "shortest": [path_record(path) for path in shortest],
+        "paths": [path_record(path) for path in paths],
+        "nodes": [graph_store.node_record(index) for index in nodes],
+        "relationships": list(relationships.values()),
+        "expansions": search.expansions,
+        "truncated": search.truncated,
+        "hubsSkipped": sorted(graph_store.node_id(index) for index in search.hubs_skipped),
+    })
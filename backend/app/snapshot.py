@@ -0,0 +1,426 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from typing import Any, Dict, List
+
+import numpy as np
+
+from app.fast_json import loads
+from app.graph_store import MISSING, NODE_DTYPE, GraphStore
+
+# Binary graph snapshots
+#
+# One file holds a whole GraphStore: a magic line, a little-endian uint64
+# header length, a JSON header (counts, label sets, relationship types,
+# property keys and the array directory) and then raw arrays, each aligned to
+# ARRAY_ALIGNMENT bytes:
+#
+#   strings.offsets / strings.data    string table (UTF-8, int64 offsets)
+#   node.id, node.labelset            string ref and label set per node
+#   node.hash, node.order             sorted id hashes for lookups
+#   edge.id, edge.type, edge.src, edge.dst   (and edge.hash, edge.order)
+#   csr.<type>.{out,in}_{offsets,nodes,edges}   adjacency per relationship type
+#   {node,edge}prop.<n>.kind / .value  one column pair per property key
+#
+# Property values are stored as a kind byte plus an int64: a string ref, an
+# integer, float bits, a bool, or a ref to JSON text for lists and objects.
+#
+# load_snapshot() maps the file read-only and wraps the arrays without
+# copying, so opening takes milliseconds, every worker shares the same page
+# cache pages, and only the parts a request touches are ever read. Nodes,
+# relationships and property updates after loading go to in-memory tails and
+# overlays; the file itself is never modified.
+#
+# Convert the JSON sample data (GraphData or Neo4j-shaped) from the backend
+# directory with:
+#   python -m app.snapshot app/data/graph.json graph.fgsnap
+
+MAGIC = b"FGSNAP1\n"
+ARRAY_ALIGNMENT = 64
+
+KIND_MISSING = 0
+KIND_STR = 1
+KIND_INT = 2
+KIND_FLOAT = 3
+KIND_BOOL = 4
+KIND_NONE = 5
+KIND_JSON = 6
+
+_INT64_MIN, _INT64_MAX = -(1 << 63), (1 << 63) - 1
+
+# GraphData node types -> store labels, as in main.py
+GRAPH_DATA_LABELS = {"account": "Account", "ip": "IPAddress"}
+
+
+def _hash(text):
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+
+
+# Read side: containers over mapped arrays with in-memory tails
+class _Strings:
+    __slots__ = ("offsets", "data")
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __getitem__(self, ref):
+        return bytes(self.data[self.offsets[ref]:self.offsets[ref + 1]]).decode()
+
+
+class _IntColumn:
+    # Mapped int32 base plus appended values
+
+    __slots__ = ("base", "tail")
+
+    def __init__(self, base):
+        self.base = base
+        self.tail = array("i")
+
+    def __len__(self):
+        return len(self.base) + len(self.tail)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return np.asarray(self)[index]
+        if index < 0:
+            index += len(self)
+        if index < len(self.base):
+            return int(self.base[index])
+        return self.tail[index - len(self.base)]
+
+    def __array__(self, dtype=None, copy=None):
+        values = np.concatenate((self.base, np.frombuffer(self.tail, dtype=NODE_DTYPE))) \
+            if self.tail else self.base
+        return values if dtype is None else values.astype(dtype, copy=False)
+
+    def __iter__(self):
+        yield from self.base.tolist()
+        yield from self.tail
+
+    def append(self, value):
+        self.tail.append(value)
+
+
+class _StringColumn:
+    __slots__ = ("strings", "refs", "tail")
+
+    def __init__(self, strings, refs):
+        self.strings = strings
+        self.refs = refs
+        self.tail: List[str] = []
+
+    def __len__(self):
+        return len(self.refs) + len(self.tail)
+
+    def __getitem__(self, index):
+        if index < len(self.refs):
+            return self.strings[self.refs[index]]
+        return self.tail[index - len(self.refs)]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def append(self, value):
+        self.tail.append(value)
+
+
+class _StringLookup:
+    # id -> index over a _StringColumn: binary search over sorted id hashes,
+    # plus a dict for ids added after loading
+
+    __slots__ = ("column", "hashes", "order", "added")
+
+    def __init__(self, column, hashes, order):
+        self.column = column
+        self.hashes = hashes
+        self.order = order
+        self.added: Dict[str, int] = {}
+
+    def get(self, key, default=None):
+        index = self.added.get(key)
+        if index is not None:
+            return index
+        target = np.uint64(_hash(key))
+        position = int(np.searchsorted(self.hashes, target))
+        while position < len(self.hashes) and self.hashes[position] == target:
+            index = int(self.order[position])
+            if self.column[index] == key:
+                return index
+            position += 1
+        return default
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __setitem__(self, key, index):
+        self.added[key] = index
+
+    def __len__(self):
+        return len(self.hashes) + len(self.added)
+
+
+class _PropertyColumn:
+    # One property key: mapped kind/value columns, overwritten rows and a tail
+
+    __slots__ = ("kinds", "values", "strings", "overrides", "tail")
+
+    def __init__(self, kinds, values, strings):
+        self.kinds = kinds
+        self.values = values
+        self.strings = strings
+        self.overrides: Dict[int, Any] = {}
+        self.tail: list = []
+
+    def __len__(self):
+        return len(self.kinds) + len(self.tail)
+
+    def __getitem__(self, index):
+        if index >= len(self.kinds):
+            return self.tail[index - len(self.kinds)]
+        if index in self.overrides:
+            return self.overrides[index]
+        kind, value = self.kinds[index], self.values[index]
+        if kind == KIND_STR:
+            return self.strings[value]
+        if kind == KIND_INT:
+            return int(value)
+        if kind == KIND_FLOAT:
+            return float(np.int64(value).view(np.float64))
+        if kind == KIND_BOOL:
+            return bool(value)
+        if kind == KIND_NONE:
+            return None
+        if kind == KIND_JSON:
+            return loads(self.strings[value])
+        return MISSING
+
+    def __setitem__(self, index, value):
+        if index >= len(self.kinds):
+            self.tail[index - len(self.kinds)] = value
+        else:
+            self.overrides[index] = value
+
+    def append(self, value):
+        self.tail.append(value)
+
+    def extend(self, values):
+        self.tail.extend(values)
+
+
+def load_snapshot(path, indexes=()) -> GraphStore:
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a graph snapshot")
+        header_length, = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_length))
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def mapped(name):
+        dtype, count, offset = header["arrays"][name]
+        return np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+
+    strings = _Strings(mapped("strings.offsets"), mapped("strings.data"))
+    node_ids = _StringColumn(strings, mapped("node.id"))
+    node_labelset = mapped("node.labelset")
+    labelsets = [tuple(labelset) for labelset in header["labelsets"]]
+    label_nodes = {}
+    for label in dict.fromkeys(label for labelset in labelsets for label in labelset):
+        members = [i for i, labelset in enumerate(labelsets) if label in labelset]
+        label_nodes[label] = _IntColumn(np.flatnonzero(np.isin(node_labelset, members)).astype(NODE_DTYPE))
+
+    edge_ids = _StringColumn(strings, mapped("edge.id"))
+    edge_type = mapped("edge.type")
+    edge_src = _IntColumn(mapped("edge.src"))
+    edge_dst = _IntColumn(mapped("edge.dst"))
+    adjacency = []
+    for i in range(len(header["types"])):
+        edges = np.flatnonzero(edge_type == i).astype(NODE_DTYPE)
+        arrays = {"edges": _IntColumn(edges), "src": _IntColumn(edge_src.base[edges]),
+                  "dst": _IntColumn(edge_dst.base[edges])}
+        for side in ("out", "in"):
+            for name in ("offsets", "nodes", "edges"):
+                arrays[f"{side}_{name}"] = mapped(f"csr.{i}.{side}_{name}")
+        adjacency.append(arrays)
+
+    return GraphStore.from_arrays(
+        node_ids=node_ids,
+        node_index=_StringLookup(node_ids, mapped("node.hash"), mapped("node.order")),
+        node_labelset=_IntColumn(node_labelset),
+        labelsets=labelsets,
+        label_nodes=label_nodes,
+        node_properties={key: _PropertyColumn(mapped(f"nodeprop.{i}.kind"), mapped(f"nodeprop.{i}.value"), strings)
+                         for i, key in enumerate(header["node_properties"])},
+        edge_ids=edge_ids,
+        edge_index=_StringLookup(edge_ids, mapped("edge.hash"), mapped("edge.order")),
+        edge_type=_IntColumn(edge_type),
+        edge_src=edge_src,
+        edge_dst=edge_dst,
+        edge_properties={key: _PropertyColumn(mapped(f"edgeprop.{i}.kind"), mapped(f"edgeprop.{i}.value"), strings)
+                         for i, key in enumerate(header["edge_properties"])},
+        types=header["types"],
+        adjacency=adjacency,
+        indexes=indexes,
+    )
+
+
+# Write side
+class _StringTable:
+    def __init__(self):
+        self.refs: Dict[str, int] = {}
+        self.chunks: List[bytes] = []
+
+    def ref(self, text):
+        ref = self.refs.get(text)
+        if ref is None:
+            ref = self.refs[text] = len(self.chunks)
+            self.chunks.append(text.encode())
+        return ref
+
+    def arrays(self):
+        offsets = np.zeros(len(self.chunks) + 1, dtype=np.int64)
+        np.cumsum([len(chunk) for chunk in self.chunks], out=offsets[1:])
+        return offsets, np.frombuffer(b"".join(self.chunks), dtype=np.uint8)
+
+
+def _encode_value(value, strings):
+    if value is MISSING:
+        return KIND_MISSING, 0
+    if value is None:
+        return KIND_NONE, 0
+    if isinstance(value, bool):
+        return KIND_BOOL, int(value)
+    if isinstance(value, int) and _INT64_MIN <= value <= _INT64_MAX:
+        return KIND_INT, value
+    if isinstance(value, float):
+        return KIND_FLOAT, int(np.float64(value).view(np.int64))
+    if isinstance(value, str):
+        return KIND_STR, strings.ref(value)
+    return KIND_JSON, strings.ref(json.dumps(value, separators=(",", ":"), default=str))
+
+
+def _property_arrays(columns, count, strings):
+    arrays = []
+    for key in columns.columns:
+        kinds = np.zeros(count, dtype=np.uint8)
+        values = np.zeros(count, dtype=np.int64)
+        for index in range(count):
+            kinds[index], values[index] = _encode_value(columns.get(index, key, MISSING), strings)
+        arrays.append((kinds, values))
+    return list(columns.columns), arrays
+
+
+def _id_index(ids):
+    hashes = np.fromiter((_hash(item) for item in ids), dtype=np.uint64, count=len(ids))
+    order = np.argsort(hashes, kind="stable")
+    return hashes[order], order.astype(NODE_DTYPE)
+
+
+def write_snapshot(store: GraphStore, path):
+    strings = _StringTable()
+    arrays: Dict[str, np.ndarray] = {}
+    nodes, edges = store.node_count, store.relationship_count
+
+    node_ids = [store.node_id(index) for index in range(nodes)]
+    arrays["node.id"] = np.fromiter((strings.ref(node_id) for node_id in node_ids), dtype=NODE_DTYPE, count=nodes)
+    arrays["node.labelset"] = np.array(store._node_labelset, dtype=NODE_DTYPE)
+    arrays["node.hash"], arrays["node.order"] = _id_index(node_ids)
+
+    edge_ids = [store._edge_ids[index] for index in range(edges)]
+    arrays["edge.id"] = np.fromiter((strings.ref(edge_id) for edge_id in edge_ids), dtype=NODE_DTYPE, count=edges)
+    arrays["edge.type"] = np.array(store._edge_type, dtype=NODE_DTYPE)
+    arrays["edge.src"] = np.array(store._edge_src, dtype=NODE_DTYPE)
+    arrays["edge.dst"] = np.array(store._edge_dst, dtype=NODE_DTYPE)
+    arrays["edge.hash"], arrays["edge.order"] = _id_index(edge_ids)
+
+    for i, rel_type in enumerate(store._types):
+        # Fold any pending delta so the file holds complete CSR arrays
+        adjacency = store._adjacency[i]
+        adjacency.build(nodes)
+        for side in ("out", "in"):
+            for part in ("offsets", "nodes", "edges"):
+                arrays[f"csr.{i}.{side}_{part}"] = getattr(adjacency, f"{side}_{part}")
+
+    node_properties, columns = _property_arrays(store._node_props, nodes, strings)
+    for i, (kinds, values) in enumerate(columns):
+        arrays[f"nodeprop.{i}.kind"], arrays[f"nodeprop.{i}.value"] = kinds, values
+    edge_properties, columns = _property_arrays(store._edge_props, edges, strings)
+    for i, (kinds, values) in enumerate(columns):
+        arrays[f"edgeprop.{i}.kind"], arrays[f"edgeprop.{i}.value"] = kinds, values
+    arrays["strings.offsets"], arrays["strings.data"] = strings.arrays()
+
+    header = {
+        "nodes": nodes,
+        "relationships": edges,
+        "labelsets": [list(labelset) for labelset in store._labelsets],
+        "types": list(store._types),
+        "node_properties": node_properties,
+        "edge_properties": edge_properties,
+        "arrays": {},
+    }
+    # Array offsets depend on the header length, which depends on the offsets;
+    # digits only grow, so recompute until the layout is stable
+    header_length = 0
+    while True:
+        offset = len(MAGIC) + 8 + header_length
+        for name, values in arrays.items():
+            offset = -(-offset // ARRAY_ALIGNMENT) * ARRAY_ALIGNMENT
+            header["arrays"][name] = [values.dtype.str, len(values), offset]
+            offset += values.nbytes
+        encoded = json.dumps(header, separators=(",", ":")).encode()
+        if len(encoded) <= header_length:
+            break
+        header_length = len(encoded)
+    encoded = encoded.ljust(header_length)
+
+    # Write to a temporary file and rename, so readers never map a partial snapshot
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", header_length))
+        f.write(encoded)
+        for name, values in arrays.items():
+            f.write(b"\0" * (header["arrays"][name][2] - f.tell()))
+            f.write(np.ascontiguousarray(values).tobytes())
+    os.replace(temporary, path)
+    return header
+
+
+def load_json_graph(path) -> GraphStore:
+    # GraphData ({"nodes", "links"}, optionally under "graph") or Neo4j-shaped
+    # ({"nodes", "relationships"}) JSON
+    with open(path, "rb") as f:
+        data = loads(f.read())
+    data = data.get("graph", data)
+    if "links" in data:
+        return GraphStore.from_graph_data(data["nodes"], data["links"], labels=GRAPH_DATA_LABELS)
+    return GraphStore.from_records(data["nodes"], data.get("relationships", []))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a JSON graph into a binary snapshot")
+    parser.add_argument("source", help="GraphData or Neo4j-shaped JSON file")
+    parser.add_argument("output", help="snapshot file to write")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    store = load_json_graph(args.source)
+    parsed = time.perf_counter()
+    write_snapshot(store, args.output)
+    written = time.perf_counter()
+    load_snapshot(args.output)
+    print(f"{store.node_count} nodes, {store.relationship_count} relationships: "
+          f"parsed in {parsed - started:.3f}s, written in {written - parsed:.3f}s, "
+          f"{os.path.getsize(args.output)} bytes, opens in {time.perf_counter() - written:.4f}s",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
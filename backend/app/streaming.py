@@ -0,0 +1,71 @@
+import json
+from typing import AsyncIterable, Iterable, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+# Newline-delimited JSON streaming for large graph results
+#
+# Each line is a single-key object naming the record kind, e.g.
+#   {"node": {...}}
+#   {"relationship": {...}}
+# followed by a trailing {"summary": {...}} line with per-kind counts.
+# Records are encoded lazily and flushed in chunks, so memory stays flat
+# regardless of result size.
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Number of lines buffered before a chunk is flushed to the client
+CHUNK_LINES = 512
+
+
+def wants_stream(request: Request, stream: bool = False):
+    # Streaming is opt-in through ?stream=1 or an NDJSON Accept header
+    return stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def ndjson_lines(sections: Iterable[Tuple[str, Iterable[dict]]], chunk_lines=CHUNK_LINES):
+    dumps = json.JSONEncoder(separators=(",", ":"), default=str).encode
+    counts = {}
+    buffer = []
+    for kind, records in sections:
+        count = 0
+        for record in records:
+            buffer.append(dumps({kind: record}))
+            count += 1
+            if len(buffer) >= chunk_lines:
+                buffer.append("")
+                yield "\n".join(buffer)
+                buffer = []
+        counts[kind] = counts.get(kind, 0) + count
+    buffer.append(dumps({"summary": counts}))
+    buffer.append("")
+    yield "\n".join(buffer)
+
+
+def ndjson_response(sections: Iterable[Tuple[str, Iterable[dict]]]):
+    return StreamingResponse(ndjson_lines(sections), media_type=NDJSON_MEDIA_TYPE)
+
+
+# Server-sent events
+#
+# Each event is "event: <name>", optional "id: <id>" and one "data:" line
+# holding compact JSON, terminated by a blank line.
+
+SSE_MEDIA_TYPE = "text/event-stream"
+
+_sse_dumps = json.JSONEncoder(separators=(",", ":"), default=str).encode
+
+
+def sse_event(event: str, data, event_id: Optional[str] = None):
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {_sse_dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def sse_response(events: AsyncIterable[str]):
+    # Disable proxy buffering so each event reaches the client immediately
+    return StreamingResponse(events, media_type=SSE_MEDIA_TYPE,
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,310 @@
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# Local k-NN vector index (stand-in for the hosted vector database)
+#
+# Vectors are L2-normalized float32 rows, so cosine similarity is a dot
+# product. Exact search scores batched queries against fixed-size row blocks
+# with one matrix product each and merges per-block top-k with argpartition.
+# Approximate search is IVF: spherical k-means centroids partition the rows
+# into inverted lists and a query only scores the rows of its `nprobe`
+# nearest lists.
+#
+# With a path, vectors and list assignments live in memory-mapped files
+# (vectors.f32, assignments.i32) sized to a capacity that doubles as needed,
+# so opening an index maps the files instead of reading them. Ids, payloads
+# and the centroids are small and stored next to them; meta.json holds the
+# header (dim, count, capacity and any caller fields in `meta`). Upserts
+# overwrite rows in place or append, and new rows join the nearest existing
+# list without retraining. Deletes move the last row into the freed one, so
+# rows stay dense.
+
+VECTOR_DTYPE = np.float32
+
+# Rows scored per matrix product during exact search
+EXACT_BLOCK_ROWS = 65536
+
+# k-means trains on at most this many rows per list
+TRAIN_ROWS_PER_LIST = 64
+
+INITIAL_CAPACITY = 1024
+
+EXACT = "exact"
+IVF = "ivf"
+AUTO = "auto"
+
+
+def normalize(vectors) -> np.ndarray:
+    vectors = np.array(vectors, dtype=VECTOR_DTYPE, ndmin=2)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors /= norms
+    return vectors
+
+
+def _top_k(scores, rows, k):
+    # Best k columns of `scores` (queries x candidates), highest first
+    k = min(k, scores.shape[1])
+    if k == 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(VECTOR_DTYPE)
+    if k < scores.shape[1]:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        part = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    top = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-top, axis=1, kind="stable")
+    return rows[np.take_along_axis(part, order, axis=1)], np.take_along_axis(top, order, axis=1)
+
+
+class VectorIndex:
+    def __init__(self, dim, path: Optional[str] = None, capacity=INITIAL_CAPACITY):
+        self.dim = dim
+        self.path = path
+        self.count = 0
+        self.meta: Dict[str, Any] = {}
+        self._records = ([], [], {})
+        self.centroids: Optional[np.ndarray] = None
+        self._lists = None
+        if path is not None:
+            # A new index starts from empty files even if an old one was there
+            os.makedirs(path, exist_ok=True)
+            for name in ("vectors.f32", "assignments.i32"):
+                open(self._file(name), "wb").close()
+        self.capacity = 0
+        self._vectors = np.empty((0, dim), dtype=VECTOR_DTYPE)
+        self._assignments = np.empty(0, dtype=np.int32)
+        self._reserve(capacity)
+
+    # Storage
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _map(self, name, dtype, shape, mode):
+        return np.memmap(self._file(name), dtype=dtype, mode=mode, shape=shape)
+
+    def _reserve(self, needed):
+        if needed <= self.capacity:
+            return
+        capacity = max(needed, self.capacity * 2, INITIAL_CAPACITY)
+        if self.path is None:
+            vectors = np.zeros((capacity, self.dim), dtype=VECTOR_DTYPE)
+            vectors[:self.count] = self._vectors[:self.count]
+            assignments = np.full(capacity, -1, dtype=np.int32)
+            assignments[:self.count] = self._assignments[:self.count]
+        else:
+            # Growing the files in place keeps existing rows where they are
+            for name, itemsize in (("vectors.f32", 4 * self.dim), ("assignments.i32", 4)):
+                with open(self._file(name), "ab") as f:
+                    f.truncate(capacity * itemsize)
+            vectors = self._map("vectors.f32", VECTOR_DTYPE, (capacity, self.dim), "r+")
+            assignments = self._map("assignments.i32", np.int32, (capacity,), "r+")
+        self._vectors, self._assignments, self.capacity = vectors, assignments, capacity
+
+    @classmethod
+    def open(cls, path, mode="r+"):
+        # mode "r" maps the files read-only, for indexes other processes share
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        index = cls.__new__(cls)
+        index.dim = meta.pop("dim")
+        index.path = path
+        index.count = meta.pop("count")
+        index.capacity = meta.pop("capacity")
+        index.meta = meta
+        # Ids and payloads are read on first use so opening only maps files
+        index._records = None
+        index._vectors = index._map("vectors.f32", VECTOR_DTYPE, (index.capacity, index.dim), mode)
+        index._assignments = index._map("assignments.i32", np.int32, (index.capacity,), mode)
+        centroids = index._file("centroids.npy")
+        index.centroids = np.load(centroids) if os.path.exists(centroids) else None
+        index._lists = None
+        return index
+
+    def flush(self):
+        # Persist ids, payloads and centroids; vector rows are already in the maps
+        if self.path is None:
+            return
+        self._vectors.flush()
+        self._assignments.flush()
+        if self.centroids is not None:
+            np.save(self._file("centroids.npy"), self.centroids)
+        with open(self._file("records.json"), "w") as f:
+            json.dump({"ids": self.ids, "payloads": self.payloads}, f, default=str)
+        with open(self._file("meta.json"), "w") as f:
+            json.dump({**self.meta, "dim": self.dim, "count": self.count, "capacity": self.capacity}, f)
+
+    def _load_records(self):
+        if self._records is None:
+            with open(self._file("records.json")) as f:
+                records = json.load(f)
+            positions = {item_id: row for row, item_id in enumerate(records["ids"])}
+            self._records = (records["ids"], records["payloads"], positions)
+        return self._records
+
+    @property
+    def ids(self) -> List[str]:
+        return self._load_records()[0]
+
+    @property
+    def payloads(self) -> List[Any]:
+        return self._load_records()[1]
+
+    @property
+    def positions(self) -> Dict[str, int]:
+        return self._load_records()[2]
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[:self.count]
+
+    def __len__(self):
+        return self.count
+
+    # Writes
+    def upsert(self, ids: Sequence[str], vectors, payloads: Optional[Iterable[Any]] = None):
+        vectors = normalize(vectors)
+        if vectors.shape != (len(ids), self.dim):
+            raise ValueError(f"Expected {len(ids)} vectors of dimension {self.dim}, got {vectors.shape}")
+        payloads = list(payloads) if payloads is not None else [None] * len(ids)
+        known_ids, known_payloads, positions = self._load_records()
+        rows = np.empty(len(ids), dtype=np.int64)
+        for i, item_id in enumerate(ids):
+            row = positions.get(item_id)
+            if row is None:
+                row = positions[item_id] = self.count
+                known_ids.append(item_id)
+                known_payloads.append(payloads[i])
+                self.count += 1
+            else:
+                known_payloads[row] = payloads[i]
+            rows[i] = row
+        self._reserve(self.count)
+        self._vectors[rows] = vectors
+        if self.centroids is not None:
+            self._assignments[rows] = np.argmax(vectors @ self.centroids.T, axis=1)
+            self._lists = None
+        return rows
+
+    def delete(self, ids: Iterable[str]) -> int:
+        # Swap-remove: the last row fills the deleted one
+        known_ids, known_payloads, positions = self._load_records()
+        removed = 0
+        for item_id in ids:
+            row = positions.pop(item_id, None)
+            if row is None:
+                continue
+            last = self.count - 1
+            if row != last:
+                moved = known_ids[row] = known_ids[last]
+                known_payloads[row] = known_payloads[last]
+                positions[moved] = row
+                self._vectors[row] = self._vectors[last]
+                self._assignments[row] = self._assignments[last]
+            known_ids.pop()
+            known_payloads.pop()
+            self.count -= 1
+            removed += 1
+        if removed:
+            self._lists = None
+        return removed
+
+    def train(self, nlist: Optional[int] = None, iterations=10, seed=0):
+        # Spherical k-means over a sample of rows, then assign every row
+        if self.count == 0:
+            return self
+        nlist = min(nlist or max(1, int(np.sqrt(self.count))), self.count)
+        rng = np.random.default_rng(seed)
+        sample_size = min(self.count, nlist * TRAIN_ROWS_PER_LIST)
+        sample = self.vectors[np.sort(rng.choice(self.count, sample_size, replace=False))]
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = self._nearest(sample, centroids)
+            # Per-list sums with one sort and reduceat instead of a scatter-add
+            order = np.argsort(labels, kind="stable")
+            counts = np.bincount(labels, minlength=nlist)
+            filled = np.flatnonzero(counts)
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+            sums = np.empty_like(centroids)
+            sums[filled] = np.add.reduceat(sample[order], starts, axis=0)
+            # Empty lists restart from random sample rows
+            empty = np.flatnonzero(counts == 0)
+            sums[empty] = sample[rng.choice(len(sample), len(empty))]
+            centroids = normalize(sums)
+        self.centroids = centroids
+        self._assignments[:self.count] = self._nearest(self.vectors, centroids)
+        self._lists = None
+        return self
+
+    @staticmethod
+    def _nearest(vectors, centroids):
+        labels = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), EXACT_BLOCK_ROWS):
+            block = vectors[start:start + EXACT_BLOCK_ROWS]
+            labels[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        return labels
+
+    def _inverted_lists(self):
+        # CSR over rows grouped by list, rebuilt lazily after writes
+        if self._lists is None:
+            assignments = self._assignments[:self.count]
+            rows = np.argsort(assignments, kind="stable")
+            offsets = np.zeros(len(self.centroids) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(assignments, minlength=len(self.centroids)), out=offsets[1:])
+            self._lists = (offsets, rows)
+        return self._lists
+
+    # Search
+    def search_rows(self, queries, k=10, mode=AUTO, nprobe=8):
+        # (rows, scores), each queries x k, best first; rows are -1 past the end
+        queries = normalize(queries)
+        if mode == AUTO:
+            mode = IVF if self.centroids is not None else EXACT
+        if mode == IVF and self.centroids is not None:
+            rows, scores = self._search_ivf(queries, k, nprobe)
+        else:
+            rows, scores = self._search_exact(queries, k)
+        if rows.shape[1] < k:
+            pad = k - rows.shape[1]
+            rows = np.pad(rows, ((0, 0), (0, pad)), constant_values=-1)
+            scores = np.pad(scores, ((0, 0), (0, pad)), constant_values=-np.inf)
+        return rows, scores
+
+    def _search_exact(self, queries, k):
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=VECTOR_DTYPE)
+        for start in range(0, self.count, EXACT_BLOCK_ROWS):
+            block = self._vectors[start:min(start + EXACT_BLOCK_ROWS, self.count)]
+            rows, scores = _top_k(queries @ block.T, np.arange(start, start + len(block)), k)
+            candidates = np.concatenate((best_rows, rows), axis=1)
+            candidate_scores = np.concatenate((best_scores, scores), axis=1)
+            positions, best_scores = _top_k(candidate_scores, np.arange(candidate_scores.shape[1]), k)
+            best_rows = np.take_along_axis(candidates, positions, axis=1)
+        return best_rows, best_scores
+
+    def _search_ivf(self, queries, k, nprobe):
+        offsets, list_rows = self._inverted_lists()
+        nprobe = min(nprobe, len(self.centroids))
+        probes, _ = _top_k(queries @ self.centroids.T, np.arange(len(self.centroids)), nprobe)
+        out_rows = np.full((len(queries), k), -1, dtype=np.int64)
+        out_scores = np.full((len(queries), k), -np.inf, dtype=VECTOR_DTYPE)
+        for i, query in enumerate(queries):
+            candidates = np.concatenate([list_rows[offsets[p]:offsets[p + 1]] for p in probes[i]])
+            if not len(candidates):
+                continue
+            rows, scores = _top_k((self._vectors[candidates] @ query)[None, :], candidates, k)
+            out_rows[i, :rows.shape[1]] = rows[0]
+            out_scores[i, :scores.shape[1]] = scores[0]
+        return out_rows, out_scores
+
+    def search(self, queries, k=10, mode=AUTO, nprobe=8) -> List[List[dict]]:
+        rows, scores = self.search_rows(queries, k, mode, nprobe)
+        ids, payloads, _ = self._load_records()
+        return [
+            [{"id": ids[row], "score": float(score), "payload": payloads[row]}
+             for row, score in zip(query_rows.tolist(), query_scores.tolist()) if row >= 0]
+            for query_rows, query_scores in zip(rows, scores)
+        ]
@@ -0,0 +1,53 @@
+import argparse
+import time
+
+import numpy as np
+
+from app.detection import DEFAULT_MIN_ACCOUNTS, DEFAULT_WINDOW, detect_clusters
+from benchmarks.synthetic import login_events
+
+# Shared-IP cluster detection over synthetic login streams
+#
+# Run from the backend directory:
+#   python -m benchmarks.cluster_detection --events 50000000
+
+
+def run(n_events, ring_fraction, window, min_accounts, seed):
+    start = time.perf_counter()
+    events, planted_ips = login_events(n_events, ring_fraction=ring_fraction, window=window, seed=seed)
+    generated = time.perf_counter()
+    result = detect_clusters(events, window=window, min_accounts=min_accounts)
+    detected = time.perf_counter()
+
+    detected_ips = np.unique(result.ips)
+    recall = float(np.isin(np.unique(planted_ips), detected_ips).mean()) if len(planted_ips) else 1.0
+    return {
+        "events": len(events),
+        "generate_s": generated - start,
+        "detect_s": detected - generated,
+        "events_per_s": len(events) / max(detected - generated, 1e-9),
+        "clusters": len(result),
+        "planted_rings": len(planted_ips),
+        "ring_ip_recall": recall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared-IP cluster detection benchmark")
+    parser.add_argument("--events", type=int, default=5_000_000)
+    parser.add_argument("--ring-fraction", type=float, default=0.02)
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW)
+    parser.add_argument("--min-accounts", type=int, default=DEFAULT_MIN_ACCOUNTS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    stats = run(args.events, args.ring_fraction, args.window, args.min_accounts, args.seed)
+    print(f"events          {stats['events']:,}")
+    print(f"generate        {stats['generate_s']:.2f} s")
+    print(f"detect          {stats['detect_s']:.2f} s  ({stats['events_per_s']:,.0f} events/s)")
+    print(f"clusters        {stats['clusters']:,}")
+    print(f"planted rings   {stats['planted_rings']:,}  (ring IP recall {stats['ring_ip_recall']:.3f})")
+
+
+if __name__ == "__main__":
+    main()
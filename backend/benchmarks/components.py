@@ -0,0 +1,79 @@
+import argparse
+import time
+
+import numpy as np
+
+from app.components import VECTORIZED_UNION_THRESHOLD, ConnectedComponents, _compress, _hook
+from app.graph_store import NODE_DTYPE, GraphStore
+
+# Incremental ring components against a full rebuild
+#
+# Random edges are merged into ConnectedComponents in batches of mixed size:
+# small batches go through union() and leave uncompressed chains behind,
+# large ones take the vectorized hooking pass over that same forest. The
+# final roots must equal those of one vectorized pass over all the edges;
+# any difference exits non-zero.
+#
+# Run from the backend directory:
+#   python -m benchmarks.components --nodes 1000000 --edges 800000
+
+
+def mixed_batches(n_edges, rng, large_every=64):
+    # Split points for runs of small union() batches between vectorized ones
+    bounds, total = [], 0
+    while total < n_edges:
+        if len(bounds) % large_every == large_every - 1:
+            total += int(rng.integers(VECTORIZED_UNION_THRESHOLD, 4 * VECTORIZED_UNION_THRESHOLD))
+        else:
+            total += int(rng.integers(1, 64))
+        bounds.append(total)
+    return np.array(bounds[:-1])
+
+
+def run(n_nodes, n_edges, seed):
+    rng = np.random.default_rng(seed)
+    src = rng.integers(0, n_nodes, n_edges).astype(NODE_DTYPE)
+    dst = rng.integers(0, n_nodes, n_edges).astype(NODE_DTYPE)
+    store = GraphStore.from_records([{"id": f"n{i}", "labels": ["Account"], "properties": {}}
+                                     for i in range(n_nodes)], [])
+
+    start = time.perf_counter()
+    expected = _compress(_hook(np.arange(n_nodes, dtype=NODE_DTYPE), src, dst))
+    rebuilt = time.perf_counter()
+
+    components = ConnectedComponents(store).build()
+    bounds = mixed_batches(n_edges, rng)
+    for batch_src, batch_dst in zip(np.split(src, bounds), np.split(dst, bounds)):
+        components.add_edges(batch_src, batch_dst)
+    roots = components.roots()
+    merged = time.perf_counter()
+
+    return {
+        "nodes": n_nodes,
+        "edges": n_edges,
+        "batches": len(bounds) + 1,
+        "rebuild_s": rebuilt - start,
+        "incremental_s": merged - rebuilt,
+        "mismatches": int((roots != expected).sum()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental ring components benchmark and consistency check")
+    parser.add_argument("--nodes", type=int, default=200_000)
+    parser.add_argument("--edges", type=int, default=150_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    stats = run(args.nodes, args.edges, args.seed)
+    print(f"nodes           {stats['nodes']:,}")
+    print(f"edges           {stats['edges']:,} in {stats['batches']:,} batches")
+    print(f"full rebuild    {stats['rebuild_s']:.3f} s")
+    print(f"incremental     {stats['incremental_s']:.3f} s")
+    if stats["mismatches"]:
+        raise SystemExit(f"{stats['mismatches']:,} nodes ended up in a different component than a full rebuild")
+    print("components match a full rebuild")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import argparse
+import statistics
+import time
+
+from app.cypher import clear_plan_cache, compile_query, plan_cache_info
+from app.routers.neo4j import graph_store
+
+# Cold vs warm plan latency for parameterized Cypher queries
+#
+# Cold: the plan cache is cleared before every call, so each call tokenizes,
+# parses and plans. Warm: the plan comes from the LRU cache and only the
+# parameters are bound before execution.
+#
+# Run from the backend directory:
+#   python -m benchmarks.cypher_plans --iterations 2000
+
+QUERIES = [
+    (
+        "MATCH (a:Account)-[:CONNECTS_FROM]->(ip:IPAddress {address: $ip}) RETURN a, ip",
+        {"ip": "192.168.1.100"},
+    ),
+    (
+        "MATCH (a:Account {username: $name})-[:RELATED_TO*1..2]-(b:Account) RETURN b",
+        {"name": "user123"},
+    ),
+    (
+        "MATCH (a:Account)-[r:RELATED_TO]->(b:Account) "
+        "WHERE r.confidence >= $min AND a.email ENDS WITH $domain RETURN a, b LIMIT 10",
+        {"min": 0.9, "domain": "example.com"},
+    ),
+]
+
+
+def _measure(iterations, fn):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return {
+        "mean_us": statistics.fmean(samples),
+        "p50_us": samples[len(samples) // 2],
+        "p99_us": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    }
+
+
+def run(iterations):
+    results = []
+    for text, parameters in QUERIES:
+        def cold_plan():
+            clear_plan_cache()
+            compile_query(text)
+
+        def cold_query():
+            clear_plan_cache()
+            compile_query(text).execute(graph_store, parameters)
+
+        def warm_plan():
+            compile_query(text)
+
+        def warm_query():
+            compile_query(text).execute(graph_store, parameters)
+
+        clear_plan_cache()
+        compile_query(text)
+        results.append({
+            "query": text,
+            "cold_plan": _measure(iterations, cold_plan),
+            "warm_plan": _measure(iterations, warm_plan),
+            "cold_query": _measure(iterations, cold_query),
+            "warm_query": _measure(iterations, warm_query),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cypher plan cache benchmark")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    for result in run(args.iterations):
+        print(result["query"])
+        for name in ("cold_plan", "warm_plan", "cold_query", "warm_query"):
+            stats = result[name]
+            print(f"  {name:<11} mean {stats['mean_us']:9.1f} us   "
+                  f"p50 {stats['p50_us']:9.1f} us   p99 {stats['p99_us']:9.1f} us")
+        speedup = result["cold_plan"]["mean_us"] / result["warm_plan"]["mean_us"]
+        print(f"  plan speedup (cold/warm): {speedup:.1f}x")
+    print(plan_cache_info())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import random
+import time
+
+from app.embeddings import HashedNgramEmbedder
+from app.retrieval import describe_account
+
+# Hashed n-gram embedding throughput
+#
+# Encodes synthetic account descriptions one text at a time and in batches,
+# then times repeated queries served from the LRU.
+#
+# Run from the backend directory:
+#   python -m benchmarks.embeddings --texts 100000
+
+
+def descriptions(count, seed):
+    rng = random.Random(seed)
+    return [describe_account({
+        "username": f"user{rng.randrange(10 ** 6)}",
+        "email": f"user{rng.randrange(10 ** 6)}@example.com",
+        "ip": ".".join(str(rng.randrange(256)) for _ in range(4)),
+        "loginTime": f"2025-04-{rng.randint(1, 28):02d}T{rng.randrange(24):02d}:{rng.randrange(60):02d}:00Z",
+        "isFraudulent": rng.random() < 0.1,
+        "relatedAccounts": [str(rng.randrange(1000)) for _ in range(rng.randrange(3))],
+    }) for _ in range(count)]
+
+
+def run(count, dim, batch_sizes, seed):
+    texts = descriptions(count, seed)
+    embedder = HashedNgramEmbedder(dim=dim)
+    results = []
+    for batch in batch_sizes:
+        start = time.perf_counter()
+        for i in range(0, count, batch):
+            embedder.encode(texts[i:i + batch])
+        elapsed = time.perf_counter() - start
+        results.append({"batch": batch, "texts_per_s": count / elapsed})
+
+    queries = texts[:100]
+    for text in queries:
+        embedder.encode_query(text)
+    start = time.perf_counter()
+    for _ in range(100):
+        for text in queries:
+            embedder.encode_query(text)
+    cached_us = (time.perf_counter() - start) / (100 * len(queries)) * 1e6
+    return {"texts": count, "mean_chars": sum(map(len, texts)) / count, "batches": results, "cached_query_us": cached_us}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding throughput benchmark")
+    parser.add_argument("--texts", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 16, 256, 4096])
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    result = run(args.texts, args.dim, args.batch, args.seed)
+    print(f"{result['texts']} texts ({result['mean_chars']:.0f} chars avg), dim {args.dim}")
+    for row in result["batches"]:
+        print(f"  batch {row['batch']:<5} {row['texts_per_s']:12,.0f} texts/s")
+    print(f"  cached query  {result['cached_query_us']:8.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import argparse
+import random
+import time
+
+from app.routers.rasa import entity_extractor
+
+# Entity extraction throughput over synthetic chat messages
+#
+# Messages mix filler words with IPv4/IPv6 addresses, emails, account IDs
+# and time periods, roughly the shape of the chat logs the extractor is run
+# over offline.
+#
+# Run from the backend directory:
+#   python -m benchmarks.entity_extraction --messages 200000
+
+FILLER = (
+    "find", "accounts", "with", "same", "ip", "show", "me", "the", "logins", "from",
+    "please", "check", "suspicious", "activity", "for", "and", "graph", "fraud",
+)
+
+
+def _entity(rng):
+    kind = rng.randrange(5)
+    if kind == 0:
+        return ".".join(str(rng.randrange(256)) for _ in range(4))
+    if kind == 1:
+        return "2001:db8::" + format(rng.randrange(1 << 16), "x")
+    if kind == 2:
+        return f"user{rng.randrange(10000)}@example.com"
+    if kind == 3:
+        return f"account #{rng.randrange(100000)}"
+    return rng.choice(("today", "yesterday", "last week", "last month", "last 24 hours"))
+
+
+def messages(count, words, seed):
+    rng = random.Random(seed)
+    out = []
+    for _ in range(count):
+        parts = [rng.choice(FILLER) for _ in range(rng.randint(3, words))]
+        for _ in range(rng.randint(0, 3)):
+            parts.insert(rng.randint(0, len(parts)), _entity(rng))
+        out.append(" ".join(parts))
+    return out
+
+
+def run(count, words, repeat, seed):
+    texts = messages(count, words, seed)
+    extract = entity_extractor.extract
+    best = float("inf")
+    found = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        found = sum(len(extract(text)) for text in texts)
+        best = min(best, time.perf_counter() - start)
+    return {
+        "messages": count,
+        "mean_chars": sum(map(len, texts)) / max(count, 1),
+        "entities": found,
+        "seconds": best,
+        "messages_per_s": count / best,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Entity extraction benchmark")
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--words", type=int, default=16, help="maximum filler words per message")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    result = run(args.messages, args.words, args.repeat, args.seed)
+    print(f"{result['messages']} messages ({result['mean_chars']:.0f} chars avg), {result['entities']} entities")
+    print(f"  {result['seconds']:.3f} s   {result['messages_per_s']:,.0f} messages/s")
+
+
+if __name__ == "__main__":
+    main()
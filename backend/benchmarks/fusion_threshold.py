@@ -0,0 +1,112 @@
+import argparse
+
+import numpy as np
+
+from app.retrieval import RetrievalIndex
+from app.routers.langgraph import FUSION_MIN_SCORE
+
+# Retrieval score distributions behind FUSION_MIN_SCORE
+#
+# Runs a labelled set of analyst queries against the sample-data retrieval
+# index and splits the top-k hit scores into relevant and irrelevant ones.
+# Queries about the shared-IP ring find the ring's accounts and cluster;
+# queries naming an account or its address find that account and the
+# clusters it belongs to; off-topic queries find nothing. The best cut is
+# the midpoint of the widest score gap among the thresholds with the
+# fewest misclassified hits. Exits non-zero when FUSION_MIN_SCORE
+# misclassifies more hits than that cut.
+#
+# Run from the backend directory:
+#   python -m benchmarks.fusion_threshold
+
+RING = "ring"
+
+QUERIES = {
+    "same ip": RING,
+    "Find accounts with the same IP address": RING,
+    "which accounts share an ip address": RING,
+    "accounts logging in from a shared IP": RING,
+    "multiple accounts on one ip": RING,
+    "show me fraud clusters": RING,
+    "fraud ring": RING,
+    "fraudulent accounts": RING,
+    "accounts flagged as fraudulent": RING,
+    "192.168.1.100": RING,
+    "johndoe": ["2"],
+    "tell me about alice smith": ["3"],
+    "user123 login": ["1"],
+    "bob jones": ["4"],
+    "bob.jones@example.com": ["4"],
+    "192.168.1.101": ["4"],
+    "what's the weather tomorrow": [],
+    "reset my password": [],
+    "quarterly sales report": [],
+    "what is the capital of France": [],
+    "merchant category volume": [],
+    "hello": [],
+    "credit card chargeback dispute": [],
+    "delete my newsletter subscription": [],
+}
+
+
+def relevant_ids(label, data):
+    if label == RING:
+        # The ring: every cluster and its member accounts
+        ids = set()
+        for cluster in data["clusters"]:
+            ids.add(f"cluster:{cluster['id']}")
+            ids.update(f"account:{account['id']}" for account in cluster["accounts"])
+        return ids
+    ids = {f"account:{account_id}" for account_id in label}
+    ids.update(f"cluster:{cluster['id']}" for cluster in data["clusters"]
+               if any(account["id"] in label for account in cluster["accounts"]))
+    return ids
+
+
+def errors(threshold, scores, relevant):
+    # Irrelevant hits kept plus relevant hits dropped
+    return int(((scores >= threshold) != relevant).sum())
+
+
+def best_threshold(scores, relevant):
+    cuts = np.unique(scores)
+    candidates = np.concatenate(([cuts[0] - 0.01], (cuts[:-1] + cuts[1:]) / 2, [cuts[-1] + 0.01]))
+    gaps = np.concatenate(([0.02], np.diff(cuts), [0.02]))
+    counts = np.array([errors(candidate, scores, relevant) for candidate in candidates])
+    optimal = np.flatnonzero(counts == counts.min())
+    choice = optimal[np.argmax(gaps[optimal])]
+    return float(candidates[choice]), int(counts[choice])
+
+
+def run(k):
+    index = RetrievalIndex()
+    data = index.source.get()
+    scores, relevant = [], []
+    for query, label in QUERIES.items():
+        expected = relevant_ids(label, data)
+        for hit in index.search(query, k=k):
+            scores.append(hit["score"])
+            relevant.append(hit["id"] in expected)
+    return np.array(scores), np.array(relevant)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relevant vs irrelevant retrieval scores and the fusion seed threshold")
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    scores, relevant = run(args.k)
+    for name, mask in (("relevant", relevant), ("irrelevant", ~relevant)):
+        values = np.sort(scores[mask])
+        print(f"{name:<11} {len(values):>3} hits   min {values.min():.3f}   "
+              f"median {np.median(values):.3f}   max {values.max():.3f}")
+    threshold, best = best_threshold(scores, relevant)
+    configured = errors(FUSION_MIN_SCORE, scores, relevant)
+    print(f"best cut          {threshold:.3f} ({best} misclassified hits)")
+    print(f"FUSION_MIN_SCORE  {FUSION_MIN_SCORE:.3f} ({configured} misclassified hits)")
+    if configured > best:
+        raise SystemExit(f"FUSION_MIN_SCORE misclassifies {configured - best} more hits than a cut at {threshold:.3f}")
+
+
+if __name__ == "__main__":
+    main()
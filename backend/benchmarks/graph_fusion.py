@@ -0,0 +1,79 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from app.fusion import DEFAULT_HOPS, DEFAULT_NODE_BUDGET, fuse
+from app.graph_store import GraphStore
+from benchmarks.synthetic import login_events
+
+# GraphRAG fusion latency over a synthetic account/IP login graph
+#
+# Accounts and IPs from the synthetic login generator become nodes, each
+# distinct (account, IP) pair a CONNECTS_FROM relationship. Every query fuses
+# `--seeds` random accounts grouped into vector hits; latency covers the
+# batched k-hop expansion, deduplication and RRF ranking.
+#
+# Run from the backend directory:
+#   python -m benchmarks.graph_fusion --events 1000000 --seeds 100
+
+
+def build_graph(n_events, seed):
+    events, _ = login_events(n_events, seed=seed)
+    pairs = np.unique(events.accounts.astype(np.int64) << 32 | events.ips.astype(np.int64))
+    n_accounts, n_ips = len(events.account_ids), len(events.ip_addresses)
+    nodes = [{"id": f"account-{i}", "labels": ["Account"], "properties": {}} for i in range(n_accounts)]
+    nodes += [{"id": f"ip-{i}", "labels": ["IPAddress"], "properties": {}} for i in range(n_ips)]
+    relationships = [
+        {"id": f"r{i}", "type": "CONNECTS_FROM", "startNode": f"account-{pair >> 32}",
+         "endNode": f"ip-{pair & 0xFFFFFFFF}", "properties": {}}
+        for i, pair in enumerate(pairs.tolist())
+    ]
+    return GraphStore.from_records(nodes, relationships), n_accounts
+
+
+def run(n_events, seeds, hits, hops, budget, queries, seed):
+    started = time.perf_counter()
+    store, n_accounts = build_graph(n_events, seed)
+    build_s = time.perf_counter() - started
+
+    rng = np.random.default_rng(seed + 1)
+    # Warm-up builds the CSR adjacency
+    fuse(store, [[0]], hops, budget)
+    timings = []
+    for _ in range(queries):
+        groups = np.array_split(rng.choice(n_accounts, seeds, replace=False), hits)
+        start = time.perf_counter()
+        ranked = fuse(store, [group.tolist() for group in groups], hops, budget)
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1e3
+    return {
+        "nodes": store.node_count,
+        "relationships": store.relationship_count,
+        "build_s": build_s,
+        "seeds": seeds,
+        "hops": hops,
+        "node_budget": budget,
+        "returned": len(ranked),
+        "p50_ms": float(np.percentile(timings, 50)),
+        "p95_ms": float(np.percentile(timings, 95)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GraphRAG fusion latency benchmark")
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--seeds", type=int, default=100)
+    parser.add_argument("--hits", type=int, default=20, help="vector hits the seeds are grouped into")
+    parser.add_argument("--hops", type=int, default=DEFAULT_HOPS)
+    parser.add_argument("--budget", type=int, default=DEFAULT_NODE_BUDGET)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(run(args.events, args.seeds, args.hits, args.hops, args.budget, args.queries, args.seed),
+                     indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+import argparse
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+
+from benchmarks.results import summarize, write_results
+
+# In-process load driver for every API endpoint
+#
+# Requests are sent straight into the ASGI app (no sockets, no HTTP client),
+# so the numbers measure routing, validation, handlers, middleware and
+# serialization only. Each endpoint is driven by --concurrency concurrent
+# clients on one event loop until --requests responses have been received;
+# the report gives throughput and p50/p95/p99 latency per endpoint.
+#
+# With --accounts, the Cypher and GraphQL endpoints are served from a
+# synthetic graph of that size, and --events synthetic logins are posted to
+# /api/events before the run to grow the fraud graph behind /api/accounts,
+# /api/clusters and /api/graph.
+#
+# Run from the backend directory:
+#   python -m benchmarks.load --accounts 100000 --events 20000 --output results/load.json
+#   python -m benchmarks.results results/load.json baseline/load.json
+
+RING_IP = "192.168.1.100"
+
+# Items per request in the batch endpoint scenarios
+BATCH_ITEMS = 100
+
+
+def endpoints(ip=RING_IP, events=(), ips=(RING_IP,), pair=("n1", "n3")):
+    # (name, method, path, JSON body); /api/events comes last since it grows the graph
+    ips = list(ips)
+    messages = ["find accounts with same ip", f"show logins from {ip} last week",
+                "hello", "analyze user123@example.com"]
+    return [
+        ("root", "GET", "/", None),
+        ("chat", "POST", "/api/chat", {"text": "find accounts with same ip"}),
+        ("accounts", "GET", "/api/accounts", None),
+        ("accounts_page", "GET", "/api/accounts?limit=100", None),
+        ("clusters", "GET", "/api/clusters", None),
+        ("clusters_bursts", "GET", "/api/clusters/bursts", None),
+        ("graph", "GET", "/api/graph", None),
+        ("graph_layout", "GET", "/api/graph/layout", None),
+        ("graph_layout_zoomed", "GET", "/api/graph/layout?zoom=3&x0=0.25&y0=0.25&x1=0.75&y1=0.75", None),
+        ("cache_stats", "GET", "/api/cache/stats", None),
+        ("query", "POST", "/api/query", {"text": "accounts with same ip"}),
+        ("query_batch", "POST", "/api/query/batch", {
+            "queries": [{"text": messages[i % len(messages)]} for i in range(BATCH_ITEMS)],
+        }),
+        ("neo4j_status", "GET", "/api/neo4j/", None),
+        ("neo4j_schema", "GET", "/api/neo4j/schema", None),
+        ("neo4j_query", "POST", "/api/neo4j/query", {
+            "query": "MATCH (a:Account)-[:CONNECTS_FROM]->(ip:IPAddress {address: $ip}) RETURN a, ip",
+            "parameters": {"ip": ip},
+        }),
+        ("neo4j_query_batch", "POST", "/api/neo4j/query/batch", {
+            "queries": [{
+                "query": "MATCH (a:Account)-[:CONNECTS_FROM]->(ip:IPAddress {address: $ip}) RETURN a, ip",
+                "parameters": {"ip": item_ip},
+            } for item_ip in (ips * BATCH_ITEMS)[:BATCH_ITEMS]],
+        }),
+        ("neo4j_paths", "POST", "/api/neo4j/paths", {"source": pair[0], "target": pair[1], "maxHops": 4}),
+        ("rasa_status", "GET", "/api/rasa/", None),
+        ("rasa_parse", "POST", "/api/rasa/parse", {"text": messages[1], "sender_id": "bench"}),
+        ("rasa_parse_batch", "POST", "/api/rasa/parse_batch", {
+            "messages": [{"text": messages[i % len(messages)], "sender_id": "bench"} for i in range(BATCH_ITEMS)],
+        }),
+        ("rasa_chat", "POST", "/api/rasa/chat", {"text": messages[0], "sender_id": "bench"}),
+        ("langgraph_status", "GET", "/api/langgraph/", None),
+        ("langgraph_agents", "GET", "/api/langgraph/agents", None),
+        ("langgraph_query", "POST", "/api/langgraph/query", {"query": "accounts sharing the same ip"}),
+        ("langgraph_stream", "POST", "/api/langgraph/query/stream", {"query": "accounts sharing the same ip"}),
+        ("graphql_status", "GET", "/api/graphql/", None),
+        ("graphql_schema", "GET", "/api/graphql/schema", None),
+        ("graphql_query", "POST", "/api/graphql/", {
+            "query": "query ($ip: String) { accounts(filter: {ip: $ip}) { id username isFraudulent } }",
+            "variables": {"ip": ip},
+        }),
+        ("events", "POST", "/api/events", {"events": list(events)}),
+    ]
+
+
+class AsgiClient:
+    def __init__(self, app):
+        self.app = app
+
+    async def request(self, method, path, body=None):
+        # (status, response body); streamed responses are read to the end
+        path, _, query = path.partition("?")
+        payload = b"" if body is None else json.dumps(body).encode()
+        headers = [(b"host", b"benchmark")]
+        if body is not None:
+            headers += [(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode())]
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": headers,
+            "client": ("127.0.0.1", 50000),
+            "server": ("benchmark", 80),
+        }
+        finished = asyncio.Event()
+        state = {"sent": False, "status": 0}
+        chunks = []
+
+        async def receive():
+            if not state["sent"]:
+                state["sent"] = True
+                return {"type": "http.request", "body": payload, "more_body": False}
+            # Streaming responses listen for a disconnect while they send
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    finished.set()
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            finished.set()
+        return state["status"], b"".join(chunks)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Run the app's startup and shutdown handlers around the benchmark
+    events, replies = asyncio.Queue(), asyncio.Queue()
+    task = asyncio.create_task(app({"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}},
+                                   events.get, replies.put))
+    await events.put({"type": "lifespan.startup"})
+    reply = await replies.get()
+    if reply["type"] != "lifespan.startup.complete":
+        raise RuntimeError(f"Startup failed: {reply.get('message', reply['type'])}")
+    try:
+        yield
+    finally:
+        await events.put({"type": "lifespan.shutdown"})
+        await replies.get()
+        await task
+
+
+async def drive(client, method, path, body, requests, concurrency, warmup):
+    for _ in range(warmup):
+        await client.request(method, path, body)
+    samples, errors, sizes = [], 0, 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors, sizes
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            status, content = await client.request(method, path, body)
+            samples.append(time.perf_counter() - start)
+            errors += status >= 400
+            sizes += len(content)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    return {
+        **summarize(samples),
+        "requests_per_s": len(samples) / wall,
+        "errors": errors,
+        "mean_bytes": sizes / max(len(samples), 1),
+    }
+
+
+def use_synthetic_data(accounts, seed):
+    # Serve Cypher and GraphQL from a synthetic graph; returns (ring IP, graph)
+    from app.graph_store import GraphStore
+    from app.routers import graphql, neo4j
+    from benchmarks.micro import StaticSource
+    from benchmarks.synthetic import fraud_graph
+
+    graph = fraud_graph(accounts, seed=seed)
+    neo4j.graph_store = GraphStore.from_records(*graph.records(), indexes=[("IPAddress", "address")])
+    records = graph.accounts()
+    graphql.sample_data = StaticSource({
+        "accounts": records,
+        "clusters": graph.clusters(records),
+        "graph": dict(zip(("nodes", "links"), graph.graph_data())),
+    })
+    return graph.ip_addresses[int(graph.ring_ips[0])] if len(graph.ring_ips) else RING_IP, graph
+
+
+def uncovered(app, covered):
+    # Schema routes without a benchmark scenario
+    routes = {(method, route.path) for route in app.routes if getattr(route, "include_in_schema", False)
+              for method in getattr(route, "methods", ())}
+    return sorted(routes - {(method, path.partition("?")[0]) for method, path in covered})
+
+
+async def run(requests, concurrency, warmup, accounts, events, batch, only, seed):
+    from app import app
+
+    ip, ips, pair, payloads = RING_IP, [RING_IP], ("n1", "n3"), []
+    if accounts:
+        ip, graph = use_synthetic_data(accounts, seed)
+        ips = [graph.ip_addresses[code] for code in graph.ring_ips[:BATCH_ITEMS].tolist()] or [ip]
+        # Paths between the first two members of one fraud ring
+        ring = [graph.first + offset for offset, code in enumerate(graph.ring_of_account.tolist()) if code == 0][:2]
+        if len(ring) == 2:
+            pair = tuple(f"account-{code}" for code in ring)
+        payloads = graph.login_payloads(events + batch)
+    scenarios = endpoints(ip, payloads[events:events + batch] or [
+        {"accountId": "bench", "ip": ip, "loginTime": "2025-04-07T10:15:30Z"}], ips, pair)
+    missing = uncovered(app, [(method, path) for _, method, path, _ in scenarios])
+    if missing:
+        print("warning: endpoints without a scenario: " + ", ".join(f"{m} {p}" for m, p in missing))
+
+    client = AsgiClient(app)
+    results = {}
+    async with lifespan(app):
+        for start in range(0, events, batch):
+            status, content = await client.request("POST", "/api/events",
+                                                   {"events": payloads[start:min(start + batch, events)]})
+            if status != 200:
+                raise SystemExit(f"Seeding /api/events failed with {status}: {content[:200]!r}")
+        for name, method, path, body in scenarios:
+            if only and name not in only:
+                continue
+            stats = await drive(client, method, path, body, requests, concurrency, warmup)
+            # Batch bodies carry one list of items; report items/s alongside requests/s
+            items = next((len(value) for value in (body or {}).values() if isinstance(value, list)), 1)
+            results[name] = {"method": method, "path": path, **stats,
+                             "items_per_s": stats["requests_per_s"] * items}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process ASGI load test of every endpoint")
+    parser.add_argument("--requests", type=int, default=2000, help="measured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per endpoint")
+    parser.add_argument("--accounts", type=int, default=0,
+                        help="serve Cypher/GraphQL from a synthetic graph with this many accounts")
+    parser.add_argument("--events", type=int, default=0,
+                        help="synthetic logins posted to /api/events before the run (needs --accounts)")
+    parser.add_argument("--batch", type=int, default=500, help="logins per /api/events request")
+    parser.add_argument("--only", nargs="*", help="scenario names to run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    args = parser.parse_args()
+    if args.events and not args.accounts:
+        parser.error("--events needs --accounts")
+
+    results = asyncio.run(run(args.requests, args.concurrency, args.warmup, args.accounts, args.events,
+                              args.batch, args.only, args.seed))
+    for name, stats in results.items():
+        print(f"{stats['method']:<5}{stats['path'][:48]:<50} {stats['requests_per_s']:9,.0f} req/s "
+              f"{stats['items_per_s']:10,.0f} items/s   "
+              f"p50 {stats['p50_us'] / 1e3:7.2f} ms   p95 {stats['p95_us'] / 1e3:7.2f} ms   "
+              f"p99 {stats['p99_us'] / 1e3:7.2f} ms" + (f"   {stats['errors']} errors" if stats["errors"] else ""))
+    if args.output:
+        config = {key: value for key, value in vars(args).items() if key != "output"}
+        write_results(args.output, "load", config, results)
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import argparse
+import random
+import time
+
+from app.cypher import compile_query
+from app.graph_store import GraphStore
+from app.graphql_engine import execute
+from app.routers.rasa import classify_intent, extract_entities
+from benchmarks import entity_extraction, intent_classifier
+from benchmarks.results import summarize, write_results
+from benchmarks.synthetic import fraud_graph
+
+# Per-call latency of the request-path functions over synthetic data
+#
+# classify_intent and extract_entities run over generated chat messages;
+# Cypher queries (compiled from the plan cache, then executed) and GraphQL
+# queries run against a graph and account/cluster data generated with
+# --accounts accounts. Every call is timed separately, so the summaries
+# include tail latencies, not just the mean.
+#
+# Run from the backend directory:
+#   python -m benchmarks.micro --accounts 100000 --output results/micro.json
+#   python -m benchmarks.results results/micro.json baseline/micro.json
+
+CYPHER_QUERIES = {
+    "ip_lookup": ("MATCH (a:Account)-[:CONNECTS_FROM]->(ip:IPAddress {address: $ip}) RETURN a, ip", "ip"),
+    "related_2_hops": ("MATCH (a:Account {username: $name})-[:RELATED_TO*1..2]-(b:Account) RETURN b", "name"),
+    "confident_pairs": ("MATCH (a:Account)-[r:RELATED_TO]->(b:Account) "
+                        "WHERE r.confidence >= $min RETURN a, b LIMIT 25", None),
+}
+
+GRAPHQL_QUERIES = {
+    "account_by_id": ("query ($id: ID!) { accounts(filter: {id: $id}) { id username email ip relatedAccounts } }",
+                      "id"),
+    "accounts_by_ip": ("query ($ip: String) { accounts(filter: {ip: $ip}) { id username isFraudulent } }", "ip"),
+    "clusters_by_ip": ("query ($ip: String) { clusters(filter: {ip: $ip}) { id confidence accounts { id } } }",
+                       "ip"),
+}
+
+
+class StaticSource:
+    # Data source for the GraphQL engine over generated records
+
+    def __init__(self, data):
+        self.data = data
+        self.version = ("synthetic", id(data))
+
+    def get(self):
+        return self.data
+
+
+def _time_calls(fn, arguments):
+    samples = []
+    for argument in arguments:
+        start = time.perf_counter()
+        fn(argument)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def _with_throughput(summary):
+    summary["calls_per_s"] = 1e6 / summary["mean_us"] if summary.get("mean_us") else 0.0
+    return summary
+
+
+def run(accounts, calls, seed):
+    rng = random.Random(seed)
+    results = {}
+
+    intents = intent_classifier.intent_table(0, seed)
+    results["classify_intent"] = _with_throughput(
+        _time_calls(classify_intent, intent_classifier.messages(calls, 12, intents, seed)))
+    results["extract_entities"] = _with_throughput(
+        _time_calls(extract_entities, entity_extraction.messages(calls, 16, seed)))
+
+    graph = fraud_graph(accounts, seed=seed)
+    store = GraphStore.from_records(*graph.records(), indexes=[("IPAddress", "address"), ("Account", "username")])
+    ring_members = [graph.first + offset for offset, ring in enumerate(graph.ring_of_account.tolist()) if ring >= 0]
+    ring_ips = [graph.ip_addresses[code] for code in graph.ring_ips.tolist()]
+    parameters = {
+        "ip": lambda: {"ip": rng.choice(ring_ips)},
+        "name": lambda: {"name": f"user{rng.choice(ring_members)}"},
+        None: lambda: {"min": 0.9},
+    }
+    for name, (text, parameter) in CYPHER_QUERIES.items():
+        compile_query(text).execute(store, parameters[parameter]())
+        results[f"execute_cypher.{name}"] = _with_throughput(_time_calls(
+            lambda bound: compile_query(text).execute(store, bound),
+            [parameters[parameter]() for _ in range(calls)]))
+
+    records = graph.accounts()
+    source = StaticSource({
+        "accounts": records,
+        "clusters": graph.clusters(records),
+        "graph": dict(zip(("nodes", "links"), graph.graph_data())),
+    })
+    variables = {
+        "id": lambda: {"id": str(rng.choice(ring_members))},
+        "ip": lambda: {"ip": rng.choice(ring_ips)},
+    }
+    for name, (text, variable) in GRAPHQL_QUERIES.items():
+        result = execute(text, source, variables[variable]())
+        if result.get("errors"):
+            raise SystemExit(f"{name}: {result['errors']}")
+        results[f"execute_graphql.{name}"] = _with_throughput(_time_calls(
+            lambda bound: execute(text, source, bound),
+            [variables[variable]() for _ in range(calls)]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Request-path microbenchmarks")
+    parser.add_argument("--accounts", type=int, default=100_000, help="accounts in the synthetic graph")
+    parser.add_argument("--calls", type=int, default=5000, help="timed calls per benchmark")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    args = parser.parse_args()
+
+    results = run(args.accounts, args.calls, args.seed)
+    for name, stats in results.items():
+        print(f"{name:<34} p50 {stats['p50_us']:9.1f} us   p95 {stats['p95_us']:9.1f} us   "
+              f"p99 {stats['p99_us']:9.1f} us   {stats['calls_per_s']:12,.0f} calls/s")
+    if args.output:
+        config = {key: value for key, value in vars(args).items() if key != "output"}
+        write_results(args.output, "micro", config, results)
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+import numpy as np
+
+# JSON benchmark results and regression checks
+#
+# write_results() stores one run with its configuration and environment, so
+# runs on different machines or commits are not compared blindly. compare()
+# matches two runs metric by metric: keys ending in _us, _ms or _s are
+# latencies (higher is worse), keys ending in _per_s are throughputs (lower is
+# worse); maxima and other values are ignored.
+#
+# Run from the backend directory:
+#   python -m benchmarks.results results/load.json baseline/load.json --threshold 0.1
+
+
+def summarize(samples_s):
+    # Latency summary of per-call samples given in seconds
+    samples = np.asarray(samples_s, dtype=np.float64) * 1e6
+    if not len(samples):
+        return {"calls": 0}
+    p50, p95, p99 = np.percentile(samples, (50, 95, 99))
+    return {
+        "calls": len(samples),
+        "mean_us": float(samples.mean()),
+        "p50_us": float(p50),
+        "p95_us": float(p95),
+        "p99_us": float(p99),
+        "max_us": float(samples.max()),
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "commit": commit or None,
+    }
+
+
+def write_results(path, benchmark, config, results):
+    run = {
+        "benchmark": benchmark,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "environment": environment(),
+        "config": config,
+        "results": results,
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(run, f, indent=2)
+    return run
+
+
+def _metrics(results, prefix=""):
+    # Flatten nested results into {"a.b.p95_us": value}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from _metrics(value, f"{name}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield name, value
+
+
+def _direction(name):
+    # Maxima are single samples, too noisy to compare
+    if name.rpartition(".")[2].startswith("max_"):
+        return 0
+    if name.endswith("_per_s"):
+        return -1
+    if name.endswith(("_us", "_ms", "_s")):
+        return 1
+    return 0
+
+
+def compare(current, baseline, threshold=0.1):
+    # [(metric, baseline, current, relative change)] for metrics that got
+    # worse by more than `threshold`
+    base = dict(_metrics(baseline["results"]))
+    regressions = []
+    for name, value in _metrics(current["results"]):
+        direction = _direction(name)
+        previous = base.get(name)
+        if not direction or not previous:
+            continue
+        change = (value - previous) / previous
+        if change * direction > threshold:
+            regressions.append((name, previous, value, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("current")
+    parser.add_argument("baseline")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change reported as a regression")
+    args = parser.parse_args()
+
+    with open(args.current) as f:
+        current = json.load(f)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if current.get("benchmark") != baseline.get("benchmark"):
+        sys.exit(f"Different benchmarks: {current.get('benchmark')} vs {baseline.get('benchmark')}")
+    if current.get("config") != baseline.get("config"):
+        print("warning: the runs used different configurations")
+
+    regressions = compare(current, baseline, args.threshold)
+    for name, previous, value, change in regressions:
+        print(f"  {name:<60} {previous:12.2f} -> {value:12.2f}  ({change:+.1%})")
+    if regressions:
+        sys.exit(f"{len(regressions)} metrics regressed by more than {args.threshold:.0%}")
+    print("no regressions")
+
+
+if __name__ == "__main__":
+    main()
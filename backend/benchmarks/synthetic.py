@@ -0,0 +1,341 @@
+import argparse
+import json
+import time
+from collections.abc import Sequence
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.detection import DEFAULT_WINDOW, LoginEvents
+
+# Synthetic data generators for the benchmarks
+#
+# Everything is generated as NumPy columns of integer codes. Account IDs and
+# IP strings are produced on demand by index, so a run with tens of millions
+# of events never materializes tens of millions of Python strings.
+#
+# fraud_graph() generates accounts, IPs, login events, CONNECTS_FROM links and
+# RELATED_TO edges with planted fraud rings, and converts them to the shapes
+# the API serves (Neo4j records, GraphData, accounts/clusters JSON, login
+# event payloads). fraud_graph_chunks() generates 10^8 accounts and more as a
+# sequence of fixed-size slices, so memory is bounded by the chunk size.
+#
+# Run from the backend directory:
+#   python -m benchmarks.synthetic --accounts 100000000 --chunk 1000000
+#   python -m benchmarks.synthetic --accounts 200000 --snapshot graph.snap
+
+
+class AccountIds(Sequence):
+    def __init__(self, count, prefix="acct-"):
+        self.count = count
+        self.prefix = prefix
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return f"{self.prefix}{index}"
+
+
+class IpAddresses(Sequence):
+    # 10.0.0.0/8 followed by 172.16.0.0/12 style addresses, one per code
+
+    def __init__(self, count):
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        value = index + 1
+        return f"10.{(value >> 16) & 0xFF}.{(value >> 8) & 0xFF}.{value & 0xFF}" if value < (1 << 24) \
+            else f"172.{16 + ((value >> 24) & 0x0F)}.{(value >> 16) & 0xFF}.{(value >> 8) & 0xFF}"
+
+
+def login_events(n_events, n_accounts=None, n_ips=None, ring_fraction=0.02, ring_size=(3, 8),
+                 days=30, window=DEFAULT_WINDOW, seed=0, start=1743465600):
+    # Background logins come from each account's home IP at uniform random
+    # times; `ring_fraction` of events belong to planted fraud rings, where
+    # several accounts log in from one IP within a few minutes.
+    # Returns (LoginEvents, planted ring IP codes).
+    rng = np.random.default_rng(seed)
+    n_accounts = n_accounts or max(2, n_events // 5)
+    n_ips = n_ips or max(1, n_accounts // 2)
+    span = days * 86400
+
+    n_ring_events = int(n_events * ring_fraction)
+    n_background = n_events - n_ring_events
+
+    home_ip = rng.integers(0, n_ips, size=n_accounts, dtype=np.int32)
+    accounts = rng.integers(0, n_accounts, size=n_background, dtype=np.int32)
+    ips = home_ip[accounts]
+    # A tenth of background logins roam to a random IP
+    roaming = rng.random(n_background) < 0.1
+    ips[roaming] = rng.integers(0, n_ips, size=int(roaming.sum()), dtype=np.int32)
+    times = start + rng.integers(0, span, size=n_background, dtype=np.int64)
+
+    ring_accounts, ring_ips, ring_times = [], [], []
+    planted = []
+    remaining = n_ring_events
+    low, high = ring_size
+    while remaining > 0:
+        # Generate rings in vectorized blocks
+        sizes = rng.integers(low, high + 1, size=max(1, remaining // low))
+        sizes = sizes[np.cumsum(sizes) <= remaining] if sizes.sum() > remaining else sizes
+        if len(sizes) == 0:
+            sizes = np.array([remaining])
+        total = int(sizes.sum())
+        ring_of_event = np.repeat(np.arange(len(sizes)), sizes)
+        ring_ip = rng.integers(0, n_ips, size=len(sizes), dtype=np.int32)
+        ring_start = start + rng.integers(0, span, size=len(sizes), dtype=np.int64)
+        offsets = np.arange(total) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        ring_accounts.append(rng.integers(0, n_accounts, size=total, dtype=np.int32))
+        ring_ips.append(ring_ip[ring_of_event])
+        ring_times.append(ring_start[ring_of_event] + offsets * rng.integers(5, window // 4, size=total))
+        planted.append(ring_ip)
+        remaining -= total
+
+    if ring_accounts:
+        accounts = np.concatenate([accounts, *ring_accounts])
+        ips = np.concatenate([ips, *ring_ips])
+        times = np.concatenate([times, *ring_times])
+
+    events = LoginEvents(accounts, ips, times, AccountIds(n_accounts), IpAddresses(n_ips))
+    planted_ips = np.concatenate(planted) if planted else np.empty(0, dtype=np.int32)
+    return events, planted_ips
+
+
+def _iso(seconds):
+    return datetime.fromtimestamp(int(seconds), timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class FraudGraph:
+    # Accounts [first, first + count) with their logins, IP links and
+    # RELATED_TO edges. Codes are global across slices; an IP node appears in
+    # every slice that links to it.
+
+    def __init__(self, first, count, events, connects, related, ring_ips, ring_of_account):
+        self.first = first
+        self.count = count
+        self.events = events
+        # (account codes, IP codes), one per distinct login pair
+        self.connects = connects
+        # (account codes, account codes, confidences)
+        self.related = related
+        self.ring_ips = ring_ips
+        # Ring number per account of the slice, -1 outside any ring
+        self.ring_of_account = ring_of_account
+
+    @property
+    def account_ids(self):
+        return self.events.account_ids
+
+    @property
+    def ip_addresses(self):
+        return self.events.ip_addresses
+
+    def _ips(self):
+        return np.unique(self.connects[1])
+
+    def records(self):
+        # Neo4j-shaped nodes and relationships, like the mock data behind /api/neo4j
+        nodes = [{
+            "id": f"account-{code}",
+            "labels": ["Account"],
+            "properties": {"username": f"user{code}", "email": f"user{code}@example.com",
+                           "isFraudulent": bool(ring >= 0)},
+        } for code, ring in zip(range(self.first, self.first + self.count), self.ring_of_account.tolist())]
+        nodes += [{"id": f"ip-{code}", "labels": ["IPAddress"],
+                   "properties": {"address": self.ip_addresses[code]}} for code in self._ips().tolist()]
+        accounts, ips = self.connects
+        relationships = [{
+            "id": f"c{self.first}-{i}", "type": "CONNECTS_FROM", "startNode": f"account-{account}",
+            "endNode": f"ip-{ip}", "properties": {},
+        } for i, (account, ip) in enumerate(zip(accounts.tolist(), ips.tolist()))]
+        sources, targets, confidences = self.related
+        relationships += [{
+            "id": f"r{self.first}-{i}", "type": "RELATED_TO", "startNode": f"account-{source}",
+            "endNode": f"account-{target}", "properties": {"confidence": round(confidence, 3)},
+        } for i, (source, target, confidence) in enumerate(zip(sources.tolist(), targets.tolist(),
+                                                                  confidences.tolist()))]
+        return nodes, relationships
+
+    def graph_data(self):
+        # GraphData-shaped nodes and links, like /api/graph and the fraud graph store
+        nodes = [{
+            "id": f"account-{code}", "label": f"user{code}", "type": "account",
+            "properties": {"email": f"user{code}@example.com", "isFraudulent": bool(ring >= 0)},
+        } for code, ring in zip(range(self.first, self.first + self.count), self.ring_of_account.tolist())]
+        nodes += [{"id": f"ip-{code}", "label": self.ip_addresses[code], "type": "ip", "properties": {}}
+                  for code in self._ips().tolist()]
+        accounts, ips = self.connects
+        links = [{"source": f"account-{account}", "target": f"ip-{ip}", "type": "CONNECTS_FROM"}
+                 for account, ip in zip(accounts.tolist(), ips.tolist())]
+        sources, targets, confidences = self.related
+        links += [{"source": f"account-{source}", "target": f"account-{target}", "type": "RELATED_TO",
+                   "properties": {"confidence": round(confidence, 3)}}
+                  for source, target, confidence in zip(sources.tolist(), targets.tolist(), confidences.tolist())]
+        return nodes, links
+
+    def accounts(self):
+        # accounts.json-shaped records; ip and loginTime come from each
+        # account's first login, or its ring login for ring members
+        events = self.events
+        order = np.lexsort((events.times, events.accounts))
+        codes = events.accounts[order]
+        first_login = order[np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])]
+        ring_login = np.empty(0, dtype=np.int64)
+        if len(self.ring_ips):
+            rings = self.ring_of_account[events.accounts - self.first]
+            ring_login = np.flatnonzero((rings >= 0) & (events.ips == self.ring_ips[np.maximum(rings, 0)]))
+        ip_of, time_of = {}, {}
+        for position in np.concatenate([first_login, ring_login]).tolist():
+            ip_of[int(events.accounts[position])] = int(events.ips[position])
+            time_of[int(events.accounts[position])] = int(events.times[position])
+
+        related = {}
+        sources, targets, _ = self.related
+        for source, target in zip(sources.tolist(), targets.tolist()):
+            related.setdefault(source, []).append(str(target))
+            related.setdefault(target, []).append(str(source))
+        return [{
+            "id": str(code),
+            "username": f"user{code}",
+            "email": f"user{code}@example.com",
+            "ip": self.ip_addresses[ip_of[code]],
+            "loginTime": _iso(time_of[code]),
+            "isFraudulent": bool(ring >= 0),
+            "relatedAccounts": related.get(code, []),
+        } for code, ring in zip(range(self.first, self.first + self.count), self.ring_of_account.tolist())]
+
+    def clusters(self, accounts=None):
+        # clusters.json-shaped records, one per planted ring
+        accounts = accounts if accounts is not None else self.accounts()
+        members = {}
+        for offset, ring in enumerate(self.ring_of_account.tolist()):
+            if ring >= 0:
+                members.setdefault(ring, []).append(accounts[offset])
+        return [{
+            "id": f"cluster-{self.first}-{ring}",
+            "ip": self.ip_addresses[int(self.ring_ips[ring])],
+            "accounts": ring_accounts,
+            "timestamp": min(account["loginTime"] for account in ring_accounts),
+            "confidence": 0.95,
+        } for ring, ring_accounts in sorted(members.items())]
+
+    def login_payloads(self, limit=None):
+        # /api/events LoginEvent payloads in time order
+        events = self.events
+        order = np.argsort(events.times, kind="stable")[:limit]
+        return [{
+            "accountId": str(account),
+            "ip": self.ip_addresses[ip],
+            "loginTime": _iso(seconds),
+            "username": f"user{account}",
+            "email": f"user{account}@example.com",
+        } for account, ip, seconds in zip(events.accounts[order].tolist(), events.ips[order].tolist(),
+                                          events.times[order].tolist())]
+
+
+def fraud_graph(n_accounts, ring_density=0.05, ring_size=(3, 8), logins=3, related_noise=0.01, days=30,
+                window=DEFAULT_WINDOW, seed=0, start=1743465600, first=0, total=None) -> FraudGraph:
+    # `ring_density` of the accounts are planted in rings that share one IP
+    # and log in from it within `window` seconds; ring members are chained by
+    # high-confidence RELATED_TO edges, and `related_noise` * n_accounts
+    # low-confidence edges link random accounts. Other accounts log in
+    # `logins` times, mostly from a home IP. `first`/`total` place the slice
+    # in a larger graph of `total` accounts (see fraud_graph_chunks).
+    rng = np.random.default_rng([seed, first])
+    total = total or first + n_accounts
+    n_ips = max(1, total // 2)
+    span = days * 86400
+    codes = np.arange(first, first + n_accounts, dtype=np.int32)
+
+    # Background logins from the home IP, a tenth roaming to a random IP
+    home_ip = rng.integers(0, n_ips, size=n_accounts, dtype=np.int32)
+    accounts = np.repeat(codes, logins)
+    ips = np.repeat(home_ip, logins)
+    roaming = rng.random(len(ips)) < 0.1
+    ips[roaming] = rng.integers(0, n_ips, size=int(roaming.sum()), dtype=np.int32)
+    times = start + rng.integers(0, span, size=len(ips), dtype=np.int64)
+
+    # Rings: disjoint groups of accounts sharing a ring IP within the window
+    low, high = ring_size
+    n_members = int(n_accounts * ring_density)
+    sizes = rng.integers(low, high + 1, size=n_members // low + 1)
+    sizes = sizes[np.cumsum(sizes) <= n_members]
+    members = rng.permutation(n_accounts)[:int(sizes.sum())]
+    ring_of_member = np.repeat(np.arange(len(sizes)), sizes)
+    ring_of_account = np.full(n_accounts, -1, dtype=np.int32)
+    ring_of_account[members] = ring_of_member
+    ring_ips = rng.integers(0, n_ips, size=len(sizes), dtype=np.int32)
+    ring_start = start + rng.integers(0, span, size=len(sizes), dtype=np.int64)
+    offsets = np.arange(len(members)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    ring_times = ring_start[ring_of_member] + offsets * rng.integers(5, max(6, window // high), size=len(members))
+
+    accounts = np.concatenate([accounts, codes[members]])
+    ips = np.concatenate([ips, ring_ips[ring_of_member]])
+    times = np.concatenate([times, ring_times])
+    events = LoginEvents(accounts, ips, times, AccountIds(total, prefix=""), IpAddresses(n_ips))
+
+    pairs = np.unique(accounts.astype(np.int64) << 32 | ips.astype(np.int64))
+    connects = ((pairs >> 32).astype(np.int32), (pairs & 0xFFFFFFFF).astype(np.int32))
+
+    # Consecutive members of a ring, then random low-confidence noise
+    chained = np.flatnonzero(ring_of_member[1:] == ring_of_member[:-1])
+    n_noise = int(n_accounts * related_noise)
+    sources = np.concatenate([codes[members[chained]], rng.choice(codes, n_noise)])
+    targets = np.concatenate([codes[members[chained + 1]], rng.choice(codes, n_noise)])
+    confidences = np.concatenate([rng.uniform(0.8, 1.0, len(chained)), rng.uniform(0.1, 0.5, n_noise)])
+    distinct = sources != targets
+    related = (sources[distinct], targets[distinct], confidences[distinct])
+
+    return FraudGraph(first, n_accounts, events, connects, related, ring_ips, ring_of_account)
+
+
+def fraud_graph_chunks(n_accounts, chunk=1_000_000, **options):
+    # fraud_graph() over consecutive account slices of one graph; every
+    # slice is seeded by its position, so a run is reproducible in any order
+    for first in range(0, n_accounts, chunk):
+        yield fraud_graph(min(chunk, n_accounts - first), first=first, total=n_accounts, **options)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic fraud graph generator")
+    parser.add_argument("--accounts", type=int, default=1_000_000)
+    parser.add_argument("--chunk", type=int, default=1_000_000, help="accounts generated per slice")
+    parser.add_argument("--ring-density", type=float, default=0.05, help="fraction of accounts in fraud rings")
+    parser.add_argument("--logins", type=int, default=3, help="background logins per account")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--snapshot", help="write the graph as a binary snapshot (app.snapshot) to this path")
+    args = parser.parse_args()
+    options = {"ring_density": args.ring_density, "logins": args.logins, "seed": args.seed}
+
+    if args.snapshot:
+        from app.graph_store import GraphStore
+        from app.snapshot import write_snapshot
+
+        graph = fraud_graph(args.accounts, **options)
+        store = GraphStore.from_graph_data(*graph.graph_data(), labels={"account": "Account", "ip": "IPAddress"})
+        write_snapshot(store, args.snapshot)
+        print(f"{store.node_count} nodes, {store.relationship_count} relationships -> {args.snapshot}")
+        return
+
+    started = time.perf_counter()
+    totals = {"accounts": 0, "login_events": 0, "connects_from": 0, "related_to": 0, "rings": 0}
+    for graph in fraud_graph_chunks(args.accounts, args.chunk, **options):
+        totals["accounts"] += graph.count
+        totals["login_events"] += len(graph.events)
+        totals["connects_from"] += len(graph.connects[0])
+        totals["related_to"] += len(graph.related[0])
+        totals["rings"] += len(graph.ring_ips)
+    seconds = time.perf_counter() - started
+    print(json.dumps({**totals, "seconds": seconds, "accounts_per_s": totals["accounts"] / seconds}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from app.vector_index import EXACT, IVF, VectorIndex
+
+# Recall vs latency for exact and IVF search over a memory-mapped index
+#
+# Vectors are drawn around random centers so the data has cluster structure,
+# queries are perturbed copies of stored vectors. Exact search provides the
+# ground truth; IVF recall@k is reported for a sweep of nprobe values.
+#
+# Run from the backend directory:
+#   python -m benchmarks.vector_search --vectors 200000 --dim 128
+
+
+def synthetic_vectors(n, dim, centers, seed):
+    rng = np.random.default_rng(seed)
+    means = rng.normal(size=(centers, dim)).astype(np.float32)
+    labels = rng.integers(0, centers, n)
+    return (means[labels] + 1.5 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def run(n, dim, queries, k, nlist, nprobes, path, batch, seed):
+    vectors = synthetic_vectors(n, dim, max(16, nlist), seed)
+    ids = [str(i) for i in range(n)]
+    index = VectorIndex(dim, path)
+
+    _, upsert_s = _timed(lambda: [index.upsert(ids[i:i + batch], vectors[i:i + batch])
+                                  for i in range(0, n, batch)])
+    _, train_s = _timed(lambda: index.train(nlist))
+    index.flush()
+    index, open_s = _timed(lambda: VectorIndex.open(path))
+
+    rng = np.random.default_rng(seed + 1)
+    sample = vectors[rng.choice(n, queries, replace=False)]
+    query_vectors = sample + 1.0 * rng.normal(size=sample.shape).astype(np.float32)
+
+    (truth, _), exact_s = _timed(lambda: index.search_rows(query_vectors, k, mode=EXACT))
+    results = {
+        "vectors": n,
+        "dim": dim,
+        "upsert_s": upsert_s,
+        "train_s": train_s,
+        "open_ms": open_s * 1e3,
+        "exact_ms_per_query": exact_s / queries * 1e3,
+        "ivf": [],
+    }
+    for nprobe in nprobes:
+        (rows, _), ivf_s = _timed(lambda: index.search_rows(query_vectors, k, mode=IVF, nprobe=nprobe))
+        recall = np.mean([len(np.intersect1d(found, expected)) / k for found, expected in zip(rows, truth)])
+        results["ivf"].append({"nprobe": nprobe, "recall": float(recall), "ms_per_query": ivf_s / queries * 1e3})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vector index recall/latency benchmark")
+    parser.add_argument("--vectors", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=512)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--batch", type=int, default=10000, help="vectors per upsert")
+    parser.add_argument("--path", help="index directory (default: a temporary directory)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        result = run(args.vectors, args.dim, args.queries, args.k, args.nlist, args.nprobe,
+                     args.path or tmp, args.batch, args.seed)
+    print(f"{result['vectors']} x {result['dim']} vectors: upsert {result['upsert_s']:.2f} s, "
+          f"train {result['train_s']:.2f} s, open {result['open_ms']:.1f} ms")
+    print(f"  exact            {result['exact_ms_per_query']:8.3f} ms/query   recall@{args.k} 1.000")
+    for row in result["ivf"]:
+        print(f"  ivf nprobe={row['nprobe']:<4} {row['ms_per_query']:8.3f} ms/query   "
+              f"recall@{args.k} {row['recall']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
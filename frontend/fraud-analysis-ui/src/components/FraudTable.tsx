@@ -104,11 +104,13 @@ const FraudTable: React.FC<FraudTableProps> = ({ query }) => {
                           <TableCell>{cluster.accounts.length}</TableCell>
                           <TableCell>{formatDateTime(cluster.timestamp)}</TableCell>
                           <TableCell>
-                            <Chip 
-                              label={`${(cluster.confidence * 100).toFixed(0)}%`} 
-                              color={cluster.confidence > 0.8 ? "error" : "warning"} 
-                              size="small" 
-                            />
+                            {cluster.confidence === null ? 'n/a' : (
+                              <Chip 
+                                label={`${(cluster.confidence * 100).toFixed(0)}%`} 
+                                color={cluster.confidence > 0.8 ? "error" : "warning"} 
+                                size="small" 
+                              />
+                            )}
                           </TableCell>
                         </TableRow>
                       ))}
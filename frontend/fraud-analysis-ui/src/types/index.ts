@@ -20,7 +20,7 @@ export interface FraudCluster {
   ip: string;
   accounts: FraudAccount[];
   timestamp: string;
-  confidence: number;
+  confidence: number | null;
 }
 
 export interface GraphNode {